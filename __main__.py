@@ -1,11 +1,20 @@
 """
 top level
+
+    python3 __main__.py: interactive session
+    python3 __main__.py render <project> -o <file.wav>: render a project's mix
+        headless, without prompts or plot windows. see render_main
 """
 
 ### Initialize
-import os, time, sys
+import argparse, glob, os, time, sys
 SESS_START = time.time()
 
+# headless renders have no windows to draw plots in
+HEADLESS = len(sys.argv) > 1 and sys.argv[1] == "render"
+if HEADLESS:
+    os.environ["MPLBACKEND"] = "Agg"
+
 from src.utility import suppress_output
 from src.path import join_path
 from src.output_and_prompting import style
@@ -32,6 +41,9 @@ from src.relativism import *
 from src.debug import *
 from src.output_and_prompting import *
 from src.globals import RelGlobals, Settings, init_globals, save_globals
+from src.process import flush_autosaves
+from src.chance import Chance
+from src.data_types import Units, ind
 
 # TODO load extensions dynamically
 # try:
@@ -48,21 +60,30 @@ RelGlobals.set_settings_file(SETTINGS_FILE)
 init_globals()
 
 
-with open(ERROR_LOG, "r") as log:
+def start_session_log():
+    """
+    warn of other open sessions, and log this one's start. headless renders
+    change nothing they could conflict over, so many may run at once unlogged
+    """
+    try:
+        with open(ERROR_LOG, "r") as log:
+            lines = log.readlines()
+    except FileNotFoundError:
+        lines = []
 
     # check multiple open sessions
     info_block("Checking logs...")
-    lines = log.readlines()
-    last = [i for i in lines if i.startswith("sess-start") or i.startswith("sess-end")][-1]
-    kind, secs = last.strip().split("\t")
-    secs = float(secs)
-    if kind == "sess-start":
-        err_mess("Warning! There may be multiple instances of the program running, " +
-            "or it was exited improperly last session. Last unended session start: " +
-            "{0:.4f} seconds ago, {1}".format(
-                time.time() - secs, time.strftime("%H:%M:%S %m-%d-%Y", time.localtime(secs))))
-        err_mess("Ensure multiple instances are not running, and be careful " +
-            "to exit properly so as to not lose any data", extra_leading_nl=False)
+    sessions = [i for i in lines if i.startswith("sess-start") or i.startswith("sess-end")]
+    if sessions:
+        kind, secs = sessions[-1].strip().split("\t")
+        secs = float(secs)
+        if kind == "sess-start":
+            err_mess("Warning! There may be multiple instances of the program running, " +
+                "or it was exited improperly last session. Last unended session start: " +
+                "{0:.4f} seconds ago, {1}".format(
+                    time.time() - secs, time.strftime("%H:%M:%S %m-%d-%Y", time.localtime(secs))))
+            err_mess("Ensure multiple instances are not running, and be careful " +
+                "to exit properly so as to not lose any data", extra_leading_nl=False)
     
     # keep 20 most recent sessions logs
     start_count = 0
@@ -72,19 +93,20 @@ with open(ERROR_LOG, "r") as log:
         if start_count > MAX_SESS_LOGS:
             break
 
-# rewrite logs
-if start_count > MAX_SESS_LOGS and i != 0:
-    lines = lines[i:]
-    with open(ERROR_LOG, "w") as log:
-        log.write("{0} most recent session logs are kept\n\n".format(MAX_SESS_LOGS))
-        log.writelines(lines)
+    # rewrite logs
+    if start_count > MAX_SESS_LOGS and i != 0:
+        lines = lines[i:]
+        with open(ERROR_LOG, "w") as log:
+            log.write("{0} most recent session logs are kept\n\n".format(MAX_SESS_LOGS))
+            log.writelines(lines)
 
-# log start
-with open(ERROR_LOG, "a") as log:
-    log.write("\nsess-start\t{0}\n".format(SESS_START))
+    # log start
+    with open(ERROR_LOG, "a") as log:
+        log.write("\nsess-start\t{0}\n".format(SESS_START))
 
 
 def run():
+    start_session_log()
     rel = Relativism(RELDATA_DIR, PROJFILE_NAME)
 
     LOAD_TIME = time.time()
@@ -103,6 +125,7 @@ def run():
                 show_error(e, force=True)
     
     rel.save()
+    flush_autosaves()
 
     # writes settings and data files
     save_globals()
@@ -115,5 +138,61 @@ def run():
         log.write("sess-end\t{0}\n".format(time.time()))
 
 
+def find_project(rel, project):
+    """
+    (name, directory) of a project, by its name among known projects, or by
+    the path to its folder
+    """
+    directory = rel.projects.get(project, project)
+    ext = ".Project." + RelSavedObj.datafile_extension
+    datafiles = glob.glob(join_path(glob.escape(directory), "*" + ext))
+    if directory == "None" or len(datafiles) != 1:
+        return None, directory
+    return os.path.basename(datafiles[0])[:-len(ext)], directory
+
+
+def render_main(argv):
+    """
+    load a project and write its mix to a wav file, without prompting.
+    returns the exit status
+    """
+    parser = argparse.ArgumentParser(prog="relativism render",
+        description="render a project's mix to a wav file, without prompts")
+    parser.add_argument("project", help="name of a known project, or path to a project's folder")
+    parser.add_argument("-o", "--output", required=True, help="wav file to write")
+    parser.add_argument("-l", "--length", help="beats of output for each sampler, such as '64b'. " +
+        "required for projects with samplers")
+    parser.add_argument("-s", "--seed", type=int, help="seed for chance-based processes, " + 
+        "instead of the project's own")
+    args = parser.parse_args(argv)
+
+    rel = Relativism(RELDATA_DIR, PROJFILE_NAME)
+    name, directory = find_project(rel, args.project)
+    if name is None:
+        err_mess("No project named or found at '{0}'".format(args.project))
+        return 1
+    project = ProjectLoader("{0}.Project".format(name), directory, rel).get_proj()
+
+    sampler_length = None
+    if project.has_samplers():
+        if args.length is None:
+            err_mess("Project '{0}' has samplers, so --length is required".format(name))
+            return 1
+        try:
+            sampler_length = ind(Units.beats(args.length))
+        except (TypeError, ValueError) as e:
+            err_mess(str(e))
+            return 1
+    if args.seed is not None:
+        Chance.set_seed(args.seed)
+
+    section_head("Rendering {0} '{1}'".format(project.reltype, name))
+    project.render_to_file(args.output, sampler_length)
+    info_block("Mix written to '{0}' in {1:.4f} seconds".format(args.output, time.time() - SESS_START))
+    return 0
+
+
 if __name__ == "__main__":
+    if HEADLESS:
+        sys.exit(render_main(sys.argv[2:]))
     run()
@@ -1,10 +1,13 @@
 import matplotlib.pyplot as plt
 import numpy as np
+import bisect
 import math
 import re
 
 from src.data_types import *
 from src.input_processing import inpt, inpt_validate, input_dir, input_file
+from src.sample_format import SampleFormat
+from src.spectral import Spectral
 from src.output_and_prompting import (p, info_title, info_list, info_line, 
     section_head, info_block, nl, err_mess, critical_err_mess, show_error,
     rel_plot)
@@ -18,6 +21,11 @@ class Analysis():
     pass modified analysis arr to plot, not orig rec
     """
 
+    # amplitude envelopes get_frames can measure each frame with
+    envelope_kinds = ("mean", "rms", "peak")
+    # frames measured at once by the peak envelope, to bound memory
+    peak_chunk = 4096
+
     def __init__(self, rec, start=0, end=None):
         """
         analysis of rec, with start and end as samps
@@ -90,7 +98,7 @@ class Analysis():
 
     def get_frames_left(self, **kwargs):
         info_block("Calculating left channel frames...")
-        return self.get_frames(self.arr[:, 1], **kwargs)
+        return self.get_frames(self.arr[:, 0], **kwargs)
 
     def get_frames_right(self, **kwargs):
         info_block("Calculating right channel frames...")
@@ -100,11 +108,15 @@ class Analysis():
         info_block("Calculating frames...")
         return self.get_frames(self.mono_arr, **kwargs)
 
-    def get_frames(self, array, length_frac=None, step_frac=None, length=None, step=None):
+    def get_frames(self, array, length_frac=None, step_frac=None, length=None, step=None, kind="mean"):
         """
         take and average data from recording into frames.
         frame len defaults: 1/20, 1/100 secs
+        kind: amplitude of each frame, 'mean' (of absolute value), 'rms', or 'peak'
         """
+        if kind not in self.envelope_kinds:
+            raise ValueError("Unknown frame envelope '{0}', must be one of '{1}'".format(
+                kind, "', '".join(self.envelope_kinds)))
         if self.frame_length is None:
             if length is not None:
                 self.set_frame_lengths(length, step)
@@ -114,13 +126,57 @@ class Analysis():
                 else:
                     self.set_frame_fractions(1/20, 1/100)
 
-        frames = [] # start index, avg amplitude
-        for i in range(0, self.samp_len - self.frame_length, self.frame_step):
-            frame = array[ i : i + self.frame_length]
-            frame_avg = np.mean(np.abs(frame))
-            frames.append( (i + self.start, frame_avg) )
+        length = self.frame_length
+        starts = np.arange(0, self.samp_len - length, self.frame_step)
+        if starts.shape[0] == 0:
+            return np.zeros((0,)) # as an empty list of frames was
+
+        # frames start and end on multiples of the gcd of length and step, so
+        # samples are first reduced in blocks of that size, and frames built from blocks
+        block = math.gcd(length, self.frame_step)
+        n_blocks = (starts[-1] + length) // block
+        blocks = np.asarray(array[:n_blocks * block], dtype=np.float64).reshape((n_blocks, block))
+        first, per_frame = starts // block, length // block
+
+        if kind == "peak":
+            block_peaks = np.abs(blocks).max(axis=1)
+            windows = np.lib.stride_tricks.sliding_window_view(block_peaks, per_frame)
+            amps = np.concatenate([
+                windows[first[i : i + self.peak_chunk]].max(axis=1)
+                for i in range(0, first.shape[0], self.peak_chunk)
+            ])
+        else:
+            # moving average from a running sum: each frame is one subtraction
+            values = blocks * blocks if kind == "rms" else np.abs(blocks)
+            sums = np.concatenate(([0], np.cumsum(values.sum(axis=1))))
+            amps = (sums[first + per_frame] - sums[first]) / length
+            if kind == "rms":
+                amps = np.sqrt(np.maximum(amps, 0))
 
-        return np.array(frames) # (start index, avg amplitude)
+        return np.stack((starts + self.start, amps), axis=1) # (start index, amplitude)
+
+    def get_spectral(self, channel="mono", fft_size=2048, hop=None, window="hann"):
+        """
+        Spectral of this analysis' audio. recordings keep the most recent
+        Spectral.cache_size in rec.spectra, until their audio is edited
+            channel: 'left', 'right', or 'mono'
+        """
+        key = (self.start, self.end, channel, fft_size, hop, window)
+        cache = getattr(self.obj, "spectra", None)
+        if cache is not None and key in cache:
+            return cache[key]
+        if channel == "mono":
+            signal = np.mean(SampleFormat.to_float(self.arr), axis=1)
+        elif channel in ("left", "right"):
+            signal = self.arr[:, 0 if channel == "left" else 1]
+        else:
+            raise ValueError("Unknown channel '{0}', must be 'left', 'right', or 'mono'".format(channel))
+        spectral = Spectral(signal, self.rate, fft_size, hop, window)
+        if cache is not None:
+            cache[key] = spectral
+            while len(cache) > Spectral.cache_size:
+                del cache[next(iter(cache))]
+        return spectral
 
     def play_frame(self, samp_start, samp_dur=None):
         if samp_dur is None:
@@ -132,30 +188,41 @@ class Analysis():
 
     def find_peaks(self, frames):
         """
-        returns peaks as (sample index, slope)
+        returns peaks as (sample index, slope): for every frame that the next one
+        rises above, the steepest slope from it to any frame before the rise ends
         """
         info_block("Finding peaks...")
-
-        # find highest positive slopes between frames
-        slopes = []
-        frm_ind = 0
-        while frm_ind < len(frames): # (index, avg amp)
-            highest_slope = 0
-            compare_ind = frm_ind + 1
-            # get highest slope from this frame, with no dips in between
-            while ( # while frame is highest than last and not past end
-                    compare_ind < len(frames) ) and (
-                    frames[compare_ind][1] > frames[compare_ind - 1][1]
-                ):
-                # 1000 is arbitrary, just to make the numbers nicer
-                new_slope = 1000 * (frames[compare_ind][1] - frames[frm_ind][1]) / (compare_ind - frm_ind)
-                highest_slope = new_slope if new_slope > highest_slope else highest_slope
-                compare_ind += 1
-            if highest_slope != 0:
-                slopes.append((frames[frm_ind][0], highest_slope))
-            frm_ind += 1
-
-        return np.asarray(slopes)
+        frames = np.asarray(frames)
+        if frames.shape[0] < 2:
+            return np.asarray([])
+        amps = frames[:, 1]
+        rising = np.flatnonzero(amps[1:] > amps[:-1])
+        if rising.shape[0] == 0:
+            return np.asarray([])
+
+        # the steepest frame from each one is on the upper convex hull of the frames
+        # after it in its rise. building that hull back to front, each frame's
+        # steepest partner is the hull's nearest point once the frame is added
+        best = np.empty(amps.shape[0], dtype=np.int64)
+        hull = []
+        is_rising = np.zeros(amps.shape[0], dtype=bool)
+        is_rising[rising] = True
+        for i in range(amps.shape[0] - 1, -1, -1):
+            if not is_rising[i]:
+                # a rise ends here
+                hull = [i]
+                continue
+            amp = amps[i]
+            while len(hull) >= 2 and \
+                    (amps[hull[-2]] - amp) / (hull[-2] - i) >= (amps[hull[-1]] - amp) / (hull[-1] - i):
+                hull.pop()
+            best[i] = hull[-1]
+            hull.append(i)
+
+        # 1000 is arbitrary, just to make the numbers nicer
+        ends = best[rising]
+        slopes = 1000 * (amps[ends] - amps[rising]) / (ends - rising)
+        return np.stack((frames[rising, 0], slopes), axis=1)
 
     def filter_peaks(self, peaks):
         """
@@ -168,27 +235,19 @@ class Analysis():
 
         sorted_peaks = NpOps.sort(peaks, 1)
 
-        p_ind = 0
-        while p_ind < sorted_peaks.shape[0]:
-            comp_ind = p_ind + 1
-            while comp_ind < sorted_peaks.shape[0]:
-                comp_val = sorted_peaks[comp_ind][0]
-                # remove smaller items. 4 seems to get them all
-                if (comp_val - (5 * self.frame_length) <
-                    sorted_peaks[p_ind][0] <
-                    comp_val + (5 * self.frame_length)
-                ):
-                    sorted_peaks = np.delete(sorted_peaks, comp_ind, 0)
-                else:
-                    comp_ind += 1
-            p_ind += 1
-
-        return sorted_peaks # (sample_index, slope)
-
-
-
-
-
-
-
-
+        # steepest first, each peak suppresses the smaller ones within 5 frame
+        # lengths of it (4 seems to get them all). kept positions stay sorted, so
+        # only the nearest kept peak on either side needs checking
+        window = 5 * self.frame_length
+        kept_positions = []
+        keep = np.zeros(sorted_peaks.shape[0], dtype=bool)
+        for ind, position in enumerate(sorted_peaks[:, 0]):
+            near = bisect.bisect_left(kept_positions, position)
+            if near < len(kept_positions) and kept_positions[near] - position < window:
+                continue
+            if near > 0 and position - kept_positions[near - 1] < window:
+                continue
+            kept_positions.insert(near, position)
+            keep[ind] = True
+
+        return sorted_peaks[keep] # (sample_index, slope)
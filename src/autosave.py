@@ -0,0 +1,109 @@
+"""
+background audio writer: edits hand their audio off to a writer thread and
+return straight away. the thread waits for edits to settle, so a burst of
+edits to one file becomes a single write, and replaces each file atomically
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from src.errors import *
+
+
+class AudioWriter:
+    """
+    writer thread for audio files, one pending write per path
+        debounce: seconds a path must go without new audio before it is written
+    """
+
+    debounce = 0.5
+
+    def __init__(self, debounce=None):
+        if debounce is not None:
+            self.debounce = debounce
+        self.pending = {} # path: (write function, array snapshot, time submitted)
+        self.writing = None
+        self.errors = []
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def submit(self, path, arr, write):
+        """
+        queue arr to be written to path by write(path, arr). arr is copied, so
+        later edits don't change what gets written. replaces any write of path
+        still waiting
+        """
+        snapshot = np.array(arr, copy=True)
+        with self.cond:
+            self.pending[path] = (write, snapshot, time.monotonic())
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def cancel(self, path):
+        """
+        drop the waiting write of path, and wait for it if it is being written
+        """
+        with self.cond:
+            self.pending.pop(path, None)
+            while self.writing == path:
+                self.cond.wait()
+
+    def flush(self):
+        """
+        write everything waiting now, and block until it is all on disk. raises
+        the first error any background write hit
+        """
+        with self.cond:
+            # no need to wait out the debounce anymore
+            for path, (write, snapshot, _) in self.pending.items():
+                self.pending[path] = (write, snapshot, 0)
+            self.cond.notify_all()
+            while self.pending or self.writing is not None:
+                self.cond.wait()
+            errors, self.errors = self.errors, []
+        if errors:
+            raise errors[0]
+
+    def run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if not self.pending:
+                        # idle threads exit, and submit starts a new one
+                        if not self.cond.wait(timeout=10) and not self.pending:
+                            self.thread = None
+                            return
+                        continue
+                    path, (write, snapshot, submitted) = min(self.pending.items(), key=lambda i: i[1][2])
+                    wait = submitted + self.debounce - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self.cond.wait(timeout=wait)
+                del self.pending[path]
+                self.writing = path
+            try:
+                write(path, snapshot)
+            except Exception as e:
+                self.errors.append(e)
+            with self.cond:
+                self.writing = None
+                self.cond.notify_all()
+
+
+def atomic_write(path, write):
+    """
+    call write(temp path), then rename the temp file over path, so path
+    is never left half-written
+    """
+    temp = path + ".saving"
+    write(temp)
+    os.replace(temp, path)
+
+
+# writer shared by every audio object
+writer = AudioWriter()
@@ -0,0 +1,58 @@
+"""
+seeded randomness for chance-based processes. each component draws from its
+own numpy generator, derived from the project's seed and the component's
+name, so a project's generative output replays exactly from its seed, and one
+component drawing more or less never shifts another's draws. draws are numpy
+arrays, a batch at a time
+
+    stream: the generator for one name, continuing from where its last draw
+        left off, until the seed is set again
+"""
+
+import zlib
+
+import numpy as np
+
+from src.errors import *
+
+
+class Chance:
+    """
+    staticmethod class handing out seeded numpy random generators
+    """
+
+    _seed = None
+    _streams = {}
+
+    @staticmethod
+    def new_seed():
+        """
+        a fresh seed from the os's entropy, for new projects
+        """
+        return int(np.random.SeedSequence().entropy % 2 ** 32)
+
+    @staticmethod
+    def set_seed(seed):
+        """
+        seed every stream, starting them all over
+        """
+        Chance._seed = int(seed)
+        Chance._streams = {}
+
+    @staticmethod
+    def get_seed():
+        if Chance._seed is None:
+            Chance.set_seed(Chance.new_seed())
+        return Chance._seed
+
+    @staticmethod
+    def rng(name):
+        """
+        numpy Generator of the stream for name
+        """
+        stream = Chance._streams.get(name)
+        if stream is None:
+            # the name's checksum picks its own branch of the seed
+            sequence = np.random.SeedSequence(Chance.get_seed(), spawn_key=(zlib.crc32(name.encode()),))
+            stream = Chance._streams[name] = np.random.default_rng(sequence)
+        return stream
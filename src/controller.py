@@ -3,6 +3,7 @@ import abc
 from scipy.interpolate import interp1d
 
 from src.data_types import *
+from src.envelopes import Envelope
 from src.errors import *
 from src.input_processing import inpt, inpt_validate, input_dir, input_file
 from src.method_ops import (is_alias, is_public_process, public_process,
@@ -328,3 +329,23 @@ class ContinuousController(Controller):
         change_type = self.validate_change_type(change_type)
         self.add_marker(sample_ind, ContinuousMarker(beatsec, value, change_type))
 
+    def envelope(self, length):
+        """
+        render markers to a per-sample automation array of length samples,
+        with each marker's change type as the curve leading up to it
+        """
+        points = []
+        for sample_ind, marker in self.markers.items():
+            value = marker.value
+            if isinstance(value, Units.Quant):
+                value = value.to_base_units().magnitude
+            points.append((int(sample_ind), value, marker.change_type))
+        return Envelope.automation(points, length)
+
+    def generate(self):
+        """
+        per-sample values up to the last marker, following each marker's change type
+        """
+        length = int(max(self.markers.keys())) + 1
+        return np.arange(length), self.envelope(length)
+
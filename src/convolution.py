@@ -0,0 +1,160 @@
+"""
+fft convolution: uniformly partitioned overlap-add, for applying long impulse
+responses (reverbs, filters) to long audio in bounded memory
+
+the impulse response is split into partitions of block_size frames, each
+transformed once. input is transformed a block at a time and kept in a
+frequency-domain delay line, so every output block is a sum of spectrum
+products, and no fft is ever longer than 2 * block_size
+
+impulse response shapes:
+    (length,): same response on every channel
+    (length, channels): one response per channel
+    (length, in channels, out channels): matrix of responses, each output
+        channel summing every input channel through its own response
+"""
+
+import numpy as np
+
+from src.errors import *
+
+
+class Convolver:
+    """
+    streaming partitioned convolution with one impulse response. feed audio
+    with process() in chunks of any size, then flush() for the tail
+    """
+
+    # frames per partition and per input block
+    block_size = 4096
+    # blocks transformed together by process()
+    segment_blocks = 32
+
+    def __init__(self, ir, block_size=None):
+        ir = np.asarray(ir, dtype=np.float64)
+        if ir.ndim not in (1, 2, 3) or ir.shape[0] == 0:
+            raise ValueError("Impulse response must be a non-empty 1, 2, or 3 dimensional array, got shape {0}".format(ir.shape))
+        if block_size is not None:
+            self.block_size = int(block_size)
+        self.ir_len = ir.shape[0]
+        self.matrix = ir.ndim == 3
+
+        b = self.block_size
+        parts = -(-self.ir_len // b)
+        padded = np.zeros((parts * b,) + ir.shape[1:])
+        padded[:self.ir_len] = ir
+        # (partition, frequency, channel[s])
+        padded = padded.reshape((parts, b) + ir.shape[1:])
+        self.spectra = np.fft.rfft(padded, n=2 * b, axis=1)
+        self.parts = parts
+
+        self.history = None # spectra of the last parts - 1 input blocks
+        self.tail = None # second half of the last output block
+        self.pending = None # input frames not yet making a full block
+        self.mono = False
+
+    def _start(self, chunk):
+        """
+        allocate state once the channel count is known
+        """
+        channels = chunk.shape[1]
+        if self.matrix:
+            if self.spectra.shape[2] != channels:
+                raise ValueError("Impulse response takes {0} input channels, got {1}".format(
+                    self.spectra.shape[2], channels))
+            out_channels = self.spectra.shape[3]
+        else:
+            if self.spectra.ndim == 3 and self.spectra.shape[2] not in (1, channels):
+                raise ValueError("Impulse response has {0} channels, got {1}".format(
+                    self.spectra.shape[2], channels))
+            out_channels = channels
+        b = self.block_size
+        self.history = np.zeros((self.parts - 1, b + 1, channels), dtype=np.complex128)
+        self.tail = np.zeros((b, out_channels))
+        self.pending = np.zeros((0, channels))
+
+    def process(self, chunk):
+        """
+        convolve the next chunk of audio. returns the output frames now complete,
+        which lag the input by less than one block
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if chunk.ndim == 1:
+            self.mono = True
+            chunk = chunk[:, None]
+        if self.history is None:
+            self._start(chunk)
+        data = np.concatenate((self.pending, chunk))
+        b = self.block_size
+        full = (data.shape[0] // b) * b
+        self.pending = data[full:]
+        outs = []
+        step = self.segment_blocks * b
+        for seg_start in range(0, full, step):
+            outs.append(self._segment(data[seg_start : min(seg_start + step, full)]))
+        return self._shape_out(outs)
+
+    def flush(self):
+        """
+        convolve the remaining partial block, and return everything still owed:
+        the output ends ir_len - 1 frames after the last input frame
+        """
+        if self.history is None:
+            return self._shape_out([])
+        b = self.block_size
+        owed = self.pending.shape[0] + self.ir_len - 1
+        outs = []
+        while owed > 0:
+            block = np.zeros((b, self.pending.shape[1]))
+            block[:self.pending.shape[0]] = self.pending
+            self.pending = self.pending[:0]
+            outs.append(self._segment(block)[:owed])
+            owed -= b
+        return self._shape_out(outs)
+
+    def _segment(self, frames):
+        """
+        convolve whole blocks of input, returning the same number of output frames
+        """
+        b = self.block_size
+        blocks = frames.shape[0] // b
+        spec = np.fft.rfft(frames.reshape((blocks, b, -1)), n=2 * b, axis=1)
+        # delay line: older blocks first
+        line = np.concatenate((self.history, spec))
+        lag = self.parts - 1
+
+        out_spec = np.zeros((blocks, b + 1, self.tail.shape[1]), dtype=np.complex128)
+        for p in range(self.parts):
+            x = line[lag - p : lag - p + blocks]
+            if self.matrix:
+                out_spec += np.einsum("bfi,fio->bfo", x, self.spectra[p])
+            elif self.spectra.ndim == 2:
+                out_spec += x * self.spectra[p][:, None]
+            else:
+                out_spec += x * self.spectra[p]
+        if lag > 0:
+            self.history = line[-lag:]
+
+        # overlap-add: each block's first half plus the previous block's second half
+        time = np.fft.irfft(out_spec, n=2 * b, axis=1)
+        out = time[:, :b].copy()
+        out[0] += self.tail
+        out[1:] += time[:-1, b:]
+        self.tail = time[-1, b:]
+        return out.reshape((blocks * b, -1))
+
+    def _shape_out(self, outs):
+        channels = self.tail.shape[1] if self.tail is not None else 1
+        out = np.concatenate(outs) if outs else np.zeros((0, channels))
+        if self.mono and out.shape[1] == 1:
+            return out[:, 0]
+        return out
+
+    @staticmethod
+    def convolve(arr, ir, block_size=None):
+        """
+        full convolution of arr with ir, of length len(arr) + len(ir) - 1
+        """
+        conv = Convolver(ir, block_size)
+        out = conv.process(arr)
+        return np.concatenate((out, conv.flush()))
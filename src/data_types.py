@@ -13,6 +13,7 @@ in Project.get_bpm()
 
 import pint
 
+import bisect
 import math
 import re
 import json
@@ -637,9 +638,17 @@ class PitchUnits():
         "bb10": 7458.62 * 4,
         "b10": 7902.13 * 4,
     }
+    # _freq_table frequencies in order, and their notes, built on first use
+    _note_freqs = None
+    _note_names = None
 
-    def get_period(self):
-        return proj_rate_wrapper() / Units.new(self.frequency, "1/second")
+    def get_period(self, rate=None):
+        """
+        samples per cycle at rate (a number, default the project's), as a float
+        """
+        if rate is None:
+            rate = _proj_rate_wrapper().magnitude
+        return rate / self.frequency
 
     def __eq__(self, other):
         if isinstance(other, PitchUnits):
@@ -687,9 +696,16 @@ class PitchUnits():
         """
         pass frequency as raw float
         """
-        freq_to_note = {v:k for k,v in PitchUnits._freq_table.items()}
-        closest_note = freq_to_note[freq_val] if freq_val \
-            in freq_to_note else freq_to_note[min(freq_to_note.keys(), key=lambda k: abs(k-freq_val))]
+        if PitchUnits._note_freqs is None:
+            # one note per frequency, sorted for bisecting
+            freq_to_note = {v:k for k,v in PitchUnits._freq_table.items()}
+            PitchUnits._note_freqs = sorted(freq_to_note)
+            PitchUnits._note_names = [freq_to_note[f] for f in PitchUnits._note_freqs]
+        freqs = PitchUnits._note_freqs
+        ind = bisect.bisect_left(freqs, freq_val)
+        if ind == len(freqs) or (ind > 0 and freq_val - freqs[ind - 1] <= freqs[ind] - freq_val):
+            ind -= 1
+        closest_note = PitchUnits._note_names[ind]
         closest_note_freq = PitchUnits._freq_table[closest_note]
         cents = 1200 * math.log(freq_val/closest_note_freq, 2)
         return (closest_note, cents)
@@ -1,11 +1,23 @@
+import math
+
+import numpy as np
+
 from src.recording_obj import Recording
+from src.chance import Chance
+from src.convolution import Convolver
+from src.envelopes import Envelope
+from src.filters import Equalizer
 from src.generators import Generator, BaseGenerator
+from src.input_processing import inpt_validate
+from src.resampling import Resample
+from src.sample_format import SampleFormat, float_process
 from src.output_and_prompting import (p, info_title, info_list, info_line, 
     section_head, info_block, nl, err_mess, critical_err_mess, show_error)
 
 class Distortion:
 
     @staticmethod
+    @float_process
     def white_noise_injection(rec, amount):
         """
         0, 60;
@@ -13,12 +25,12 @@ class Distortion:
             amount: 0-100
         """
         print("  White Noise Distortion by {0}%...".format(amount))
-        for i in range(len(rec.arr)):
-            dist = amount / 1000 * rd.random()
-            rec.arr[i][0] += dist
-            rec.arr[i][1] += dist
+        # one draw per frame, shared by both channels
+        dist = float(amount) / 1000 * Chance.rng("white noise").random(rec.arr.shape[0])
+        rec.arr += dist[:, None]
 
     @staticmethod
+    @float_process
     def saw(rec, freq, pct):
         """
         15,10000; 10,90;
@@ -27,22 +39,17 @@ class Distortion:
             percent: 0-100%
         """
         print("  Saw Distortion at {0} hz and {1}%".format(freq, pct))
-        period = rec.rate / inpt_validate(freq, 'freq')
-        amount = inpt_validate(pct, 'pcnt', allowed=[0, 100]) / 100
+        period = inpt_validate(freq, 'freq').get_period(rec.rate.magnitude)
+        amount = inpt_validate(pct, 'pcnt', allowed=[0, 100]).to("dimensionless").magnitude
 
         # TODO: amplitude analysis
         amp = 0.5
 
-        delta = amp * 4 / period # amount change per sample
-        val = 0 # value to average with
-        for i in range(rec.size_samps()):
-            rec.arr[i] = [
-                ((rec.arr[i][0] * (1 - amount)) + (val * amount)), 
-                ((rec.arr[i][1] * (1 - amount)) + (val * amount))
-            ]
-            val += delta
-            if abs(val) > (amp + 0.001):
-                delta *= -1
+        # triangle wave rising from 0, built once for the whole recording
+        phase = np.arange(rec.arr.shape[0]) / period
+        wave = amp * (1 - 4 * np.abs((phase + 0.25) % 1 - 0.5))
+        rec.arr *= (1 - amount)
+        rec.arr += (wave * amount)[:, None]
 
 
 
@@ -56,11 +63,20 @@ class Bitcrusher:
             amount: 0-100+: percentage of bits swapped per second
         """
         print("  Bit-Swapping, {0}%...".format(amount))
-        end = len(rec.arr) - 2
-        for _ in range(int(amount / 100 * rec.size_samps())):
-            ind = rd.randint(0, end)
-            rec.arr[ind], rec.arr[ind + 1] = \
-                rec.arr[ind + 1], rec.arr[ind]
+        length = rec.arr.shape[0]
+        if length < 2:
+            return
+        count = int(float(amount) / 100 * length)
+        inds = np.unique(Chance.rng("bit swap").integers(0, length - 1, count))
+        # in a run of neighbouring indexes, every other swap would undo or overlap
+        # the last, so only alternate ones are kept
+        run_start = np.ones(inds.shape[0], dtype=bool)
+        run_start[1:] = np.diff(inds) != 1
+        starts = np.maximum.accumulate(np.where(run_start, np.arange(inds.shape[0]), 0))
+        inds = inds[(np.arange(inds.shape[0]) - starts) % 2 == 0]
+        first = rec.arr[inds].copy()
+        rec.arr[inds] = rec.arr[inds + 1]
+        rec.arr[inds + 1] = first
 
 
     @staticmethod
@@ -72,20 +88,33 @@ class Bitcrusher:
             amount: 1-100+
         """
         print("  Stretch-Unstretch Bitcrusher, {0}%...".format(amount))
-        rec.stretch(1/amount)
-        rec.stretch(amount)
+        shrunk = Resample.stretch(rec.arr, 1/amount)
+        rec.arr = Resample.stretch(shrunk, amount)
 
 
 
 class Oscillator:
 
     @staticmethod
-    def tremelo(rec, rate, depth, stereo_width, starting_phase=0):
+    def tremelo(rec, rate, depth, stereo_width=0, starting_phase=0):
         """
-        cat:
-        desc: oscillate volume
+        1, 12; 10, 90;
+        oscillate volume
+            rate: oscillations per second
+            depth: 0-100%, how far the volume dips
+            stereo_width: 0-100%, phase offset of the right channel (100% is opposite phase)
+            starting_phase: 0-1, fraction of a cycle to begin at
         """
-        pass
+        rate = inpt_validate(rate, 'freq')
+        depth = inpt_validate(depth, 'pcnt', allowed=[0, 100])
+        stereo_width = inpt_validate(stereo_width, 'pcnt', allowed=[0, 100])
+        starting_phase = inpt_validate(starting_phase, 'float', allowed=[0, 1])
+        print("  Tremelo at {0}, {1} deep...".format(rate, depth))
+        period = rate.get_period(rec.rate.magnitude)
+        depth = depth.to("dimensionless").magnitude
+        phases = [starting_phase, starting_phase + stereo_width.to("dimensionless").magnitude / 2]
+        gain = Envelope.lfo(rec.size_samps().magnitude, period, depth, phases)
+        Envelope.apply(rec.arr, gain)
 
 
 
@@ -97,21 +126,25 @@ def scrambler(obj, amount):
         amount: number of scrambles to perform, integer >=1; 1, 10;
     """
     amount = inpt_validate(amount, "int", allowed=[1, None])
-    while amount >= 1:
-        print("  scrambling, {0} to go...".format(amount))
-        chunk = obj.rate // rd.randint(2, 8)
-        start = rd.randint(0, len(obj.arr) - chunk)
-        new = rd.randint(0, len(obj.arr) - chunk)
+    # every scramble's draws at once. moves keep the length, so each chunk's
+    # places can be drawn before any chunk moves
+    rng = Chance.rng("scrambler")
+    chunks = int(obj.rate.magnitude) // rng.integers(2, 9, amount)
+    chunks = np.minimum(chunks, len(obj.arr))
+    starts = rng.integers(0, len(obj.arr) - chunks + 1)
+    news = rng.integers(0, len(obj.arr) - chunks + 1)
+    for i, (chunk, start, new) in enumerate(zip(chunks, starts, news)):
+        print("  scrambling, {0} to go...".format(amount - i))
         chunk_arr = obj.arr[start:start+chunk]
         obj.arr = np.concatenate((obj.arr[:start], obj.arr[start+chunk:]))
         obj.arr = np.concatenate((obj.arr[:new], chunk_arr, obj.arr[new:]))
-        amount -= 1
 
 
 
 class Dynamics:
 
     @staticmethod
+    @float_process
     def muffler(rec, amount):
         """
         1, 10;
@@ -119,17 +152,27 @@ class Dynamics:
             amount: int: number of reps
         """
         print("  muffling {0}x...".format(amount))
+        length = rec.arr.shape[0]
         for i in range(int(amount)):
-            for ind in range(1, rec.size_samps() - 1):
-                if (ind + i) % 2 == 0:
-                    rec.arr[ind][0] = (rec.arr[ind - 1][0] + rec.arr[ind + 1][0]) / 2
-                else:
-                    rec.arr[ind][1] = (rec.arr[ind - 1][1] + rec.arr[ind + 1][1]) / 2
+            # each pass replaces every other sample of a channel with the average of
+            # its neighbours (a [0.5, 0, 0.5] kernel), left on samples where ind + i
+            # is even and right on the rest. neighbours are always of the other
+            # parity, so one strided slice does a whole channel
+            for channel, first in ((0, i % 2), (1, 1 - i % 2)):
+                first = first if first >= 1 else 2
+                if first > length - 2:
+                    continue
+                col = rec.arr[:, channel]
+                col[first : length - 1 : 2] = (col[first - 1 : length - 2 : 2] + col[first + 1 : length : 2]) / 2
 
     @staticmethod
-    def eq(rec):
-        freqs = np.fft.rfft(rec.arr)
-        print(freqs)
+    def eq(rec, bands):
+        """
+        filter through a bank of eq bands at once
+            bands: list of (kind, freq hz, gain db, q), see filters.Biquad
+        """
+        print("  equalizing {0} bands...".format(len(bands)))
+        Equalizer(bands, rec.rate.magnitude).apply(rec.arr)
 
 
 
@@ -167,6 +210,19 @@ all pulses are too quiet
 
 
 class Reverb1():
+    """
+    reverb from sound bouncing between nodes in a room. the node graph is
+    rendered once into a stereo impulse response, cached by room parameters, and
+    applied by partitioned fft convolution
+    """
+
+    # impulse responses by (size, dampening, spread, rate)
+    _ir_cache = {}
+    # reflections quieter than this are dropped
+    threshold = 0.005
+    # cap on impulse response length, for rooms that barely dampen
+    max_ir_secs = 20
+    speed_of_sound = 343
 
     def __init__(self, rec, size, dampening=50, wet=50, dry=80, roughness=50, spread=50):
         """
@@ -176,29 +232,25 @@ class Reverb1():
         section_head("Reverb1")
         self.rec = rec
         self.size = inpt_validate(size, 'float', allowed=[1, None])
-        self.dampening = inpt_validate(dampening, 'pcnt', allowed=[0, None]) * 1/100
-        self.wet = inpt_validate(wet, 'pcnt', allowed=[0, None])
-        self.dry = inpt_validate(dry, 'pcnt', allowed=[0, None])
-        self.rate = rec.rate
-        self.spread = inpt_validate(spread, 'pcnt', allowed=[0, 200]) * 1/100
+        self.dampening = inpt_validate(dampening, 'pcnt', allowed=[0, 100]).to("dimensionless").magnitude
+        self.wet = inpt_validate(wet, 'pcnt', allowed=[0, None]).to("dimensionless").magnitude
+        self.dry = inpt_validate(dry, 'pcnt', allowed=[0, None]).to("dimensionless").magnitude
+        self.rate = rec.rate.magnitude
+        self.spread = inpt_validate(spread, 'pcnt', allowed=[0, 200]).to("dimensionless").magnitude
 
         self.nodes = []
         # self.add_node(0,size)
-        self.add_node(size, 0)
-        self.add_node(-size, 0)
+        self.add_node(self.size, 0)
+        self.add_node(-self.size, 0)
         # self.add_node(0, -size)
 
-        # source must init before set_other_nodes
         self.listener = Reverb1.Reverb1_Listener(self, 0, 0)
-        self.source = Reverb1.Reverb1_Source(self, rec.arr, 0, size/2)
+        self.source = Reverb1.Reverb1_Source(self, 0, self.size/2)
 
         self.set_other_nodes()
 
         # do the reverb
-        self.source.start()
-
-        # clean up
-        self.collect()
+        self.apply(self.impulse_response())
 
 
     def add_node(self, x, y):
@@ -208,8 +260,10 @@ class Reverb1():
 
     def set_other_nodes(self):
         """
-        set other_nodes attr for each node, [node, dist]
+        set other_nodes attr for each node, [node, angle, dist]
         """
+        for ind, this_node in enumerate(self.nodes):
+            this_node.ind = ind
         for this_node in self.nodes:
             for other_node in self.nodes:
                 if other_node != this_node:
@@ -227,18 +281,122 @@ class Reverb1():
     def node_dist(self, a, b):
         return math.sqrt((b.y - a.y)**2 + (b.x - a.x)**2)
 
+    def delay(self, dist):
+        """
+        travel time of dist meters, in samples
+        """
+        return int(dist / self.speed_of_sound * self.rate)
 
-    def collect(self):
+
+    def impulse_response(self):
+        """
+        (samples, in channel, out channel) response of the room, from the cache
+        if this room has been rendered before
+        """
+        key = (self.size, self.dampening, self.spread, self.rate)
+        try:
+            return Reverb1._ir_cache[key]
+        except KeyError:
+            pass
+        info_line("rendering impulse response...")
+        ir = self.render_ir()
+        if len(Reverb1._ir_cache) > 16:
+            Reverb1._ir_cache.clear()
+        Reverb1._ir_cache[key] = ir
+        return ir
+
+    def render_ir(self):
+        """
+        send a unit pulse through the node graph. every path that arrives at a
+        node at the same offset from the same source edge is merged, so each round
+        of bounces is one set of array operations. the source mixes its channels
+        toward each node, and a path stops once it is below threshold for that
+        mix, as a full-scale sample would. the listener pans by the angle each
+        reflection arrives from
+        """
+        max_len = int(self.max_ir_secs * self.rate)
+        ir = np.zeros((max_len, 2, 2))
+        used = 0
+        keep = 1 - self.dampening
+
+        # input channel weights of each edge out of the source
+        edge_weights = []
+        # arrivals at reflecting nodes: source edge, node index, offset, paths
+        edges, inds, offsets = [], [], []
+        for node, angle, dist in self.source.other_nodes:
+            if node.purpose == 'node':
+                pan = angle_to_pan(angle) * self.spread
+                edges.append(len(edge_weights))
+                edge_weights.append([1 - pan, 1 + pan])
+                inds.append(node.ind)
+                offsets.append(self.delay(dist))
+        edge_weights = np.array(edge_weights, dtype=np.float64)
+        edges, inds, offsets = np.array(edges), np.array(inds), np.array(offsets)
+        counts = np.ones(edges.shape[0])
+
+        amp = 1.0
+        while inds.shape[0] > 0:
+            # each arrival is dampened by the node it bounces off
+            amp *= keep
+            live = amp * edge_weights >= self.threshold
+            if not np.any(live):
+                break
+            weights = counts[:, None] * np.where(live, edge_weights, 0)[edges]
+            next_edges, next_inds, next_offsets, next_counts = [], [], [], []
+            for node in self.nodes:
+                if node.purpose != 'node':
+                    continue
+                here = inds == node.ind
+                if not np.any(here):
+                    continue
+                for other, angle, dist in node.other_nodes:
+                    arrive = offsets[here] + self.delay(dist)
+                    fits = arrive < max_len
+                    if other.purpose == 'listener':
+                        pan = angle_to_pan(angle) * 0.5
+                        contrib = amp * weights[here][fits][:, :, None] * np.array([0.5 - pan, 0.5 + pan])
+                        np.add.at(ir, arrive[fits], contrib)
+                        if np.any(fits):
+                            used = max(used, np.max(arrive[fits]) + 1)
+                    elif other.purpose == 'node':
+                        next_edges.append(edges[here][fits])
+                        next_inds.append(np.full(np.count_nonzero(fits), other.ind))
+                        next_offsets.append(arrive[fits])
+                        next_counts.append(counts[here][fits])
+            if not next_inds:
+                break
+            edges = np.concatenate(next_edges)
+            inds = np.concatenate(next_inds)
+            offsets = np.concatenate(next_offsets)
+            counts = np.concatenate(next_counts)
+            # merge paths arriving from the same edge at the same node and time
+            keys, inverse = np.unique((edges * len(self.nodes) + inds) * max_len + offsets,
+                return_inverse=True)
+            counts = np.bincount(inverse, weights=counts)
+            edges = keys // max_len // len(self.nodes)
+            inds = keys // max_len % len(self.nodes)
+            offsets = keys % max_len
+
+        return ir[:used]
+
+
+    def apply(self, ir):
+        """
+        convolve rec with the impulse response, and mix wet with dry
+        """
         # handle slight lag at beginning
-        pre_offset = int(self.node_dist(self.listener, self.source) / 343 * self.rate)
-        wet_arr = self.listener.wet_out[pre_offset:]
-        wet = Recording(
-            array=wet_arr,
-            name='reverb_wet_out'
-        )
-        wet.amplify(self.wet * 1/100)
-        self.rec.amplify(self.dry * 1/100)
-        self.rec.arr = mix(self.rec, wet, name='temp_mix').arr
+        pre_offset = self.delay(self.node_dist(self.listener, self.source))
+        ir = ir[pre_offset:]
+        dtype = self.rec.arr.dtype
+        arr = SampleFormat.to_float(self.rec.arr)
+        dry = arr * self.dry
+        if ir.shape[0] == 0:
+            self.rec.arr = SampleFormat.convert(dry, dtype)
+            return
+        info_line("convolving...")
+        wet = Convolver.convolve(arr, ir) * self.wet
+        wet[:dry.shape[0]] += dry
+        self.rec.arr = SampleFormat.convert(wet, dtype)
 
 
     class Reverb1_Node():
@@ -259,74 +417,24 @@ class Reverb1():
                 return (self.__class__ == other.__class__) and (self.x == other.x) and (self.y == other.y)
             except:
                 return False
-            
-        def bounce(self, samp, in_angle, offset):
-            """
-            samp_data as [sample, offset in samples]
-            pass single sample of audio, will return that sample
-            """
-            samp *= (1 - self.parent.dampening)
-            # too quiet now
-            if samp < 0.005:
-                return
-            for n in self.other_nodes:
-                # i as [node, angle, dist]
-                new_offset = int(offset + (n[2] / 343 * self.parent.rate))
-                n[0].bounce(samp, n[1], new_offset)
 
 
     class Reverb1_Source(Reverb1_Node):
 
-        def __init__(self, parent, arr, x, y):
+        def __init__(self, parent, x, y):
             super().__init__(parent, x, y)
-            self.arr = arr
             self.parent.nodes.append(self)
             self.purpose = 'source'
 
 
-        def start(self):
-            for samp_ind in range(len(self.arr)):
-                if samp_ind % self.parent.rate == 0:
-                    info_line("{0} seconds computed".format(samp_ind / self.parent.rate))
-                samp = self.arr[samp_ind]
-                for n in self.other_nodes:
-                    if n[0].purpose != 'listener':
-                        # n as [node, angle, dist]
-                        pan = angle_to_pan(n[1]) * self.parent.spread
-                        samp_val = (samp[0] * (1 - pan)) + (samp[1] * (1 + pan))
-                        offset = int(n[2] / 343 * self.parent.rate) + samp_ind
-                        n[0].bounce(samp_val, n[1], offset)
-
-
-        def bounce(self, samp, in_angle, offset):
-            pass
-
-
     class Reverb1_Listener(Reverb1_Node):
 
         def __init__(self, parent, x, y):
             super().__init__(parent, x, y)
             self.parent.nodes.append(self)
-            self.wet_out = [[0, 0] for _ in range(len(self.parent.rec.arr))]
             self.purpose = 'listener'
 
 
-        def bounce(self, samp, in_angle, offset):
-            """
-            sets data to self.wet_out
-            """
-            pan = angle_to_pan(in_angle) * 0.5
-            samp_val = [samp * (0.5 - pan), samp * (0.5 + pan)]
-            error = True
-            while error:
-                try:
-                    self.wet_out[offset][0] += samp_val[0]
-                    self.wet_out[offset][1] += samp_val[1]
-                    error = False
-                except IndexError:
-                    self.wet_out += [[0, 0] for _ in range(1 + offset - len(self.wet_out))]
-
-
 
 
 def get_effects():
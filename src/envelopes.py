@@ -0,0 +1,182 @@
+"""
+gain envelopes: curves of per-sample gain, applied to audio arrays with a
+single broadcast multiply. shared by fades, tremolo, controller automation,
+and synth voices
+
+curve kinds:
+    linear: straight line
+    exponential: slow start, fast finish when rising (and the mirror when falling)
+    equal_power: quarter-sine, constant power across crossfades
+    smooth: raised-cosine s-curve
+    hard: holds the start value, jumping to the end value after the curve
+"""
+
+import numpy as np
+
+from src.errors import *
+from src.sample_format import SampleFormat
+
+
+class Envelope:
+    """
+    staticmethod class for creating and applying gain envelopes
+    """
+
+    kinds = ("linear", "exponential", "equal_power", "smooth", "hard")
+    # hard has no ramp to fade along
+    fade_kinds = ("linear", "exponential", "equal_power", "smooth")
+
+    # steepness of the exponential curve
+    exp_steepness = 5
+
+    @staticmethod
+    def validate_kind(kind, kinds=None):
+        """
+        check kind is one of kinds (default Envelope.kinds), raises ValueError on failure
+        """
+        if kinds is None:
+            kinds = Envelope.kinds
+        if kind is None:
+            return kinds[0]
+        kind = str(kind).lower().strip().replace("-", "_")
+        if kind in ("exp",):
+            kind = "exponential"
+        elif kind in ("equal", "power", "eq_power"):
+            kind = "equal_power"
+        if kind not in kinds:
+            raise ValueError("Unknown envelope curve '{0}', must be one of '{1}'".format(
+                kind, "', '".join(kinds)))
+        return kind
+
+    @staticmethod
+    def curve(length, kind="linear", start=0.0, end=1.0):
+        """
+        gain array of length samples, moving from start to end (end itself is
+        reached on the sample after the curve)
+        """
+        kind = Envelope.validate_kind(kind)
+        length = max(int(length), 0)
+        prog = np.arange(length) / max(length, 1)
+        rising = end >= start
+
+        if kind == "linear":
+            shape = prog
+        elif kind == "exponential":
+            k = Envelope.exp_steepness
+            if rising:
+                shape = np.expm1(k * prog) / np.expm1(k)
+            else:
+                shape = 1 - np.expm1(k * (1 - prog)) / np.expm1(k)
+        elif kind == "equal_power":
+            if rising:
+                shape = np.sin(prog * np.pi / 2)
+            else:
+                shape = 1 - np.cos(prog * np.pi / 2)
+        elif kind == "smooth":
+            shape = 0.5 - 0.5 * np.cos(prog * np.pi)
+        else:
+            shape = np.zeros(length)
+
+        return start + (end - start) * shape
+
+    @staticmethod
+    def apply(arr, gain, start=0):
+        """
+        multiply arr in place by gain, beginning at sample index start. gain may be
+        1d (same for all channels) or (samples, channels). parts of the envelope
+        that fall outside arr are ignored, and integer samples are rounded and
+        clipped. returns arr
+        """
+        start = int(start)
+        gain = np.asarray(gain)
+        g_start = max(0, -start)
+        a_start = max(0, start)
+        a_end = min(arr.shape[0], start + gain.shape[0])
+        if a_end <= a_start:
+            return arr
+        gain = gain[g_start : g_start + a_end - a_start]
+        if gain.ndim < arr.ndim:
+            gain = gain.reshape((-1,) + (1,) * (arr.ndim - gain.ndim))
+        SampleFormat.multiply(arr[a_start:a_end], gain)
+        return arr
+
+    @staticmethod
+    def fade_in(arr, length, start=0, kind="linear"):
+        """
+        fade arr in place from silence over length samples from start
+        """
+        kind = Envelope.validate_kind(kind, Envelope.fade_kinds)
+        return Envelope.apply(arr, Envelope.curve(length, kind, 0.0, 1.0), start)
+
+    @staticmethod
+    def fade_out(arr, length, end=None, kind="linear"):
+        """
+        fade arr in place to silence over length samples ending at end
+        (default end of arr)
+        """
+        kind = Envelope.validate_kind(kind, Envelope.fade_kinds)
+        if end is None:
+            end = arr.shape[0]
+        length = int(length)
+        gain = Envelope.curve(length, kind, 1.0, 0.0)
+        return Envelope.apply(arr, gain, int(end) - length)
+
+    @staticmethod
+    def lfo(length, period, depth=1.0, phase=0.0):
+        """
+        oscillating gain for tremolo. dips from 1 down to 1 - depth and back once
+        per period samples. phase is fraction of a cycle to start at. pass an array
+        of phases to get one column per phase
+        """
+        phase = np.asarray(phase, dtype=np.float64)
+        cycles = np.arange(int(length)) / float(period)
+        if phase.ndim > 0:
+            cycles = cycles[:, None]
+        return 1 - depth * (0.5 - 0.5 * np.cos(2 * np.pi * (cycles + phase)))
+
+    @staticmethod
+    def adsr(offsets, gate, attack, decay, sustain, release):
+        """
+        attack-decay-sustain-release gain at offsets samples into a note held for
+        gate samples. gate may be an array, one per offset, to shape many notes
+        at once. rises from 0 to 1 over attack, falls to sustain over decay, and
+        from wherever it is when the gate ends, to 0 over release. attack, decay,
+        release: samples
+        """
+        offsets = np.asarray(offsets, dtype=np.float64)
+        gate = np.asarray(gate, dtype=np.float64)
+        attack, decay, release = max(attack, 1), max(decay, 1), max(release, 1)
+        # level while held, at each offset and at the gate's end
+        def held(t):
+            return np.where(t < attack, t / attack, 
+                np.maximum(1 - (1 - sustain) * (t - attack) / decay, sustain))
+        released = held(gate) * np.maximum(1 - (offsets - gate) / release, 0)
+        return np.where(offsets < gate, held(offsets), released)
+
+    @staticmethod
+    def automation(points, length, default=1.0):
+        """
+        piecewise envelope from (sample index, value, change type) points, where
+        change type is the curve kind leading up to that point. the first value is
+        held before the first point and the last after the last point
+        """
+        length = int(length)
+        out = np.full(length, float(default))
+        if len(points) == 0:
+            return out
+        points = sorted(points, key=lambda x: x[0])
+        first_ind, first_val = int(points[0][0]), float(points[0][1])
+        out[:max(min(first_ind, length), 0)] = first_val
+
+        prev_ind, prev_val = first_ind, first_val
+        for ind, val, kind in points[1:]:
+            ind, val = int(ind), float(val)
+            seg = Envelope.curve(ind - prev_ind, kind, prev_val, val)
+            lo, hi = max(prev_ind, 0), min(ind, length)
+            if hi > lo:
+                out[lo:hi] = seg[lo - prev_ind : hi - prev_ind]
+            prev_ind, prev_val = ind, val
+
+        if prev_ind < length:
+            out[max(prev_ind, 0):] = prev_val
+        return out
@@ -0,0 +1,126 @@
+"""
+equalizer filters: iir biquads from the rbj audio eq cookbook, cascaded as
+second-order sections. audio runs through the cascade a block at a time, the
+filter state carried between blocks, so any length of audio filters in
+constant memory, and blocks of a render stream filter the same as one array
+
+band kinds:
+    peak: boost or cut around freq
+    lowshelf, highshelf: boost or cut everything below / above freq
+    lowpass, highpass: remove everything above / below freq (gain unused)
+"""
+
+import numpy as np
+from scipy import signal
+
+from src.errors import *
+from src.sample_format import SampleFormat
+
+
+class Biquad:
+    """
+    staticmethod class for designing single biquad sections
+    """
+
+    kinds = ("peak", "lowshelf", "highshelf", "lowpass", "highpass")
+
+    @staticmethod
+    def validate_kind(kind):
+        """
+        check kind is one of Biquad.kinds, raises ValueError on failure
+        """
+        kind = str(kind).lower().strip().replace("_", "").replace("-", "").replace(" ", "")
+        if kind not in Biquad.kinds:
+            raise ValueError("Unknown filter '{0}', must be one of '{1}'".format(
+                kind, "', '".join(Biquad.kinds)))
+        return kind
+
+    @staticmethod
+    def design(kind, freq, rate, gain=0, q=0.7071):
+        """
+        one second-order section [b0, b1, b2, 1, a1, a2]
+            freq: center or corner frequency in hz, below rate / 2
+            gain: db to boost, negative to cut
+            q: width of peaks and steepness of corners and shelves
+        """
+        kind = Biquad.validate_kind(kind)
+        if not 0 < freq < rate / 2:
+            raise ValueError("Filter frequency {0}hz must be between 0 and {1}hz".format(freq, rate / 2))
+        if q <= 0:
+            raise ValueError("Filter q must be greater than 0, got {0}".format(q))
+        a = 10 ** (gain / 40)
+        w0 = 2 * np.pi * freq / rate
+        cos = np.cos(w0)
+        alpha = np.sin(w0) / (2 * q)
+        shelf = 2 * np.sqrt(a) * alpha
+
+        if kind == "peak":
+            b = [1 + alpha * a, -2 * cos, 1 - alpha * a]
+            den = [1 + alpha / a, -2 * cos, 1 - alpha / a]
+        elif kind == "lowshelf":
+            b = [a * ((a + 1) - (a - 1) * cos + shelf), 2 * a * ((a - 1) - (a + 1) * cos),
+                a * ((a + 1) - (a - 1) * cos - shelf)]
+            den = [(a + 1) + (a - 1) * cos + shelf, -2 * ((a - 1) + (a + 1) * cos),
+                (a + 1) + (a - 1) * cos - shelf]
+        elif kind == "highshelf":
+            b = [a * ((a + 1) + (a - 1) * cos + shelf), -2 * a * ((a - 1) + (a + 1) * cos),
+                a * ((a + 1) + (a - 1) * cos - shelf)]
+            den = [(a + 1) - (a - 1) * cos + shelf, 2 * ((a - 1) - (a + 1) * cos),
+                (a + 1) - (a - 1) * cos - shelf]
+        elif kind == "lowpass":
+            b = [(1 - cos) / 2, 1 - cos, (1 - cos) / 2]
+            den = [1 + alpha, -2 * cos, 1 - alpha]
+        else:
+            b = [(1 + cos) / 2, -(1 + cos), (1 + cos) / 2]
+            den = [1 + alpha, -2 * cos, 1 - alpha]
+        return np.array(b + den) / den[0]
+
+
+class Equalizer:
+    """
+    a cascade of biquad bands, filtering audio block by block
+        bands: list of (kind, freq, gain, q)
+        rate: samples per second, as a number
+    """
+
+    block_size = 2 ** 16
+
+    def __init__(self, bands, rate):
+        self.bands = list(bands)
+        self.rate = rate
+        self.sos = np.array([Biquad.design(kind, freq, rate, gain, q) for kind, freq, gain, q in self.bands])
+        self.state = None
+
+    def reset(self):
+        """
+        forget the audio filtered so far, to start on new audio
+        """
+        self.state = None
+
+    def process(self, block):
+        """
+        filter the next (frames, channels) block of a stream, returning floats.
+        usable as a RenderNode effect
+        """
+        block = SampleFormat.to_float(block)
+        if self.state is None:
+            self.state = np.zeros((self.sos.shape[0], 2) + block.shape[1:])
+        out, self.state = signal.sosfilt(self.sos, block, axis=0, zi=self.state)
+        return out.astype(block.dtype, copy=False)
+
+    def apply(self, arr):
+        """
+        filter all of arr in place, a block at a time, in any sample format
+        """
+        self.reset()
+        for start in range(0, arr.shape[0], self.block_size):
+            block = arr[start : start + self.block_size]
+            block[...] = SampleFormat.convert(self.process(block), arr.dtype)
+        return arr
+
+    def response(self, freqs):
+        """
+        gain in db of the whole cascade at each of freqs, in hz
+        """
+        _, h = signal.sosfreqz(self.sos, worN=np.asarray(freqs, dtype=np.float64), fs=self.rate)
+        return 20 * np.log10(np.maximum(np.abs(h), 1e-12))
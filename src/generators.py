@@ -1,9 +1,14 @@
+import sys
+
 import numpy as np
-import random as rd
 
+from src.chance import Chance
 from src.recording_obj import Recording
 from src.integraters import mix, mix_multiple, concatenate
 from src.data_types import *
+from src.input_processing import inpt_validate
+from src.oscillator import Oscillator
+from src.voices import Voice
 
 
 class BaseGenerator:
@@ -14,10 +19,7 @@ class BaseGenerator:
         generate sine wave by period and dur, shift and amp.
         dur, period, shift: samples
         """
-        factor = 2 * np.pi / period
-        return amp * np.sin(
-            (np.arange(int(dur)) - shift) * factor
-        )
+        return amp * np.sin(2 * np.pi * Oscillator.phases(dur, 1 / period, 1, -shift / period))
     
     @staticmethod
     def wave_point(index_or_arr, period, shift=0, amp=1):
@@ -28,7 +30,56 @@ class BaseGenerator:
         return amp * np.sin(
             (index_or_arr - shift) * factor
         )
-    
+
+    @staticmethod
+    def samples(dur, rate):
+        """
+        duration in samples at rate. numbers are seconds, strings beats or seconds
+        """
+        if isinstance(dur, (int, float)):
+            return int(round(dur * rate))
+        dur = inpt_validate(dur, 'beatsec')
+        return int(round(dur.to_secs().magnitude * rate))
+
+    @staticmethod
+    def wave_rec(waveform, note, dur, amp, rate, name, bandlimit=True, parent=None):
+        """
+        Recording of one note of waveform
+        """
+        freq = inpt_validate(note, 'freq')
+        length = BaseGenerator.samples(dur, rate)
+        amp = inpt_validate(amp, 'float', allowed=[0, 2])
+        arr = Oscillator.render(waveform, length, freq.frequency, rate, amp=amp, bandlimit=bandlimit)
+        source_block = {"generator": waveform,
+                        "frequency": freq,
+                        "duration": dur,
+                        "amplitude": amp}
+        return Recording(mode="create", arr=NpOps.stereoify(arr), source_block=source_block, 
+            rate=rate, name=name, parent=parent)
+
+    @staticmethod
+    def note_rows(notes, rate):
+        """
+        (freq hz, start sample, duration samples) rows of (note, start, duration)
+        notes, start and duration as in samples()
+        """
+        return [(inpt_validate(note, 'freq').frequency, BaseGenerator.samples(start, rate), 
+            BaseGenerator.samples(dur, rate)) for note, start, dur in notes]
+
+    @staticmethod
+    def notes_rec(waveform, notes, amp, rate, name, bandlimit=True, source_block=None, parent=None):
+        """
+        Recording of many notes of waveform, rendered together
+            notes: list of (note, start, duration), start and duration as in samples()
+        """
+        rows = BaseGenerator.note_rows(notes, rate)
+        arr = Oscillator.render_notes(waveform, rows, rate, amp=amp, bandlimit=bandlimit)
+        if source_block is None:
+            source_block = {"generator": waveform,
+                            "notes": len(rows),
+                            "amplitude": amp}
+        return Recording(mode="create", arr=NpOps.stereoify(arr), source_block=source_block, 
+            rate=rate, name=name, parent=parent)
 
 
 
@@ -40,7 +91,7 @@ class Generator:
     class SimpleWave:
 
         @staticmethod
-        def sine(note, dur, amp=0.1, rate=44100, name=None):
+        def sine(note, dur, amp=0.1, rate=44100, name=None, parent=None):
             """
             sine wave generator
                 freqency (Hz)
@@ -49,19 +100,10 @@ class Generator:
             returns Recording obj
             """
             print("\nGenerating simple sine wave ...")
-            freq = RelPitch.valid_freq(note)
-            dur = RelTime.valid_beatsec(dur).samps()
-            amp = inpt_validate(amp, 'flt', allowed=[0, 2])
-            arr = BaseGenerator.wave(dur, freq.get_period(rate), shift=0, amp=amp)
-            source_block = {"type": "generator",
-                            "name": sys._getframe().f_code.co_name,
-                            "note": freq,
-                            "duration": dur,
-                            "amplitude": amp}
-            return Recording(array=arr, source_block=source_block, rate=rate, name=name)
+            return BaseGenerator.wave_rec("sine", note, dur, amp, rate, name, parent=parent)
 
         @staticmethod
-        def square(note, dur, amp=0.05, rate=44100, name=None):
+        def square(note, dur, amp=0.05, rate=44100, name=None, parent=None):
             """
                 freqency (Hz)
                 duration (secs)
@@ -69,21 +111,21 @@ class Generator:
                 rate (sps) 44100 
             """
             print("\nGenerating simple square wave ...")
-            freq = RelPitch.valid_freq(note)
-            dur = RelSecs.valid_beatsec(dur)
-            period = freq.get_period(rate)
-            period_arr = [amp] * (period // 2) + [-amp] * ((period + 1) // 2)
-            arr = period_arr * int(freq * dur)
-            arr = arr[:int(rate * dur)]
-            arr = [[i, i] for i in arr]
-            source_block = {"generator": sys._getframe().f_code.co_name,
-                            "frequency": note,
-                            "duration": dur,
-                            "amplitude": amp}
-            return Recording(array=arr, source_block=source_block, rate=rate, name=name)
+            return BaseGenerator.wave_rec("square", note, dur, amp, rate, name, parent=parent)
 
         @staticmethod
-        def triangle(freq, dur, amp=0.1, rate=44100, name=None):
+        def saw(note, dur, amp=0.05, rate=44100, name=None, parent=None):
+            """
+                freqency (Hz)
+                duration (secs)
+                amplitude (0-1) 0.05 default
+                rate (sps) 44100 
+            """
+            print("\nGenerating simple saw wave ...")
+            return BaseGenerator.wave_rec("saw", note, dur, amp, rate, name, parent=parent)
+
+        @staticmethod
+        def triangle(freq, dur, amp=0.1, rate=44100, name=None, parent=None):
             """
                 freqency (Hz)
                 duration (secs)
@@ -91,102 +133,130 @@ class Generator:
                 rate (sps) 44100 
             """
             print("\nGenerating simple triangle wave ...")
-            freq = RelPitch.valid_freq(freq)
-            dur = RelSecs.valid_beatsec(dur)
-            period = int(rate / freq)
-            period_arr = []
-            delta = 4 * amp / period # amount change per sample
-            val = 0 # value of sample
-            for _ in range(period):
-                period_arr.append([val, val])
-                val += delta
-                if abs(val) > (amp + 0.001):
-                    delta *= -1
-            arr = period_arr * int(freq * dur * 1.1)
-            arr = arr[:int(rate * dur)]
-            source_block = {"generator": sys._getframe().f_code.co_name, 
-                            "frequency": freq,
-                            "duration": dur,
-                            "amplitude": amp}
-            return Recording(array=arr, source_block=source_block, rate=rate, name=name)
+            return BaseGenerator.wave_rec("triangle", freq, dur, amp, rate, name, parent=parent)
 
         @staticmethod
-        def triangle_2(freq, dur, amp=0.1, rate=44100, name=None):
+        def triangle_2(freq, dur, amp=0.1, rate=44100, name=None, parent=None):
             """
+            triangle without band-limiting, sharper but aliased at high pitches
                 freqency (Hz)
                 duration (secs)
                 amplitude (0-1) 0.05 default
                 rate (sps) 44100 
             """
             print("\nGenerating simple triangle wave ...")
-            freq = RelPitch.valid_freq(freq)
-            dur = RelSecs.valid_beatsec(dur)
-            period = int(rate / freq)
-            arr = []
-            delta = 4 * amp / period # amount change per sample
-            val = 0 # value of sample
-            for _ in range(int(dur * rate)):
-                arr.append([val, val])
-                val += delta
-                if abs(val) > (amp + 0.001):
-                    delta *= -1
-            source_block = {"generator": sys._getframe().f_code.co_name, 
-                            "frequency": freq,
-                            "duration": dur,
-                            "amplitude": amp}
-            return Recording(array=arr, source_block=source_block, rate=rate, name=name)
+            return BaseGenerator.wave_rec("triangle", freq, dur, amp, rate, name, bandlimit=False, parent=parent)
+
+        @staticmethod
+        def noise(dur, amp=0.05, rate=44100, name=None, parent=None):
+            """
+                duration (secs)
+                amplitude (0-1) 0.05 default
+                rate (sps) 44100 
+            """
+            print("\nGenerating white noise ...")
+            return BaseGenerator.wave_rec("noise", 1, dur, amp, rate, name, parent=parent)
+
+        @staticmethod
+        def notes(waveform, notes, amp=0.1, rate=44100, name=None, parent=None):
+            """
+            many notes or chords of one waveform in one recording
+                waveform: one of Oscillator.waveforms
+                notes: list of (note, start, duration) (secs)
+                amplitude (0-1) 0.1 default
+            """
+            print("\nGenerating {0} {1} notes ...".format(len(notes), waveform))
+            return BaseGenerator.notes_rec(waveform, notes, amp, rate, name, parent=parent)
 
 
     class Synth:
 
+        patches = {
+            # four octaves of square, rising to the note
+            "square": Voice([("square", 2 ** -i, 1) for i in range(4)], attack=0.005, decay=0, 
+                sustain=1, release=0.005),
+            "organ": Voice([("sine", ratio, 1 / ratio) for ratio in (1, 2, 3, 4, 6, 8)], attack=0.02, 
+                decay=0.05, sustain=0.9, release=0.08),
+            "pluck": Voice([("saw", 1, 1), ("triangle", 2, 0.5)], attack=0.002, decay=0.4, 
+                sustain=0, release=0.05),
+            "pad": Voice([("saw", 1, 0.5), ("saw", 1.005, 0.5), ("triangle", 0.5, 0.5)], attack=0.4, 
+                decay=0.5, sustain=0.7, release=0.8),
+        }
+
+        @staticmethod
+        def validate_patch(patch):
+            """
+            check patch is a name in Synth.patches, or a Voice
+            """
+            if isinstance(patch, Voice):
+                return patch
+            try:
+                return Generator.Synth.patches[str(patch).lower().strip()]
+            except KeyError:
+                raise ValueError("Unknown synth patch '{0}', must be one of '{1}'".format(
+                    patch, "', '".join(Generator.Synth.patches)))
+
         @staticmethod
-        def square_synth_1(freq, dur, amp=0.1, rate=44100, name=None):
+        def square_synth_1(freq, dur, amp=0.1, rate=44100, name=None, parent=None):
             """
             simple synth from square waves
                 freqency, duration, amplitude
             returns Recording obj
             """
             print("\nGenerating square synth 1...")
-            freq = RelPitch.valid_freq(freq)
-            dur = RelSecs.valid_beatsec(dur)
-            a = []
-            note = freq / (2 ** 4)
-            for i in range(1, 5):
-                a.append(Generator.SimpleWave.square(note * (2 ** i), dur, amp=amp, name="synth tone"))
-            rec = mix_multiple(*a)
             source_block = {"generator": sys._getframe().f_code.co_name, 
                             "frequency": freq,
                             "duration": dur,
                             "amplitude": amp}
-            rec.source_block = source_block
-            return rec
+            return Generator.Synth.notes("square", [(freq, 0, dur)], amp, rate, name, 
+                source_block=source_block, parent=parent)
+
+        @staticmethod
+        def notes(patch, notes, amp=0.1, rate=44100, name=None, source_block=None, parent=None):
+            """
+            polyphony on one synth patch, every note rendered into one recording
+                patch: name in Synth.patches, or a Voice
+                notes: list of (note, start, duration) (secs)
+                amplitude (0-1) 0.1 default
+            """
+            voice = Generator.Synth.validate_patch(patch)
+            rows = BaseGenerator.note_rows(notes, rate)
+            arr = voice.render(rows, rate, amp=amp)
+            if source_block is None:
+                source_block = {"generator": "synth",
+                                "patch": patch if isinstance(patch, str) else "custom",
+                                "notes": len(rows),
+                                "amplitude": amp}
+            return Recording(mode="create", arr=NpOps.stereoify(arr), source_block=source_block, 
+                rate=rate, name=name, parent=parent)
 
 
     class Click:
 
         @staticmethod
-        def clip_click(amp=0.5):
-            array = [
-                [amp, amp]
-            ]
+        def clip_click(amp=0.5, name=None, parent=None):
+            array = np.full((1, 2), amp)
             source_block = {"generator": sys._getframe().f_code.co_name, 
                             "amplitude": amp}
             return Recording(
-                array=array,
-                source_block=source_block
+                mode="create",
+                arr=array,
+                source_block=source_block,
+                name=name,
+                parent=parent
             )
 
         @staticmethod
-        def clip_click2(amp=0.5):
-            array = []
-            for _ in range(300):
-                a = rd.random() * amp
-                array.append([a, a])
+        def clip_click2(amp=0.5, name=None, parent=None):
+            array = NpOps.stereoify(Chance.rng("click").random(300) * amp)
             source_block = {"generator": sys._getframe().f_code.co_name,
                             "amplitude": amp}
             return Recording(
-                array=array,
-                source_block=source_block
+                mode="create",
+                arr=array,
+                source_block=source_block,
+                name=name,
+                parent=parent
             )
 
 
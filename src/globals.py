@@ -134,11 +134,13 @@ class _SettingsContainer:
 
     debug = None
     autosave = None
+    memmap = False
 
     # default setting values, not to be confused with __defaults__
     _defaults = {
         "debug": True,
-        "autosave": False
+        "autosave": False,
+        "memmap": False
     }
 
 
@@ -225,6 +227,25 @@ class Settings():
         info_block("Debug is now off")
         _SettingsContainer.debug = False
 
+    @staticmethod
+    def is_memmap():
+        return _SettingsContainer.memmap
+
+    @staticmethod
+    @public_process
+    def memmap_on():
+        """
+        desc: memory-map audio files instead of reading them into memory. audio is saved as float wavs, so it can be mapped on the next load
+        """
+        info_block("Memory-mapped audio is now on")
+        _SettingsContainer.memmap = True
+
+    @staticmethod
+    @public_process
+    def memmap_off():
+        info_block("Memory-mapped audio is now off")
+        _SettingsContainer.memmap = False
+
     @staticmethod
     @public_process
     def restore_defaults():
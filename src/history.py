@@ -0,0 +1,165 @@
+"""
+undo history for audio objects. each edit is kept as the one region of
+audio it replaced, found by comparing the audio before and after the edit,
+so undoing costs time and memory in the size of the change, not the recording
+
+    delta: frames [start, start + new_length) of the edited audio replaced
+        old, and attrs held these values before
+"""
+
+from collections import deque
+
+import numpy as np
+
+from src.errors import *
+
+
+class EditDelta:
+    """
+    one edit, as the region of audio it replaced
+        name: process that made the edit
+        start: first frame that changed
+        old: frames from start before the edit
+        new_length: number of frames that replaced old
+        attrs: {attribute name: value before the edit}
+    """
+
+    def __init__(self, name, start, old, new_length, attrs):
+        self.name = name
+        self.start = start
+        self.old = old
+        self.new_length = new_length
+        self.attrs = attrs
+
+    def __repr__(self):
+        return "{0}: {1:,} samples at {2:,}".format(self.name, self.old.shape[0], self.start)
+
+    def nbytes(self):
+        return self.old.nbytes
+
+    def apply(self, obj):
+        """
+        revert this edit on obj, returning the delta that re-does it
+        """
+        end = self.start + self.new_length
+        current = obj.arr[self.start : end].copy()
+        if self.old.shape[0] == self.new_length:
+            obj.arr[self.start : end] = self.old
+        else:
+            obj.arr = np.concatenate((obj.arr[:self.start], self.old, obj.arr[end:]))
+        current_attrs = {k: getattr(obj, k) for k in self.attrs}
+        for k, v in self.attrs.items():
+            setattr(obj, k, v)
+        return EditDelta(self.name, self.start, current, self.old.shape[0], current_attrs)
+
+
+class EditHistory:
+    """
+    bounded undo and redo history of one object's arr, and the attrs that
+    edits can change. the oldest edits are dropped first, past max_edits or
+    once deltas total more than max_bytes
+    """
+
+    max_edits = 20
+    max_bytes = 2 ** 28
+    tracked_attrs = ("pan_val", "rate")
+
+    def __init__(self, max_edits=None, max_bytes=None):
+        if max_edits is not None:
+            self.max_edits = max_edits
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self.undos = deque()
+        self.redos = []
+        self.before = None
+
+    def __len__(self):
+        return len(self.undos)
+
+    def begin(self, obj):
+        """
+        call before an edit to obj
+        """
+        attrs = {k: getattr(obj, k) for k in self.tracked_attrs if hasattr(obj, k)}
+        self.before = (np.array(obj.arr, copy=True), attrs)
+
+    def commit(self, obj, name):
+        """
+        call after the edit begun with begin(), to record what it changed
+        """
+        if self.before is None:
+            raise UnexpectedIssue("EditHistory.commit called without begin")
+        before, attrs = self.before
+        self.before = None
+        changed_attrs = {k: v for k, v in attrs.items() if getattr(obj, k) != v}
+        region = EditHistory.diff(before, np.asarray(obj.arr))
+        if region is None and not changed_attrs:
+            return
+        if region is None:
+            region = (0, before[:0], 0)
+        start, old, new_length = region
+        self.undos.append(EditDelta(name, start, old, new_length, changed_attrs))
+        self.redos.clear()
+        self.evict()
+
+    def evict(self):
+        total = sum(d.nbytes() for d in self.undos)
+        # the newest edit always stays undoable
+        while len(self.undos) > 1 and (len(self.undos) > self.max_edits or total > self.max_bytes):
+            total -= self.undos.popleft().nbytes()
+
+    def undo(self, obj):
+        """
+        revert the last edit, returning it, or None with nothing to undo
+        """
+        if not self.undos:
+            return None
+        delta = self.undos.pop()
+        self.redos.append(delta.apply(obj))
+        return delta
+
+    def redo(self, obj):
+        """
+        re-apply the last undone edit, returning it, or None with nothing to redo
+        """
+        if not self.redos:
+            return None
+        delta = self.redos.pop()
+        self.undos.append(delta.apply(obj))
+        return delta
+
+    @staticmethod
+    def diff(before, after):
+        """
+        smallest single region of before that after replaced, as (start, old
+        frames, length of the frames replacing them), or None if they are equal
+        """
+        if before.shape[1:] != after.shape[1:]:
+            return 0, before.copy(), after.shape[0]
+        length = min(before.shape[0], after.shape[0])
+        b = before.reshape((before.shape[0], -1))
+        a = after.reshape((after.shape[0], -1))
+
+        # common prefix, then the common suffix not overlapping it
+        start = EditHistory.matching_frames(b[:length], a[:length])
+        if start == length and before.shape[0] == after.shape[0]:
+            return None
+        remaining = length - start
+        suffix = EditHistory.matching_frames(
+            b[b.shape[0] - remaining:][::-1], a[a.shape[0] - remaining:][::-1])
+        old = before[start : before.shape[0] - suffix].copy()
+        return start, old, after.shape[0] - suffix - start
+
+    @staticmethod
+    def matching_frames(b, a, chunk=2 ** 16):
+        """
+        number of leading frames that b and a share, comparing a chunk at a time
+        so that a difference near the start stops the scan early
+        """
+        for chunk_start in range(0, b.shape[0], chunk):
+            b_chunk = b[chunk_start : chunk_start + chunk]
+            a_chunk = a[chunk_start : chunk_start + chunk]
+            if not np.array_equal(b_chunk, a_chunk):
+                differs = (b_chunk != a_chunk).any(axis=1)
+                return chunk_start + int(np.argmax(differs))
+        return b.shape[0]
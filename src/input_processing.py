@@ -37,10 +37,14 @@ def do_allowed(method, val, mode, allowed):
         val, allowed = val
     try:
         if allowed is not None:
+            # bounds already converted by the method (ie percent()) aren't validated
+            # again, which would recurse
             if allowed[0] is not None: 
-                assert val >= inpt_validate(allowed[0], mode)
+                low = allowed[0] if isinstance(allowed[0], Units.Quant) else inpt_validate(allowed[0], mode)
+                assert val >= low
             if allowed[1] is not None: 
-                assert val <= inpt_validate(allowed[1], mode)
+                high = allowed[1] if isinstance(allowed[1], Units.Quant) else inpt_validate(allowed[1], mode)
+                assert val <= high
     except AssertionError:
         p("> Invalid: value '{0}' must be ".format(val) + allowed_repr(allowed))
         raise TryAgain
@@ -175,12 +179,8 @@ class _InptValidate:
             raise TryAgain
         if allowed is None:
             allowed = [0, None]
-        try:
-            allowed[0] = Units.pcnt(allowed[0])
-        except: pass
-        try:
-            allowed[1] = Units.pcnt(allowed[1])
-        except: pass
+        # converted copy, so re-prompts don't convert the caller's bounds twice
+        allowed = [i if (i is None or isinstance(i, Units.Quant)) else Units.pcnt(i) for i in allowed]
     
         return (val, allowed)
 
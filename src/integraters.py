@@ -1,4 +1,10 @@
+import soundfile as sf
+
+from src.data_types import *
+from src.errors import *
+from src.output_and_prompting import section_head
 from src.recording_obj import Recording
+from src.sample_format import SampleFormat
 from src.utility import *
 
 
@@ -15,44 +21,95 @@ def mix(rec1, rec2, mix_level=None, offset=0, name=None):
         mix_level: 0-1: post-mix amplification
     """
     section_head("Mixing '" + rec1.name + "' and '" + rec2.name + "' ...")
-    if rec1.rate != rec2.rate:
-        raise RateError("Two recordings must have the same sample rate to be mixed")
-    offset = samps(offset)
-    arr1 = rec1.get_panned_rec__()
-    arr2 = rec2.get_panned_rec__()
-    total_length = arr1.shape[0] if arr1.shape[0] > offset + arr2.shape[0] else arr2.shape[0]
-    # mixing
-    mix_arr = np.zeros((total_length, 2))
-    mix_arr[ 0 : arr1.shape[0]] = arr1
-    mix_arr[ offset : offset + arr2.shape[0]] = arr2
-    mix_arr *= mix_level
-    # format
-    source_block = ["mix", rec1.name + " with " + rec2.name]
-    mix_rec = Recording(mix_arr, source_block=source_block, name=name)
+    if mix_level is None:
+        mix_level = 1.0
+    mix_rec = mix_multiple(rec1, [rec2, offset], mix_level=mix_level, name=name)
+    mix_rec.source_block = {"mix": rec1.name + " with " + rec2.name}
     return mix_rec
 
 
 
-def mix_multiple(*args, mix_level=1.0, name=None):
+def mix_items(args):
     """
-    Mix multiple recording objected together
+    normalize mix_multiple args to a list of [rec, offset in samples]
+    """
+    def is_pair(i):
+        return isinstance(i, (list, tuple)) and len(i) == 2 and \
+            not isinstance(i[1], (list, tuple)) and not hasattr(i[1], "arr")
+    # a single list of recs or pairs, instead of them as separate args
+    if len(args) == 1 and isinstance(args[0], (list, tuple)) and not is_pair(args[0]):
+        args = args[0]
+    items = []
+    for i in args:
+        offset = 0
+        if isinstance(i, (list, tuple)):
+            i, offset = i[0], i[1]
+        items.append([i, ind(Units.samps(offset))])
+    return items
+
+
+def mix_multiple(*args, mix_level=1.0, name=None, dtype=None, outfile=None, chunk_size=None):
+    """
+    Mix multiple recording objected together. the output length is found first,
+    then one buffer is allocated and each panned, offset input is added in place
         *args: Rec objects to mix, or list of lists as [rec obj, offset (beat/sec)]
         mix_level: post-mix amplification
+        dtype: accumulation dtype, ie np.float32 to halve memory. default is the
+            float dtype of the project's sample format
+        outfile: if given, the mix is written to this wav file a chunk at a time,
+            never held in memory whole, and the path is returned instead of a Recording
+        chunk_size: samples per chunk when writing to outfile
     """
     section_head("Mixing Multiple ...")
-    rec1 = args[0]
-    if isinstance(rec1, (list, tuple)):
-        rec1 = args[0][0]
-    for rec2 in args[1:]:
-        offset2 = 0
-        if isinstance(rec2, (list, tuple)):
-            offset2 = rec2[1]
-            rec2 = rec2[0]
-        rec1 = mix(rec1, rec2, offset=offset2, name="mix multiple")
+    items = mix_items(args)
+    if not items:
+        raise ValueError("Nothing to mix")
+    rate = items[0][0].rate
+    for rec, _ in items:
+        if rec.rate != rate:
+            raise RateError("All recordings must have the same sample rate to be mixed")
+    if dtype is None:
+        dtype = SampleFormat.float_dtype()
+    total_length = max(offset + rec.arr.shape[0] for rec, offset in items)
+
+    if outfile is not None:
+        return mix_to_file(items, total_length, rate, outfile, mix_level, dtype, chunk_size)
+
+    # mixing
+    mix_arr = np.zeros((total_length, 2), dtype=dtype)
+    for rec, offset in items:
+        mix_arr[offset : offset + rec.arr.shape[0]] += rec.get_panned_rec()
     if mix_level != 1.0:
-        rec1.amplify(mix_level)
-    rec1.rename(name)
-    return rec1
+        mix_arr *= mix_level
+    # format
+    source_block = {"mix": ", ".join(rec.name for rec, _ in items)}
+    return Recording(mode="create", arr=mix_arr, source_block=source_block, 
+        name=name, rate=rate.magnitude)
+
+
+def mix_to_file(items, total_length, rate, outfile, mix_level=1.0, dtype=None, chunk_size=None):
+    """
+    mix [rec, offset] items into a wav file, one chunk of output at a time
+    """
+    if dtype is None:
+        dtype = SampleFormat.float_dtype()
+    if chunk_size is None:
+        chunk_size = 2 ** 20
+    chunk_size = int(chunk_size)
+    with sf.SoundFile(outfile, mode="w", samplerate=int(rate.magnitude), channels=2) as f:
+        for start in range(0, total_length, chunk_size):
+            end = min(start + chunk_size, total_length)
+            chunk = np.zeros((end - start, 2), dtype=dtype)
+            for rec, offset in items:
+                # part of this rec that falls in the chunk
+                lo = max(start, offset)
+                hi = min(end, offset + rec.arr.shape[0])
+                if hi > lo:
+                    chunk[lo - start : hi - start] += rec.get_panned_rec(rec.arr[lo - offset : hi - offset])
+            if mix_level != 1.0:
+                chunk *= mix_level
+            f.write(chunk)
+    return outfile
 
 
 
@@ -16,7 +16,6 @@ _rel_data format:
 
 
 from enum import Enum, auto
-import random as rd
 import re
 from inspect import signature, Parameter
 import functools
@@ -109,10 +108,10 @@ class RelData:
         for i in self.args:
             info_line("• " + i.get_display(), indent=8)
 
-    def get_random_defaults(self):
+    def get_random_defaults(self, rng):
         defs = []
         for i in self.args:
-            d = i.choose_random_defaults()
+            d = i.choose_random_default(rng)
             if d is None:
                 break
             defs.append(d)
@@ -156,11 +155,11 @@ class ArgData:
             string = "[" + string + "]"
         return string
 
-    def choose_random_default(self):
+    def choose_random_default(self, rng):
         if None in self.defaults:
             return None
         else:
-            num = rd.random()
+            num = rng.random()
             arg = (self.defaults[0] * (1 - num)) + (self.defaults[1] * (num))
             return arg
 
@@ -0,0 +1,219 @@
+"""
+oscillator engine: waveforms from phase accumulators, as numpy arrays. each
+sample's phase is its position in the cycle, 0 to 1, so a whole note is a
+handful of array operations, and a whole score of notes is the same
+operations on every note's samples at once
+
+waveforms:
+    sine
+    square, saw, triangle: band-limited by default, read from wavetables
+        holding only the harmonics below nyquist. without wavetables, polyblep
+        (square, saw) and polyblamp (triangle) corrections at each corner
+        remove most of the aliasing of their naive forms
+    noise: white noise
+"""
+
+import numpy as np
+
+from src.chance import Chance
+from src.errors import *
+from src.wavetable import Wavetable
+
+
+class Oscillator:
+    """
+    staticmethod class for rendering waveforms
+    """
+
+    waveforms = ("sine", "square", "saw", "triangle", "noise")
+    # band-limited square, saw and triangle are read from wavetables, instead
+    # of computed with polyblep corrections
+    use_wavetables = True
+    # samples of notes rendered at once by render_notes, to bound memory
+    batch_samples = 2 ** 16
+
+    @staticmethod
+    def validate_waveform(waveform):
+        """
+        check waveform is one of Oscillator.waveforms, raises ValueError on failure
+        """
+        waveform = str(waveform).lower().strip()
+        if waveform not in Oscillator.waveforms:
+            raise ValueError("Unknown waveform '{0}', must be one of '{1}'".format(
+                waveform, "', '".join(Oscillator.waveforms)))
+        return waveform
+
+    @staticmethod
+    def phases(length, freq, rate, phase=0):
+        """
+        cycle position of each of length samples, starting at phase (0 to 1).
+        freq is hz, or an array of hz per sample for slides
+        """
+        if np.ndim(freq) == 0:
+            return Oscillator.wrap(phase + np.arange(int(length)) * (freq / rate))
+        increments = np.asarray(freq, dtype=np.float64)[:int(length)] / rate
+        # each sample starts where the one before it left off
+        return Oscillator.wrap(phase + np.cumsum(increments) - increments)
+
+    @staticmethod
+    def render(waveform, length, freq, rate, phase=0, amp=1, bandlimit=True, rng=None):
+        """
+        length samples of waveform at freq hz
+        """
+        waveform = Oscillator.validate_waveform(waveform)
+        phases = Oscillator.phases(length, freq, rate, phase)
+        increments = np.asarray(freq, dtype=np.float64) / rate
+        if increments.ndim > 0:
+            increments = increments[:phases.shape[0]]
+        return amp * Oscillator.shape(waveform, phases, increments, bandlimit, rng)
+
+    @staticmethod
+    def shape(waveform, phases, increments, bandlimit=True, rng=None):
+        """
+        waveform values at phases, each advancing by its increment per sample,
+        or all by one increment
+        """
+        if waveform == "noise":
+            rng = Chance.rng("noise") if rng is None else rng
+            return rng.uniform(-1, 1, phases.shape[0])
+        if waveform == "sine":
+            return np.sin(2 * np.pi * phases)
+        if bandlimit and Oscillator.use_wavetables:
+            return Wavetable.read(waveform, phases, increments)
+        if waveform == "saw":
+            wave = 2 * phases - 1
+            if bandlimit:
+                Oscillator.add_residual(wave, Oscillator.polyblep, phases, increments, -1)
+        elif waveform == "square":
+            wave = np.where(phases < 0.5, 1.0, -1.0)
+            if bandlimit:
+                Oscillator.add_residual(wave, Oscillator.polyblep, phases, increments, 1)
+                Oscillator.add_residual(wave, Oscillator.polyblep, Oscillator.wrap(phases + 0.5), increments, -1)
+        else:
+            # rising through 0 at phase 0, like the sine
+            wave = 4 * np.abs(Oscillator.wrap(phases + 0.75) - 0.5) - 1
+            if bandlimit:
+                # corners turn the slope by 8 per cycle: down at the peak, up at the trough
+                Oscillator.add_residual(wave, Oscillator.polyblamp, Oscillator.wrap(phases + 0.75), increments, -8)
+                Oscillator.add_residual(wave, Oscillator.polyblamp, Oscillator.wrap(phases + 0.25), increments, 8)
+        return wave
+
+    @staticmethod
+    def wrap(phases):
+        """
+        phases % 1, faster for floats
+        """
+        return phases - np.floor(phases)
+
+    @staticmethod
+    def add_residual(wave, residual, phases, increments, scale):
+        """
+        add scale times a corner residual to wave, at the samples within one
+        increment of phase 0. polyblamp residuals scale with the increment
+        """
+        near = np.flatnonzero((phases < increments) | (phases > 1 - increments))
+        if near.shape[0] == 0:
+            return
+        inc = increments[near] if np.ndim(increments) > 0 else increments
+        if residual is Oscillator.polyblamp:
+            scale = scale * inc
+        wave[near] += scale * residual(phases[near], inc)
+
+    @staticmethod
+    def polyblep(phases, increments):
+        """
+        residual of a band-limited step at phase 0, for phases within one increment of it
+        """
+        t = np.where(phases < increments, phases, phases - 1) / increments
+        return np.where(t >= 0, 2 * t - t * t - 1, t * t + 2 * t + 1)
+
+    @staticmethod
+    def polyblamp(phases, increments):
+        """
+        residual of a band-limited corner at phase 0, for phases within one increment of it
+        """
+        t = np.where(phases < increments, phases / increments - 1, (phases - 1) / increments + 1)
+        cubes = t * t * t / 3
+        return np.where(phases < increments, -cubes, cubes)
+
+    @staticmethod
+    def read_notes(notes, amp=1):
+        """
+        (freqs, starts, durations, amplitudes) arrays of (freq hz, start sample,
+        duration samples[, amplitude]) rows, in order of start, so each batch of
+        notes adds into one short stretch of the buffer
+        """
+        notes = np.atleast_2d(np.asarray(notes, dtype=np.float64))
+        if notes.size == 0:
+            notes = np.zeros((0, 3))
+        notes = notes[np.argsort(notes[:, 1], kind="stable")]
+        freqs = notes[:, 0]
+        starts = notes[:, 1].astype(np.int64)
+        durs = np.maximum(notes[:, 2].astype(np.int64), 0)
+        amps = notes[:, 3] * amp if notes.shape[1] > 3 else np.full(notes.shape[0], float(amp))
+        return freqs, starts, durs, amps
+
+    @staticmethod
+    def note_batches(counts):
+        """
+        yield (slice of notes, first sample of each note, offset of every sample
+        within its note) for batches of whole notes about batch_samples long,
+        where notes are counts samples long
+        """
+        ends = np.cumsum(counts)
+        first = 0
+        while first < counts.shape[0]:
+            last = max(np.searchsorted(ends, ends[first] - counts[first] + Oscillator.batch_samples, side="right"), first + 1)
+            batch = slice(first, last)
+            first = last
+            total = int(counts[batch].sum())
+            if total == 0:
+                continue
+            note_firsts = np.cumsum(counts[batch]) - counts[batch]
+            offsets = np.arange(total) - np.repeat(note_firsts, counts[batch])
+            yield batch, note_firsts, offsets
+
+    @staticmethod
+    def per_sample(values, counts):
+        """
+        each note's value repeated over its counts samples, or the value itself
+        for a lone note, which broadcasts the same and lets a wave read one table
+        """
+        if values.shape[0] == 1:
+            return values[0]
+        return np.repeat(values, counts)
+
+    @staticmethod
+    def add_notes(out, wave, starts, note_firsts, counts):
+        """
+        add each note, one contiguous run of wave, into out at its start
+        """
+        length = out.shape[0]
+        for start, note_first, count in zip(starts, note_firsts, counts):
+            lo, hi = max(start, 0), min(start + count, length)
+            if hi > lo:
+                out[lo:hi] += wave[note_first + lo - start : note_first + hi - start]
+
+    @staticmethod
+    def render_notes(waveform, notes, rate, length=None, amp=1, bandlimit=True, out=None, rng=None):
+        """
+        sum many notes into one mono buffer, all notes' samples computed together
+            notes: (freq hz, start sample, duration samples[, amplitude]) rows
+            length: buffer length, default the end of the last note
+            out: buffer to add into, instead of a new one
+        """
+        waveform = Oscillator.validate_waveform(waveform)
+        freqs, starts, durs, amps = Oscillator.read_notes(notes, amp)
+        if out is None:
+            if length is None:
+                length = int(np.max(starts + durs, initial=0))
+            out = np.zeros(int(length))
+
+        for batch, note_firsts, offsets in Oscillator.note_batches(durs):
+            counts = durs[batch]
+            increments = Oscillator.per_sample(freqs[batch] / rate, counts)
+            phases = Oscillator.wrap(offsets * increments)
+            wave = Oscillator.shape(waveform, phases, increments, bandlimit, rng)
+            wave *= Oscillator.per_sample(amps[batch], counts)
+            Oscillator.add_notes(out, wave, starts[batch], note_firsts, counts)
+        return out
@@ -263,7 +263,7 @@ def decimal_precision_requires(float_val):
     float_val = re.sub(r"9999999.$", "", float_val)
     no_trailing = str(float(float_val))
     decimal_ind = no_trailing.find(".")
-    if decimal_ind is not -1:
+    if decimal_ind != -1:
         if no_trailing[0] != "0":
             minim = 2
         else:
@@ -273,29 +273,49 @@ def decimal_precision_requires(float_val):
 
 
 
+def plot_channel(channel, start, rate):
+    """
+    seconds and values to plot for one rel_plot channel
+    """
+    channel = np.asarray(channel)
+    if channel.ndim == 1:
+        return (start + np.arange(channel.shape[0])) / rate, channel
+    return channel[:, 0] / rate, channel[:, 1]
+
+
+def decimate_points(x, y, points):
+    """
+    reduce a line of more than points points to the min and max of each of
+    points / 2 buckets, which draws the same outline at display resolution
+    """
+    if x.shape[0] <= points:
+        return x, y
+    edges = np.unique(np.linspace(0, x.shape[0], points // 2, endpoint=False).astype(np.int64))
+    lows = np.minimum.reduceat(y, edges)
+    highs = np.maximum.reduceat(y, edges)
+    return np.repeat(x[edges], 2), np.stack((lows, highs), axis=1).ravel()
+
+
+# most points a line plot draws per channel, about twice a screen's width in pixels
+plot_resolution = 4000
+
+
 def rel_plot(left_or_mono, start, end, rate, right=None, fill=None, title=None, 
         plot_type="line", obj_type=None, obj_name=None):
     """
-    left and right must be numpy arr with shape (x, 2) arrays of (index, value) to plot.
-    if right is not given, assumed to be mono left
+    left and right must be numpy arrays, either (x, 2) arrays of (index, value)
+    or 1d arrays of values for each sample from start. if right is not given,
+    assumed to be mono left. lines longer than plot_resolution are decimated
     """
     info_block("Generating plot...")
     fig = plt.gcf() # or pylab.gcf() ?
-    fig.canvas.set_window_title("{0} '{1}'".format(obj_type, obj_name))
+    manager = getattr(fig.canvas, "manager", None)
+    if manager is not None:
+        manager.set_window_title("{0} '{1}'".format(obj_type, obj_name))
 
     # channels
-    left = left_or_mono
-    if right is None:
-        right = left_or_mono
-    # fill
-    if fill is None:
-        try:
-            if min( (np.min(left[:,1]), np.min(right[:,1])) ) >= 0:
-                fill = True
-            else:
-                fill = False
-        except ValueError:
-            pass
+    left = np.asarray(left_or_mono)
+    right = left if right is None else np.asarray(right)
     # title
     if title is not None:
         fig.suptitle(title)
@@ -308,22 +328,23 @@ def rel_plot(left_or_mono, start, end, rate, right=None, fill=None, title=None,
     else:
         plot_func = plt.plot
 
-    # left: top, beats labels
-    axL = plt.subplot(211)
-    pos = axL.get_position()
-    pos.y0 -= 0.06
-    pos.y1 -= 0.06
-    axL.set_position(pos)
-    axL.xaxis.tick_top()
-    axL.xaxis.set_label_position('top')
-
-    rate = rate.to_rate().magnitude
-
+    rate = Units.rate(rate).magnitude
+    start = Units.samps(start)
+    end = Units.samps(end)
     start_beats = start.to_beats().magnitude
     end_beats = end.to_beats().magnitude
-    start = start.to_samps().round().magnitude
-    end = end.to_samps().round().magnitude
+    start = start.round().magnitude
+
+    secsL, valuesL = plot_channel(left, start, rate)
+    secsR, valuesR = plot_channel(right, start, rate)
+    if plot_type == "line":
+        secsL, valuesL = decimate_points(secsL, valuesL, plot_resolution)
+        secsR, valuesR = decimate_points(secsR, valuesR, plot_resolution)
+    # fill
+    if fill is None:
+        fill = valuesL.shape[0] > 0 and min(np.min(valuesL), np.min(valuesR)) >= 0
 
+    # beat ticks, placed at the seconds each beat falls on
     tick_size_beats = 1
     tick_number = end_beats - start_beats
     if tick_number < 2:
@@ -335,47 +356,36 @@ def rel_plot(left_or_mono, start, end, rate, right=None, fill=None, title=None,
     while tick_number < 5:
         tick_number *= 2
         tick_size_beats /= 2
-    tick_locs = []
-    tick_labels = []
-    for i in np.linspace(start_beats, end_beats, tick_number, endpoint=False):
-        tick_locs.append(i)
-        axL.axvline(i, linestyle="--", linewidth=0.3, color='#545454', 
-            clip_on=False, zorder=11)
-        tick_labels.append("{0:.{1}f}".format(i, decimal_precision_requires(i)))
-    plt.xticks(tick_locs, tick_labels)
+    tick_beats = np.arange(start_beats, end_beats, tick_size_beats)
+    tick_secs = tick_beats * Units.beats("1b").to_secs().magnitude
+    tick_labels = ["{0:.{1}f}".format(i, decimal_precision_requires(i)) for i in tick_beats]
+    tick_style = dict(linestyle="--", linewidth=0.3, color='#545454', clip_on=False, zorder=11)
+
+    # left: top, beats labels
+    axL = plt.subplot(211)
+    pos = axL.get_position()
+    pos.y0 -= 0.06
+    pos.y1 -= 0.06
+    axL.set_position(pos)
+    axL.xaxis.tick_top()
+    axL.xaxis.set_label_position('top')
+    axL.vlines(tick_secs, 0, 1, transform=axL.get_xaxis_transform(), **tick_style)
+    plt.xticks(tick_secs, tick_labels)
     for tick in axL.xaxis.get_major_ticks()[1::2]:
         tick.set_pad(15)
-
     plt.xlabel("Beats")
     plt.ylabel("Left amplitude")
-    if len(left.shape) == 1:
-        valuesL = left
-        indexesL = range(start, start + len(left))
-    else:
-        indexesL, valuesL = zip(*left)
-    indexesL = [i/rate for i in indexesL]
-    plot_func(indexesL, valuesL)
+    plot_func(secsL, valuesL)
 
     # right: bottom, seconds labels
     axR = plt.subplot(212)
     plt.xlabel("Seconds")
     plt.ylabel("Right amplitude")
-    if len(right.shape) == 1:
-        valuesR = right
-        indexesR = range(start, start + len(right))
-    else:
-        indexesR, valuesR = zip(*right)
-    indexesR = [i/rate for i in indexesR]
-    for i in np.linspace(start_beats, end_beats, tick_number, endpoint=False):
-        ind = Units.beats(str(i) + "b").to_secs().magnitude
-        axR.axvline(ind, linestyle="--", linewidth=0.3, color='#545454', 
-            clip_on=False, zorder=11)
-    plot_func(indexesR, valuesR)
+    axR.vlines(tick_secs, 0, 1, transform=axR.get_xaxis_transform(), **tick_style)
+    plot_func(secsR, valuesR)
 
     info_block("Viewing waveform...")
-    if fill and len(indexesR) < 1_000_000:
-        axR.fill_between(indexesR, valuesR, color='#43C6FF')
-        axL.fill_between(indexesL, valuesL, color='#43C6FF')
+    if fill:
+        axR.fill_between(secsR, valuesR, color='#43C6FF')
+        axL.fill_between(secsL, valuesL, color='#43C6FF')
     plt.show()
-
-
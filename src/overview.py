@@ -0,0 +1,170 @@
+"""
+waveform overviews: a recording's min and max sample over blocks, at a ladder
+of block sizes. any view window is drawn from the coarsest level that still
+resolves it, so drawing takes time in the width of the plot, not the length
+of the recording. overviews are saved next to the audio file they describe
+
+    level i: (blocks, 2 channels, 2) float32 array of [min, max] per block of
+        base_block * factor ** i frames
+"""
+
+import os
+import zlib
+
+import numpy as np
+
+from src.autosave import atomic_write
+from src.sample_format import SampleFormat
+
+
+class PeakPyramid:
+    """
+    min/max overview of one (frames, 2) array
+        levels: list of level arrays, finest first
+        frames: length of the array summarized
+        fingerprint: PeakPyramid.fingerprint of the array
+    """
+
+    base_block = 256
+    factor = 4
+    # levels stop once they are this short
+    min_blocks = 64
+    # buckets drawn across a view at the default 50% precision
+    screen_width = 1600
+
+    def __init__(self, levels, frames, fingerprint):
+        self.levels = levels
+        self.frames = frames
+        self.fingerprint = fingerprint
+
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    def block_size(self, level):
+        return self.base_block * self.factor ** level
+
+    @staticmethod
+    def build(arr):
+        """
+        overview of arr, reading it once
+        """
+        frames = arr.shape[0]
+        levels = []
+        if frames > 0:
+            level = PeakPyramid.reduce(arr, PeakPyramid.base_block)
+            levels.append(level)
+            while level.shape[0] > PeakPyramid.min_blocks:
+                level = np.stack((
+                    np.minimum.reduceat(level[:, :, 0], np.arange(0, level.shape[0], PeakPyramid.factor), axis=0),
+                    np.maximum.reduceat(level[:, :, 1], np.arange(0, level.shape[0], PeakPyramid.factor), axis=0),
+                ), axis=2)
+                levels.append(level)
+        return PeakPyramid(levels, frames, PeakPyramid.fingerprint(arr))
+
+    @staticmethod
+    def reduce(arr, block=None, edges=None):
+        """
+        [min, max] of arr per block of frames, or between edges, as -1 to 1 floats
+        """
+        if edges is None:
+            edges = np.arange(0, arr.shape[0], block)
+        lows = SampleFormat.to_float(np.minimum.reduceat(arr, edges, axis=0))
+        highs = SampleFormat.to_float(np.maximum.reduceat(arr, edges, axis=0))
+        return np.stack((lows, highs), axis=2).astype(np.float32)
+
+    @staticmethod
+    def fingerprint(arr):
+        """
+        cheap checksum of arr's length and a few thousand evenly spaced frames
+        """
+        step = max(arr.shape[0] // 4096, 1)
+        sample = np.ascontiguousarray(arr[::step])
+        return zlib.crc32(sample.tobytes(), arr.shape[0])
+
+    def matches(self, arr):
+        """
+        whether this overview was built from audio like arr
+        """
+        return arr.shape[0] == self.frames and PeakPyramid.fingerprint(arr) == self.fingerprint
+
+    def window(self, arr, start, end, buckets):
+        """
+        min and max of frames [start, end) of arr in about buckets equal
+        buckets. returns (first frame of each bucket, lows, highs), lows and
+        highs being (buckets, 2). windows too short for any level are reduced
+        from arr itself
+        """
+        start = max(int(start), 0)
+        end = min(int(end), self.frames)
+        buckets = max(int(buckets), 1)
+        per_bucket = (end - start) / buckets
+        if per_bucket <= 1:
+            window = SampleFormat.to_float(arr[start:end])
+            return np.arange(start, end), window, window
+
+        level = 0
+        while level < len(self.levels) and self.block_size(level) <= per_bucket:
+            level += 1
+        if level == 0:
+            # finer than the finest level
+            edges = np.unique(np.linspace(0, end - start, buckets, endpoint=False).astype(np.int64))
+            reduced = PeakPyramid.reduce(arr[start:end], edges=edges)
+            return start + edges, reduced[:, :, 0], reduced[:, :, 1]
+
+        level -= 1
+        block = self.block_size(level)
+        first = start // block
+        last = -(-end // block)
+        edges = np.unique(np.linspace(first, last, buckets, endpoint=False).astype(np.int64))
+        blocks = self.levels[level]
+        lows = np.minimum.reduceat(blocks[first:last, :, 0], edges - first, axis=0)
+        highs = np.maximum.reduceat(blocks[first:last, :, 1], edges - first, axis=0)
+        return np.maximum(edges * block, start), lows, highs
+
+    @staticmethod
+    def plot_points(positions, lows, highs):
+        """
+        (index, value) points for each channel tracing every bucket from its low
+        to its high, for rel_plot
+        """
+        indexes = np.repeat(positions, 2)
+        channels = []
+        for channel in range(lows.shape[1]):
+            values = np.stack((lows[:, channel], highs[:, channel]), axis=1).ravel()
+            channels.append(np.stack((indexes, values), axis=1))
+        return channels
+
+    @staticmethod
+    def sidecar_path(audio_path):
+        return audio_path + ".peaks"
+
+    def save(self, path):
+        """
+        write to path, through a temp file
+        """
+        arrays = {"level{0}".format(i): level for i, level in enumerate(self.levels)}
+        def write(temp):
+            with open(temp, "wb") as f:
+                np.savez(f, frames=self.frames, fingerprint=self.fingerprint, **arrays)
+        atomic_write(path, write)
+
+    @staticmethod
+    def load(path):
+        """
+        read an overview saved by save, or None if there is no readable one
+        """
+        try:
+            with np.load(path) as data:
+                levels = []
+                while "level{0}".format(len(levels)) in data:
+                    levels.append(data["level{0}".format(len(levels))])
+                return PeakPyramid(levels, int(data["frames"]), int(data["fingerprint"]))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -1,12 +1,14 @@
 
 
-import random as rd
+from inspect import signature
 
 from src.rel_objects import RelSavedObj, RelPublicObj
-from src.method_ops import public_process, is_public_process, rel_alias, is_alias
+from src.method_ops import (Category, add_reldata, public_process, is_public_process, 
+    rel_alias, is_alias, is_edit_meta, is_edit_rec)
 from src.input_processing import inpt, inpt_validate, input_dir, input_file, autofill
 from src.output_and_prompting import (p, info_title, info_list, info_line, 
     section_head, info_block, nl, err_mess, critical_err_mess, show_error, style)
+from src.autosave import writer
 from src.globals import RelGlobals, Settings
 from src.errors import *
 
@@ -52,10 +54,15 @@ def process_validate(command, obj):
         p("Save before exiting?")
         if inpt("yn"):
             obj.save()
+        flush_autosaves()
         info_block("Exiting processing of {0} '{1}'...".format(obj.reltype, obj.name))
         raise Cancel(obj)
     elif command[0] in ("o", "options"):
         obj.options()
+    elif command[0] == "script":
+        p("Select a script file of commands to run on {0} '{1}'".format(obj.reltype, obj.name))
+        with open(input_file(), "r") as f:
+            process_script(obj, f.read())
     elif command[0] in ("h", "help"):
         pass # callback handled during inpt()
     else:
@@ -98,6 +105,113 @@ def do_command(command, obj):
 
 
 
+def read_script(text):
+    """
+    commands of a script, separated by ';' or newlines. '#' comments out the
+    rest of a line
+    """
+    commands = []
+    for line in text.lower().splitlines():
+        line = line.split("#")[0]
+        for command in line.split(";"):
+            command = [inpt_validate(i, "arg") for i in command.split()]
+            if len(command) > 0:
+                commands.append(command)
+    return commands
+
+
+def validate_script(commands, obj):
+    """
+    (method name, method, args) of each command, or None if any is not a
+    process of obj or has the wrong number of arguments
+    """
+    all_methods = obj.get_all_public_method_names()
+    steps = []
+    valid = True
+    for i, command in enumerate(commands):
+        method_name, args = command[0], command[1:]
+        try:
+            method_name = autofill(method_name, all_methods, "arg")
+            method = obj.get_process(method_name)
+            signature(method).bind(*args)
+        except AutofillError as e:
+            err_mess("Command {0}: process '{1}' does not exist".format(i + 1, e.word))
+            valid = False
+        except TypeError as e:
+            err_mess("Command {0}: wrong arguments for '{1}': {2}".format(i + 1, method_name, str(e)))
+            valid = False
+        else:
+            steps.append((method_name, method, args))
+    return steps if valid else None
+
+
+def script_process(name, category):
+    """
+    stand-in for a whole script in pre and post processing, so undo snapshots
+    and saves happen once for all of its processes of category
+    """
+    def script():
+        pass
+    script.__name__ = name
+    add_reldata(script, "category", category)
+    return script
+
+
+def process_script(obj, text):
+    """
+    run a script's commands on obj as one batch. every command is checked
+    before any runs. returns whether all of them ran
+    """
+    steps = validate_script(read_script(text), obj)
+    if steps is None:
+        err_mess("Script not run")
+        return False
+    if len(steps) == 0:
+        err_mess("Script has no commands")
+        return False
+
+    name = "script ({0})".format(", ".join(i[0] for i in steps))
+    methods = [i[1] for i in steps]
+    stand_ins = []
+    if any(is_edit_rec(i) for i in methods):
+        stand_ins.append(script_process(name, Category.EDIT))
+    if any(is_edit_meta(i) for i in methods):
+        stand_ins.append(script_process(name, Category.META))
+
+    section_head("Running {0}".format(name))
+    for i in stand_ins:
+        pre_process(obj, i)
+    completed = True
+    try:
+        for method_name, method, args in steps:
+            info_title("{0} {1}".format(method_name, " ".join(args)))
+            method(*args)
+            # later processes must not read analyses of the audio before this edit
+            if is_edit_rec(method) and hasattr(obj, "drop_caches"):
+                obj.drop_caches()
+    except Exception as e:
+        completed = False
+        if not isinstance(e, Cancel):
+            err_mess("Script stopped at '{0}'".format(method_name))
+            show_error(e)
+    finally:
+        # processes that did run are saved, and undone together
+        for i in stand_ins:
+            post_process(obj, i)
+    return completed
+
+
+def flush_autosaves():
+    """
+    wait for background saves of edits to finish
+    """
+    try:
+        writer.flush()
+    except Exception as e:
+        err_mess("A background save failed!")
+        show_error(e, force=True)
+
+
 def pre_process(obj, method_obj):
     try:
         obj.pre_process(method_obj)
@@ -176,4 +290,7 @@ def processes_help():
     info_block("Which would use the default value 0, starting the fade-in " +\
         "at the beginning of the recording")
     info_block("Enter 'o' (the letter) to view processes")
+    info_block("Enter 'script' to run a file of commands, one per line or separated " + \
+        "by ';', such as 'trim 0 30; fade_in 2; amplify 0.8'. Every command is checked " + \
+        "before any run, and the whole script is saved and undone as one edit")
 
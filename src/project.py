@@ -3,6 +3,7 @@ project class
 """
 
 
+from src.chance import Chance
 from src.data_types import *
 from src.globals import RelGlobals, Settings
 from src.input_processing import inpt, inpt_validate, input_dir, input_file, autofill
@@ -16,6 +17,8 @@ from src.path import join_path, split_path
 from src.process import process
 from src.project_loader import ProjectLoader
 from src.recording_obj import Recording
+from src.render import Mixer, RecordingNode, play_file
+from src.sample_format import SampleFormat
 from src.sampler import Sampler
 from src.property import RelProperty
 
@@ -28,7 +31,8 @@ class Project(RelPublicObj, RelAudioObj):
     prop2 = RelProperty(name="prop2", inpt_mode="float", desc="number 2")
 
     def __init__(self, parent=None, name=None, rel_id=None, mode="load", path=None,
-            rate=None, reltype="Project", children=None, file=None, custom_path=True, **kwargs):
+            rate=None, reltype="Project", children=None, file=None, custom_path=True, 
+            sample_format=None, seed=None, **kwargs):
         
         super().__init__(rel_id=rel_id, reltype=reltype, name=name, 
             path=path, parent=parent, mode=mode, **kwargs)
@@ -46,9 +50,12 @@ class Project(RelPublicObj, RelAudioObj):
 
         self.children = children if children is not None else []
         self.rate = rate
+        self.sample_format = SampleFormat.validate(sample_format)
+        # mixes are streamed to the project's wav file, and not held in memory
         self.arr = None
-        if file is not None:
-            self.read_file()
+        # chance-based processes replay the same from the same seed
+        self.seed = Chance.new_seed() if seed is None else int(seed)
+        Chance.set_seed(self.seed)
 
         if mode == "create":
             self.save()
@@ -80,6 +87,7 @@ class Project(RelPublicObj, RelAudioObj):
         info_block("{0} '{1}'".format(self.reltype, self.name))
         info_line("Stored at '{0}'".format(self.path))
         info_line("Samplerate: {0}".format(self.rate))
+        info_line("Random seed: {0}".format(self.seed))
         self.list_children()
 
     @public_process
@@ -87,6 +95,51 @@ class Project(RelPublicObj, RelAudioObj):
         #TODO
         raise NotImplementedError
 
+    @public_process
+    def set_sample_format(self, sample_format=None):
+        """
+        cat: meta
+        desc: set the format this project's audio is held in. 'float32' halves memory, 'int16' quarters it
+        args:
+            [sample_format: one of 'float64' (default), 'float32', or 'int16']
+        """
+        if sample_format is None:
+            info_line("Current sample format: {0}".format(self.sample_format))
+            p("Select one of: {0}".format(", ".join(SampleFormat.formats)))
+            sample_format = inpt('alphanum')
+        while True:
+            try:
+                sample_format = SampleFormat.validate(sample_format)
+                break
+            except ValueError as e:
+                err_mess(str(e))
+                p("Select one of: {0}".format(", ".join(SampleFormat.formats)))
+                sample_format = inpt('alphanum')
+        section_head("Converting audio to {0}".format(sample_format))
+        self.sample_format = sample_format
+        for child in self.children:
+            recs = [child] if isinstance(child, Recording) else getattr(child, "smps", [])
+            for rec in recs:
+                if isinstance(rec, Recording):
+                    rec.arr = SampleFormat.convert(rec.arr, sample_format)
+            child.save()
+
+    @public_process
+    def set_seed(self, seed=None):
+        """
+        cat: meta
+        desc: set the seed of this project's randomness, so chance-based processes play out the same each time
+        args:
+            [seed: integer >=0, default a new random one]
+        """
+        if seed is None:
+            seed = Chance.new_seed()
+        seed = inpt_validate(seed, "int", allowed=[0, None])
+        self.seed = seed
+        Chance.set_seed(seed)
+        info_line("Random seed set to {0}".format(seed))
+        self.save()
+
     @public_process
     def save(self):
         """
@@ -97,22 +150,42 @@ class Project(RelPublicObj, RelAudioObj):
         for child in self.children:
             child.save()
 
-    @public_process
-    def mix(self):
+    @public_process("yn")
+    def mix(self, playback="n"):
         """
         cat: edit
-        desc: mix this project to a single audio track
+        desc: mix this project to a single audio track, rendered a block at a time straight to this project's wav file
+        args:
+            [playback: y/n, whether to play the mix while it renders. Default n]
+        """
+        section_head("Mixing {0} '{1}'".format(self.reltype, self.name))
+        self.render_to_file(self.get_audiofile_fullpath(), playback=playback)
+        info_line("Mix written to '{0}'".format(self.get_audiofile_fullpath()))
+        self.save_metadata()
+
+    def has_samplers(self):
+        return any(isinstance(i, Sampler) for i in self.children)
+
+    def mix_nodes(self, sampler_length=None):
         """
-        recs = []
+        render node of each child. sampler_length is samples of output for
+        every sampler, or None to ask for each
+        """
+        nodes = []
         for i in self.children:
             if isinstance(i, Recording):
-                recs.append(i)
+                nodes.append(RecordingNode(i))
             elif isinstance(i, Sampler):
-                recs.append(i.generate())
+                nodes.append(i.render_node(sampler_length))
             else:
                 raise UnexpectedIssue("Unknown child type '{0}'".format(type(i)))
-        mixed = mix_multiple(recs, name=self.name + "-mix")
-        self.arr = mixed
+        return nodes
+
+    def render_to_file(self, outfile, sampler_length=None, playback=False):
+        """
+        stream this project's mix to outfile, without changing the project
+        """
+        return Mixer(self.mix_nodes(sampler_length)).render_to_file(outfile, self.rate, playback=playback)
     
     @public_process("beatsec", "beatsec")
     def playback(self, duration=0, start=0):
@@ -123,7 +196,19 @@ class Project(RelPublicObj, RelAudioObj):
             [duration: beats or secs to playback for (enter 0 to playback all). Default 0]
             [start: beats/secs to start playback at. Default 0]
         """
-        self.arr.playback(duration, start)
+        if not os.path.exists(self.get_audiofile_fullpath()):
+            err_mess("This project has not been mixed yet!")
+            return
+        section_head("Playback of {0} '{1}'".format(self.reltype, self.name))
+        duration = None if duration <= 0 else ind(duration)
+        play_file(self.get_audiofile_fullpath(), duration, ind(start))
+
+    def parse_write_meta(self, attrs):
+        attrs = super().parse_write_meta(attrs)
+        # the mix lives on disk, not in arr
+        if os.path.exists(self.get_audiofile_fullpath()):
+            attrs["file"] = self.get_audiofile_fullpath()
+        return attrs
     
     @public_process
     def list_children(self):
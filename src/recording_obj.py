@@ -23,7 +23,6 @@ add_to_sampler
 
 import math
 import os
-import random as rd
 import re
 import sys
 import time
@@ -34,17 +33,25 @@ import soundfile as sf
 from pydub import AudioSegment as pd
 
 from src.analysis import Analysis
+from src.chance import Chance
 from src.data_types import *
+from src.envelopes import Envelope
+from src.filters import Biquad, Equalizer
 from src.errors import *
+from src.history import EditHistory
 from src.input_processing import inpt, inpt_validate, input_dir, input_file
-from src.method_ops import (Category, get_reldata, is_alias, is_public_process,
-                            public_process, rel_alias)
+from src.method_ops import (Category, get_reldata, is_alias, is_edit_rec,
+                            is_public_process, public_process, rel_alias)
 from src.output_and_prompting import (critical_err_mess, err_mess, info_block,
                                       info_line, info_list, info_title, nl, p,
-                                      section_head, show_error)
+                                      rel_plot, section_head, show_error)
+from src.overview import PeakPyramid
 from src.path import join_path, split_path
 from src.process import process
 from src.rel_objects import RelPublicObj, RelSavedObj, RelAudioObj
+from src.resampling import Resample
+from src.sample_format import SampleFormat
+from src.storage import is_mapped
 from src.utility import *
 
 
@@ -70,7 +77,9 @@ class Recording(RelPublicObj, RelAudioObj):
         rate (int): samples per second of this recording
         pan_val (float): number -1 (L) to 1 (R)
         parent: pointer to parent Proj or Sampler, if exists
-        recents: array of up to 5 recent arrs
+        history (EditHistory): undo and redo history of edits
+        overview (PeakPyramid or None): waveform overview, built on first view
+        spectra (dict): Spectral analyses of this audio, see Analysis.get_spectral
     """
 
     # Initialization #
@@ -94,14 +103,14 @@ class Recording(RelPublicObj, RelAudioObj):
         if name is None:
             self.rename()
 
-        # path
-        os.makedirs(self.get_path("recents", "dir"), exist_ok=True)
-
         # audio data
         self.rate = Units.rate(rate)
         self.source_block = {} if source_block is None else source_block
-        self.arr = np.asarray(arr)
+        self.arr = np.asarray(arr) if arr is None else SampleFormat.convert(arr)
         self.pan_val = pan_val
+        self.history = EditHistory()
+        self.overview = None
+        self.spectra = {}
 
         # mode
         if mode == "create":
@@ -168,7 +177,7 @@ class Recording(RelPublicObj, RelAudioObj):
             device=device_name)
         sd.wait()
         info_block("Finished recording")
-        self.arr = recording
+        self.arr = SampleFormat.convert(recording)
         if len(self.arr.shape) < 2:
             transpose = self.arr.reshape(-1, 1)
             self.arr = np.hstack((transpose, transpose))
@@ -181,39 +190,81 @@ class Recording(RelPublicObj, RelAudioObj):
     # Saving #
     def pre_process(self, process):
         """
-        actions to run before process: save current rec to 
+        actions to run before process: start recording the edit for undo
         """
-        if self.get_method(process).is_edit_rec():
-            self.update_recents()
+        if is_edit_rec(process):
+            self.history.begin(self)
 
     def post_process(self, process):
         """
         called after process calls method.
         """
-        if self.get_method(process).is_edit_rec():
-            self.save_audio()
+        super().post_process(process)
+        if is_edit_rec(process):
+            self.history.commit(self, process.__name__)
+            self.drop_caches()
+            # written in the background, so the next command can start right away
+            self.save_audio(wait=False)
+
+    def parse_write_meta(self, attrs):
+        attrs = super().parse_write_meta(attrs)
+        del attrs["history"]
+        del attrs["overview"]
+        del attrs["spectra"]
+        return attrs
 
-    def update_recents(self):
+    def get_overview(self):
         """
-        update recents arr to include last arr
+        waveform overview of the current audio: this object's, the one saved
+        next to the audio file, or a new one, which is then saved there
         """
-        recents_dir = self.get_path("recents", "dir")
-        os.rename(
-            self.get_path(self.get_data_filename(), "wav"),
-            join_path(recents_dir, str(time.time_ns()), ext=".wav")
-        )
+        if self.overview is not None and self.overview.matches(self.arr):
+            return self.overview
+        path = PeakPyramid.sidecar_path(self.get_audiofile_fullpath())
+        self.overview = PeakPyramid.load(path)
+        if self.overview is None or not self.overview.matches(self.arr):
+            self.overview = PeakPyramid.build(self.arr)
+            if os.path.isdir(os.path.dirname(path)):
+                self.overview.save(path)
+        return self.overview
+
+    def drop_caches(self):
+        """
+        forget the waveform overview and spectra, after an edit
+        """
+        self.overview = None
+        self.spectra.clear()
+        PeakPyramid.remove(PeakPyramid.sidecar_path(self.get_audiofile_fullpath()))
 
     @public_process
     def undo(self):
         """
         cat: save
-        desc: reverts to previous state (maximum of 5 times)
+        desc: reverts the last edit. the most recent 20 edits are kept, less for large edits
         """
         section_head("Undoing...")
-        if len(self.recents) != 0:
-            self.arr = self.recents.pop(0)
-        else:
+        delta = self.history.undo(self)
+        if delta is None:
             err_mess("No history to revert to!")
+        else:
+            info_line("undid {0}".format(delta))
+            self.drop_caches()
+            self.save_audio(wait=False)
+
+    @public_process
+    def redo(self):
+        """
+        cat: save
+        desc: re-apply the last undone edit
+        """
+        section_head("Redoing...")
+        delta = self.history.redo(self)
+        if delta is None:
+            err_mess("Nothing to redo!")
+        else:
+            info_line("redid {0}".format(delta))
+            self.drop_caches()
+            self.save_audio(wait=False)
 
     @public_process
     def export_to_wav(self, outfile=None):
@@ -252,6 +303,7 @@ class Recording(RelPublicObj, RelAudioObj):
         info_line("rate: {0}".format(self.rate))
         info_line("size: {0:.4f}, {1:,}".format(self.size_secs(), self.size_samps()))
         info_line("pan: {0}".format(self.pan_val))
+        info_line("storage: {0}".format("memory-mapped" if is_mapped(self.arr) else "in memory"))
 
     def size_samps(self):
         """
@@ -317,23 +369,21 @@ class Recording(RelPublicObj, RelAudioObj):
             end = self.size_samps()
         else:
             end = inpt_validate(end, 'beatsec')
-            if end.samples_value >= self.size_samps():
+            if ind(end) >= ind(self.size_samps()):
                 end = self.size_samps()
-        if end <= start:
+        if ind(end) <= ind(start):
             err_mess("End cannot be before or equal to start")
             return
         precision = inpt_validate(precision, 'pcnt', allowed=[5, 10000])
 
         info_block("Generating waveform at {0}%...".format(precision))
 
-        anlsys = Analysis(self, start=start, end=end)
-        frame_len = (end - start) / (precision * 2)
-        anlsys.set_frame_lengths(frame_len)
+        buckets = PeakPyramid.screen_width * precision.magnitude / 50
+        positions, lows, highs = self.get_overview().window(self.arr, ind(start), ind(end), buckets)
+        left, right = PeakPyramid.plot_points(positions, lows, highs)
 
-        left = anlsys.arr[:, 0]
-        right = anlsys.arr[:, 1]
-
-        anlsys.plot(left, right, fill=True)
+        rel_plot(left, start=start, end=end, rate=self.rate, right=right, fill=True,
+            obj_type=self.reltype, obj_name=self.name)
 
     # Metadata #
     @public_process
@@ -354,29 +404,27 @@ class Recording(RelPublicObj, RelAudioObj):
                 self.get_path(old_name, extension="wav"),
                 self.get_path(extension="wav")
             )
+            PeakPyramid.remove(PeakPyramid.sidecar_path(self.get_path(old_name, extension="wav")))
 
     # Simple edit processes #
     @public_process
-    def stretch(self, factor):
+    def stretch(self, factor, mode="nearest"):
         """
         cat: edit
         desc: stretch by a factor
         args:
             factor: number >0; 0.2, 3
+            [mode: interpolation, one of 'nearest', 'linear', or 'sinc'. default nearest]
         """
         factor = inpt_validate(factor, 'float', allowed=[0, None])
-        print("  stretching by a factor of {0:.4f}...".format(factor))
-        new_rec = []
-        factor_count = 0
-        for i in self.arr:
-            factor_count += factor
-            for _ in range(int(factor_count)):
-                new_rec.append(i)
-            factor_count -= int(factor_count)
-        self.arr = np.asarray(new_rec)
+        mode = Resample.validate_mode(mode)
+        print("  stretching by a factor of {0:.4f} ({1})...".format(factor, mode))
+        dtype = self.arr.dtype
+        stretched = Resample.stretch(SampleFormat.to_float(self.arr), factor, mode)
+        self.arr = SampleFormat.convert(stretched, dtype)
 
     @public_process
-    def sliding_stretch(self, i_factor, f_factor, start=0, end=None):
+    def sliding_stretch(self, i_factor, f_factor, start=0, end=None, mode="nearest"):
         """
         cat: edit
         desc: stretch by sliding amount
@@ -385,6 +433,7 @@ class Recording(RelPublicObj, RelAudioObj):
             f_factor: final, num >0; 0.2, 3;
             [start: beat/second to begin. defaults beginning]
             [end: beat/second to end. defaults to end of rec]
+            [mode: interpolation, one of 'nearest', 'linear', or 'sinc'. default nearest]
         """
         i_factor = inpt_validate(i_factor, "flt", allowed=[0, None])
         f_factor = inpt_validate(f_factor, "flt", allowed=[0, None])
@@ -393,22 +442,15 @@ class Recording(RelPublicObj, RelAudioObj):
             end = self.size_samps()
         else:
             end = inpt_validate(end, 'beatsec').to_samps()
-        print("  sliding stretch, from factor {0:.4f}x to {1:.4f}x...".format(i_factor, f_factor))
-        beginning = self.arr[:start]
-
-        middle = []
-        factor_count = 0
-        factor = i_factor
-        delta_factor = (f_factor - i_factor) / ind(end - start)
-        for i in self.arr[start:end]:
-            factor_count += factor
-            for _ in range(int(factor_count)):
-                middle.append(i)
-            factor_count = factor_count - int(factor_count)
-            factor += delta_factor
-        
-        end = self.arr[end:]
-        self.arr = np.vstack((beginning, middle, end))
+        mode = Resample.validate_mode(mode)
+        end = min(ind(end), self.arr.shape[0])
+        start = min(ind(start), end)
+        print("  sliding stretch, from factor {0:.4f}x to {1:.4f}x ({2})...".format(
+            i_factor, f_factor, mode))
+        middle = Resample.sliding_stretch(SampleFormat.to_float(self.arr[start:end]), 
+            i_factor, f_factor, mode)
+        middle = SampleFormat.convert(middle, self.arr.dtype)
+        self.arr = np.concatenate((self.arr[:start], middle, self.arr[end:]))
 
     @public_process
     def reverse(self):
@@ -429,7 +471,7 @@ class Recording(RelPublicObj, RelAudioObj):
         """
         factor = inpt_validate(factor, 'float', allowed=[0, 10])
         print("  amplifying by {0}x...".format(factor))
-        self.arr *= factor
+        SampleFormat.multiply(self.arr, factor)
 
     @public_process
     def repeat(self, times):
@@ -458,7 +500,7 @@ class Recording(RelPublicObj, RelAudioObj):
         else:
             before = ""
         print("  extending by {0}{1}...".format(length, before))
-        silence = np.zeros( shape=(ind(self.rate * length), 2) )
+        silence = SampleFormat.zeros(ind(self.rate * length), self.arr.dtype)
         if placement == "b":
             self.arr = np.vstack((silence, self.arr))
         else:
@@ -487,10 +529,11 @@ class Recording(RelPublicObj, RelAudioObj):
 
     def get_panned_rec(self, arr=None):
         """
-        get panned version of self.arr, or arr if passed
+        get panned version of self.arr, or arr if passed, as -1 to 1 floats
         """
         if arr is None:
             arr = self.arr
+        arr = SampleFormat.to_float(arr)
         if self.pan_val > 0:
             return NpOps.join_channels(
                 arr[:,0] * (1 - self.pan_val),
@@ -525,53 +568,92 @@ class Recording(RelPublicObj, RelAudioObj):
             print("  > this will empty the recording, confirm? [y/n]: ", end="")
             if not inpt("yn"):
                 return
-            self.arr = np.empty(shape=(0,2))
+            self.arr = SampleFormat.zeros(0, self.arr.dtype)
         else:
             self.arr = self.arr[ind(left * self.rate) : ind(right * self.rate)]  
 
+    def validate_fade_curve(self, curve):
+        """
+        get a valid fade curve kind, re-prompting until one is given
+        """
+        while True:
+            try:
+                return Envelope.validate_kind(curve, Envelope.fade_kinds)
+            except ValueError:
+                err_mess("Invalid fade curve '{0}'".format(curve))
+                p("Select one of: {0}".format(", ".join(Envelope.fade_kinds)))
+                curve = inpt('alphanum')
+
     @public_process
-    def fade_in(self, dur, start=0):
+    def fade_in(self, dur, start=0, curve="linear"):
         """
         cat: edit
         desc: fade in audio
         args:
             duration: duration in beats/seconds of fade-in; 0, 10;
             [start: beat/second to begin. defaults 0]
+            [curve: 'linear', 'exponential', 'equal_power', or 'smooth'. default linear]
         """
         seconds = inpt_validate(dur, 'beatsec')
         start = ind(inpt_validate(start, 'beatsec'))
+        curve = self.validate_fade_curve(curve)
         print("  fading in {0} starting at {1}...".format(seconds, start))
         length = ind(self.rate * seconds)
-        for i in range(length):
-            try:
-                self.arr[i + start][0] *= i / length
-                self.arr[i + start][1] *= i / length
-            except IndexError:
-                if i + start >= 0:
-                    return
+        Envelope.fade_in(self.arr, length, start, curve)
 
     @public_process
-    def fade_out(self, dur, end=None):
+    def fade_out(self, dur, end=None, curve="linear"):
         """
         cat: edit
         desc: fade out audio
         args:
             duration: duration in beats/seconds of fade-out; 0, 10;
             [end: beat/second to end. defaults end of audio]
+            [curve: 'linear', 'exponential', 'equal_power', or 'smooth'. default linear]
         """
         if end is None:
             end = self.size_secs()
         else:
             end = inpt_validate(end, "beatsec")
         seconds = inpt_validate(dur, "beatsec")
+        curve = self.validate_fade_curve(curve)
         print("  Fading out {0} ending at {1}...".format(seconds, end))
         length = ind(self.rate * seconds)
-        for i in range(ind(end) - length, ind(end)):
+        Envelope.fade_out(self.arr, length, ind(end), curve)
+
+    @public_process
+    def eq(self, freq, gain, kind="peak", q=0.7071):
+        """
+        cat: effect
+        desc: equalize with a peak, shelf, or pass filter
+        args:
+            freq: center or corner frequency, hz or note; 60, 8000;
+            gain: decibels to boost, negative to cut (unused by passes); -12, 12;
+            [kind: 'peak', 'lowshelf', 'highshelf', 'lowpass', or 'highpass'. default peak]
+            [q: width, higher is narrower or steeper; 0.5, 4;]
+        """
+        freq = inpt_validate(freq, 'freq').frequency
+        nyquist = self.rate.magnitude / 2
+        if freq >= nyquist:
+            err_mess("Frequency must be below {0}hz at this sample rate".format(nyquist))
+            return
+        gain = inpt_validate(gain, 'float', allowed=[-48, 48])
+        kind = self.validate_filter_kind(kind)
+        q = inpt_validate(q, 'float', allowed=[0.1, 20])
+        print("  applying {0} filter at {1}hz, {2}db, q {3}...".format(kind, freq, gain, q))
+        Equalizer([(kind, freq, gain, q)], self.rate.magnitude).apply(self.arr)
+
+    def validate_filter_kind(self, kind):
+        """
+        get a valid filter kind, re-prompting until one is given
+        """
+        while True:
             try:
-                self.arr[i][0] *= (length - i) / length
-                self.arr[i][1] *= (length - i) / length
-            except IndexError:
-                pass
+                return Biquad.validate_kind(kind)
+            except ValueError:
+                err_mess("Invalid filter kind '{0}'".format(kind))
+                p("Select one of: {0}".format(", ".join(Biquad.kinds)))
+                kind = inpt('alphanum')
 
     @public_process
     def random_method(self):
@@ -580,9 +662,10 @@ class Recording(RelPublicObj, RelAudioObj):
         cat: edit
         """
         public_methods = self.get_all_public_methods()
-        public_edits = [i for i in public_methods if get_reldata(i, "category") == Category.EDIT]
-        method = rd.choice(public_edits)
-        args = method.get_random_defaults()
+        public_edits = [i for i in public_methods if is_edit_rec(i)]
+        rng = Chance.rng("random method")
+        method = public_edits[rng.integers(len(public_edits))]
+        args = method._rel_data.get_random_defaults(rng)
         try:
             method(*args)
         except Exception as e:
@@ -11,6 +11,7 @@ from pydub import AudioSegment as pd
 
 from src.data_types import *
 from src.errors import *
+from src.autosave import atomic_write, writer
 from src.globals import RelGlobals, Settings
 from src.input_processing import inpt, inpt_validate, input_dir, input_file, autofill
 from src.method_ops import (ArgData, Category, RelData, _ClsRelData,
@@ -23,6 +24,8 @@ from src.output_and_prompting import (critical_err_mess, err_mess, info_block,
                                       log_err, nl, p, section_head, show_error,
                                       style)
 from src.path import join_path, split_path
+from src.sample_format import SampleFormat
+from src.storage import is_mapped, map_audio, save_mappable
 
 
 class RelObject(abc.ABC):
@@ -346,15 +349,31 @@ class RelAudioObj(RelSavedObj):
             attrs["file"] = self.get_audiofile_fullpath()
         return attrs
 
-    def save_audio(self):
+    def save_audio(self, wait=True):
         """
-        base wav audio saving. requires 'rate' and 'arr' attributes
+        base wav audio saving. requires 'rate' and 'arr' attributes. without
+        wait, a snapshot of the audio is written by the background writer
         """
-        info_block("saving audio of {0} '{1}'...".format(self.reltype, self.name))
         if self.arr is None:
+            info_block("saving audio of {0} '{1}'...".format(self.reltype, self.name))
             info_line("no audio to save...")
+        elif wait:
+            info_block("saving audio of {0} '{1}'...".format(self.reltype, self.name))
+            # a queued autosave would only overwrite this with older audio
+            writer.cancel(self.get_audiofile_fullpath())
+            self.write_audio_file(self.get_audiofile_fullpath(), self.arr)
         else:
-            sf.write(self.get_audiofile_fullpath(), self.arr, self.rate.magnitude)
+            writer.submit(self.get_audiofile_fullpath(), self.arr, self.write_audio_file)
+
+    def write_audio_file(self, path, arr):
+        """
+        write arr to path through a temp file, so the file is never half-written
+        """
+        if Settings.is_memmap() or is_mapped(arr):
+            # written as floats, to be mapped again on load
+            save_mappable(path, arr, self.rate.magnitude)
+        else:
+            atomic_write(path, lambda temp: sf.write(temp, arr, int(self.rate.magnitude), format="WAV"))
 
     def read_file(self, file_path=None):
         """
@@ -372,7 +391,7 @@ class RelAudioObj(RelSavedObj):
 
         # Handling file types
         _,_,ext = split_path(file_path)
-        if ext != "wav":
+        if ext not in ("wav", "npy"):
             try:
                 not_wav = pd.from_file(file_path, file_path.ext)
                 not_wav.export(".temp_soundfile.wav", format="wav")
@@ -384,8 +403,18 @@ class RelAudioObj(RelSavedObj):
                 
         # self.source_block["file"] = file_path
         # Reading and Processing File
+        mapped = map_audio(file_path) if Settings.is_memmap() or ext == "npy" else None
+        if mapped is not None:
+            self.arr, rate = mapped
+            self.rate = Units.rate(rate)
+            if Settings.is_memmap():
+                info_line("sound file '{0}' memory-mapped".format(file_path))
+                return
+            self.arr = np.array(self.arr)
+            info_line("sound file '{0}' read successfully".format(file_path))
+            return
         try:
-            self.arr, rate = sf.read(file_path)
+            self.arr, rate = sf.read(file_path, dtype=SampleFormat.current())
             self.rate = Units.rate(rate)
         except RuntimeError:
             print("  > unable to find or read '{0}'. Is that the correct extension?".format(file_path))
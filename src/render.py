@@ -0,0 +1,283 @@
+"""
+pull-based render graph: each node renders its audio a block at a time, on
+request, so a whole project can be mixed and written to disk without ever
+holding more than one block per track in memory
+
+    node.block(start, end): stereo frames [start, end) of the node's output,
+        after its pan, gain, and effects
+    Mixer: sums any number of nodes block by block, into a wav file or
+        straight to the speakers while the render continues
+"""
+
+import queue
+import threading
+
+import numpy as np
+import sounddevice as sd
+import soundfile as sf
+
+from src.data_types import *
+from src.errors import *
+from src.sample_cache import SampleCache
+from src.sample_format import SampleFormat
+from src.utility import *
+
+
+class RenderNode:
+    """
+    a source of stereo audio, rendered in blocks
+        gain: amplitude multiplier applied to every block
+        effects: list of functions taking and returning a (frames, 2) block,
+            applied in order after gain
+    """
+
+    def __init__(self, gain=1.0, effects=None):
+        self.gain = gain
+        self.effects = [] if effects is None else list(effects)
+
+    def length(self):
+        """
+        total frames this node renders
+        """
+        raise NotImplementedError
+
+    def render(self, start, end, dtype):
+        """
+        raw (frames, 2) audio for [start, end), zeros outside the node
+        """
+        raise NotImplementedError
+
+    def block(self, start, end, dtype=None):
+        if dtype is None:
+            dtype = SampleFormat.float_dtype()
+        block = self.render(start, end, dtype)
+        if self.gain != 1.0:
+            block *= self.gain
+        for effect in self.effects:
+            block = effect(block)
+        return block
+
+
+class RecordingNode(RenderNode):
+    """
+    a Recording placed at offset samples into the mix, panned per block
+    """
+
+    def __init__(self, rec, offset=0, gain=1.0, effects=None):
+        super().__init__(gain, effects)
+        self.rec = rec
+        self.offset = offset
+
+    def length(self):
+        return self.offset + self.rec.arr.shape[0]
+
+    def render(self, start, end, dtype):
+        block = np.zeros((end - start, 2), dtype=dtype)
+        lo = max(start, self.offset)
+        hi = min(end, self.length())
+        if hi > lo:
+            block[lo - start : hi - start] = self.rec.get_panned_rec(
+                self.rec.arr[lo - self.offset : hi - self.offset])
+        return block
+
+
+class HitsNode(RenderNode):
+    """
+    many short recordings at sample offsets, such as a Sampler's rhythm hits.
+    hits are sorted once, so each block only visits the hits that overlap it
+        hits: list of [rec, offset in samples]
+    """
+
+    def __init__(self, hits, gain=1.0, effects=None):
+        super().__init__(gain, effects)
+        self.hits = sorted(hits, key=lambda h: h[1])
+        self.starts = np.array([offset for _, offset in self.hits], dtype=np.int64)
+        # longest hit bounds how far back a block has to look
+        self.longest = max((rec.arr.shape[0] for rec, _ in self.hits), default=0)
+
+    def length(self):
+        return max((offset + rec.arr.shape[0] for rec, offset in self.hits), default=0)
+
+    def render(self, start, end, dtype):
+        block = np.zeros((end - start, 2), dtype=dtype)
+        first = np.searchsorted(self.starts, start - self.longest, side="right")
+        last = np.searchsorted(self.starts, end, side="left")
+        for rec, offset in self.hits[first:last]:
+            lo = max(start, offset)
+            hi = min(end, offset + rec.arr.shape[0])
+            if hi > lo:
+                block[lo - start : hi - start] += rec.get_panned_rec(rec.arr[lo - offset : hi - offset])
+        return block
+
+
+class PatternNode(RenderNode):
+    """
+    recordings repeated at arrays of sample offsets, such as a Sampler's
+    rhythms. each pattern's variant of its recording comes from a SampleCache,
+    and is added at all of its offsets overlapping a block together
+        patterns: list of (rec, offsets in samples, first frame of rec, frames
+            of rec to play or None for the rest of it[, semitones, gain])
+        cache: SampleCache to share variants through, default a new one
+    """
+
+    def __init__(self, patterns, gain=1.0, effects=None, cache=None):
+        super().__init__(gain, effects)
+        self.cache = SampleCache() if cache is None else cache
+        self.patterns = []
+        for rec, offsets, start, frames, *pitch_gain in patterns:
+            snippet = self.cache.get(rec, *pitch_gain, start=start, frames=frames)
+            # a repeated offset is one hit, played louder
+            offsets, counts = np.unique(np.asarray(offsets, dtype=np.int64), return_counts=True)
+            self.patterns.append((rec, snippet, offsets, counts))
+
+    def length(self):
+        return max((offsets[-1] + snippet.shape[0] for _, snippet, offsets, _ in self.patterns 
+            if offsets.shape[0] > 0), default=0)
+
+    def render(self, start, end, dtype):
+        block = np.zeros((end - start, 2), dtype=dtype)
+        for _, snippet, offsets, counts in self.patterns:
+            first = np.searchsorted(offsets, start - snippet.shape[0], side="right")
+            last = np.searchsorted(offsets, end, side="left")
+            if last > first:
+                PatternNode.scatter_add(block, snippet, offsets[first:last] - start, counts[first:last])
+        return block
+
+    @staticmethod
+    def scatter_add(out, snippet, offsets, counts=None):
+        """
+        add counts times snippet into out at each of offsets (sorted and unique),
+        clipped to out. loops over whichever is fewer, the offsets or the frames
+        of the snippet, so the work is linear in hits times snippet frames
+        """
+        length = out.shape[0]
+        if counts is not None and np.all(counts == 1):
+            counts = None
+        if offsets.shape[0] <= snippet.shape[0]:
+            for i, offset in enumerate(offsets):
+                lo, hi = max(offset, 0), min(offset + snippet.shape[0], length)
+                if hi > lo:
+                    if counts is None:
+                        out[lo:hi] += snippet[lo - offset : hi - offset]
+                    else:
+                        out[lo:hi] += snippet[lo - offset : hi - offset] * counts[i]
+        else:
+            weights = None if counts is None else counts[:, None].astype(out.dtype)
+            for frame in range(snippet.shape[0]):
+                # unique offsets never land on the same frame twice in one add
+                indexes = offsets + frame
+                inside = slice(np.searchsorted(indexes, 0), np.searchsorted(indexes, length))
+                if weights is None:
+                    out[indexes[inside]] += snippet[frame]
+                else:
+                    out[indexes[inside]] += snippet[frame] * weights[inside]
+
+
+class Mixer:
+    """
+    sums render nodes block by block
+        mix_level: post-mix amplification
+        block_size: frames rendered at a time
+        dtype: accumulation dtype, default the float dtype of the project's sample format
+    """
+
+    block_size = 2 ** 16
+    # blocks rendered ahead of the speakers during playback
+    playback_buffer = 8
+
+    def __init__(self, nodes, mix_level=1.0, block_size=None, dtype=None):
+        self.nodes = list(nodes)
+        self.mix_level = mix_level
+        if block_size is not None:
+            self.block_size = int(block_size)
+        self.dtype = SampleFormat.float_dtype() if dtype is None else dtype
+
+    def length(self):
+        return max((node.length() for node in self.nodes), default=0)
+
+    def blocks(self, start=0, end=None):
+        """
+        yield the mix from start to end (default the whole mix), one block at a time
+        """
+        if end is None:
+            end = self.length()
+        for block_start in range(start, end, self.block_size):
+            block_end = min(block_start + self.block_size, end)
+            block = np.zeros((block_end - block_start, 2), dtype=self.dtype)
+            for node in self.nodes:
+                block += node.block(block_start, block_end, self.dtype)
+            if self.mix_level != 1.0:
+                block *= self.mix_level
+            yield block
+
+    def render(self):
+        """
+        the whole mix as one array
+        """
+        length = self.length()
+        out = np.zeros((length, 2), dtype=self.dtype)
+        start = 0
+        for block in self.blocks():
+            out[start : start + block.shape[0]] = block
+            start += block.shape[0]
+        return out
+
+    def render_to_file(self, outfile, rate, playback=False):
+        """
+        stream the mix to a wav file. with playback, it also plays as it renders,
+        the render staying at most playback_buffer blocks ahead of the speakers
+        """
+        rate = int(Units.rate(rate).magnitude)
+        with sf.SoundFile(outfile, mode="w", samplerate=rate, channels=2) as f:
+            if playback:
+                play_blocks(self.write_through(f), rate, self.playback_buffer)
+            else:
+                for block in self.blocks():
+                    f.write(block)
+        return outfile
+
+    def write_through(self, f):
+        for block in self.blocks():
+            f.write(block)
+            yield block
+
+
+def play_blocks(blocks, rate, buffer_blocks=8):
+    """
+    play an iterator of (frames, 2) blocks. a background thread pulls blocks into
+    a bounded queue, so audio starts with the first block and rendering continues
+    alongside
+    """
+    buffer = queue.Queue(maxsize=buffer_blocks)
+    errors = []
+
+    def producer():
+        try:
+            for block in blocks:
+                buffer.put(block)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            buffer.put(None)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    with sd.OutputStream(samplerate=rate, channels=2, dtype="float32") as stream:
+        while True:
+            block = buffer.get()
+            if block is None:
+                break
+            stream.write(np.ascontiguousarray(block, dtype=np.float32))
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+def play_file(path, duration=None, start=0, block_size=Mixer.block_size):
+    """
+    stream a wav file to the speakers from start, for duration frames (default to the end)
+    """
+    with sf.SoundFile(path) as f:
+        f.seek(start)
+        frames = -1 if duration is None else duration
+        play_blocks(f.blocks(blocksize=block_size, frames=frames, always_2d=True), f.samplerate)
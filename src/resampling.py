@@ -0,0 +1,247 @@
+"""
+resampling engine: time-scaling of audio arrays with numpy index arithmetic
+
+modes:
+    nearest: repeat or drop whole frames. same output, frame for frame, as the
+        classic frame-repeating stretch loop
+    linear: linear interpolation between neighbouring frames
+    sinc: windowed-sinc interpolation, low-passed when shrinking
+"""
+
+from itertools import accumulate
+
+import numpy as np
+
+from src.errors import *
+
+
+class Resample:
+    """
+    staticmethod class for resampling (samples, channels) or mono arrays
+    """
+
+    modes = ("nearest", "linear", "sinc")
+
+    # half-width of the sinc kernel, in input frames (at cutoff 1)
+    sinc_taps = 16
+    # kernel table points per frame, and the tables by (cutoff, half-width)
+    sinc_table_res = 512
+    _sinc_tables = {}
+    # output frames per low-pass block in sliding sinc
+    sinc_block = 4096
+
+    @staticmethod
+    def validate_mode(mode):
+        """
+        check mode is one of Resample.modes, raises ValueError on failure
+        """
+        if mode is None:
+            return Resample.modes[0]
+        mode = str(mode).lower().strip()
+        if mode not in Resample.modes:
+            raise ValueError("Unknown resampling mode '{0}', must be one of '{1}'".format(
+                mode, "', '".join(Resample.modes)))
+        return mode
+
+    @staticmethod
+    def stretch(arr, factor, mode="nearest"):
+        """
+        stretch arr by factor (>1 is longer, <1 is shorter). returns new array of
+        length floor(len(arr) * factor) (nearest mode can differ by a frame, as
+        the classic loop's rounding drifts)
+        """
+        mode = Resample.validate_mode(mode)
+        factor = float(factor)
+        if factor <= 0:
+            raise ValueError("Stretch factor must be greater than 0, got {0}".format(factor))
+        arr = np.asarray(arr)
+        if mode == "nearest":
+            factors = np.full(arr.shape[0], factor)
+            return np.repeat(arr, Resample.frame_counts(factors), axis=0)
+        out_len = int(np.floor(arr.shape[0] * factor))
+        positions = np.arange(out_len) / factor
+        return Resample.at_positions(arr, positions, mode, cutoff=min(1.0, factor))
+
+    @staticmethod
+    def sliding_stretch(arr, i_factor, f_factor, mode="nearest"):
+        """
+        stretch arr by a factor that slides linearly from i_factor at the first
+        frame to f_factor at the last. the source position of every output frame
+        comes from the cumulative sum of the per-frame factors. nearest mode
+        matches stepping the factor frame by frame, as the classic loop did
+        """
+        mode = Resample.validate_mode(mode)
+        i_factor, f_factor = float(i_factor), float(f_factor)
+        if i_factor <= 0 or f_factor <= 0:
+            raise ValueError("Stretch factors must be greater than 0, got {0} and {1}".format(
+                i_factor, f_factor))
+        arr = np.asarray(arr)
+        length = arr.shape[0]
+        if length == 0:
+            return arr.copy()
+
+        # factor of each frame, accumulated the same way as stepping through frames
+        steps = np.full(length, (f_factor - i_factor) / length)
+        steps[0] = i_factor
+        factors = np.cumsum(steps)
+
+        if mode == "nearest":
+            return np.repeat(arr, Resample.frame_counts(factors), axis=0)
+
+        # output position at the end of each frame, inverted to get the source
+        # position of each output frame
+        ends = np.cumsum(factors)
+        out_len = int(np.floor(ends[-1]))
+        positions = np.interp(
+            np.arange(out_len),
+            np.concatenate(([0], ends)),
+            np.arange(length + 1)
+        )
+        if mode == "linear":
+            return Resample.linear(arr, positions)
+        return Resample.sliding_sinc(arr, positions, factors)
+
+    @staticmethod
+    def sliding_sinc(arr, positions, factors):
+        """
+        sinc interpolation where the stretch factor varies. output is done in
+        blocks of sinc_block frames, each low-passed at the smallest factor its
+        source frames use, so expanding parts of a ramp keep their highs. cutoffs
+        are rounded down to eighth-octave steps to share kernel tables
+        """
+        length = arr.shape[0]
+        out = np.zeros((positions.shape[0],) + arr.shape[1:], dtype=Resample.float_dtype(arr))
+        for b_start in range(0, positions.shape[0], Resample.sinc_block):
+            block = positions[b_start : b_start + Resample.sinc_block]
+            first = min(int(block[0]), length - 1)
+            last = min(int(block[-1]), length - 1)
+            cutoff = min(1.0, np.min(factors[first : last + 1]))
+            if cutoff < 1:
+                cutoff = 2 ** (np.floor(np.log2(cutoff) * 8) / 8)
+            # only the source frames the kernel reaches
+            half_width = int(np.ceil(Resample.sinc_taps / cutoff))
+            lo = max(0, first - half_width - 1)
+            hi = min(length, last + half_width + 2)
+            out[b_start : b_start + block.shape[0]] = Resample.sinc(arr[lo:hi], block - lo, cutoff)
+        return out
+
+    @staticmethod
+    def frame_counts(factors):
+        """
+        copies of each input frame for nearest mode, given each frame's factor.
+        the residual is carried from frame to frame exactly as the classic loop
+        did (count = int(residual + factor), keeping the fractional part), so
+        float rounding drifts the same way and the output matches it frame for
+        frame. only the scalar residual is stepped in python
+        """
+        factors = np.asarray(factors, dtype=np.float64)
+        if factors.shape[0] == 0:
+            return np.zeros(0, dtype=np.int64)
+        residuals = np.fromiter(
+            accumulate(factors[:-1].tolist(), lambda c, f: (c + f) % 1.0, initial=0.0),
+            dtype=np.float64,
+            count=factors.shape[0]
+        )
+        return np.floor(residuals + factors).astype(np.int64)
+
+    @staticmethod
+    def float_dtype(arr):
+        """
+        float dtype for interpolated output: arr's own if it is floating, else float32
+        """
+        return np.result_type(arr.dtype, np.float32)
+
+    @staticmethod
+    def at_positions(arr, positions, mode="linear", cutoff=1.0):
+        """
+        sample arr at fractional frame positions (1d array), in one pass.
+        cutoff: sinc low-pass cutoff as fraction of nyquist, for anti-aliasing
+        """
+        mode = Resample.validate_mode(mode)
+        arr = np.asarray(arr)
+        positions = np.asarray(positions, dtype=np.float64)
+        if arr.shape[0] == 0 or positions.shape[0] == 0:
+            dtype = arr.dtype if mode == "nearest" else Resample.float_dtype(arr)
+            return np.zeros((positions.shape[0],) + arr.shape[1:], dtype=dtype)
+        if mode == "nearest":
+            return Resample.nearest(arr, positions)
+        elif mode == "linear":
+            return Resample.linear(arr, positions)
+        return Resample.sinc(arr, positions, cutoff)
+
+    @staticmethod
+    def nearest(arr, positions):
+        """
+        frame at floor of each position
+        """
+        inds = np.clip(np.floor(positions).astype(np.int64), 0, arr.shape[0] - 1)
+        return arr[inds]
+
+    @staticmethod
+    def linear(arr, positions):
+        """
+        linear interpolation between the frames around each position
+        """
+        last = arr.shape[0] - 1
+        base = np.floor(positions)
+        frac = (positions - base).astype(Resample.float_dtype(arr))
+        base = np.clip(base.astype(np.int64), 0, last)
+        nxt = np.minimum(base + 1, last)
+        if arr.ndim > 1:
+            frac = frac.reshape((-1,) + (1,) * (arr.ndim - 1))
+        return arr[base] * (1 - frac) + arr[nxt] * frac
+
+    @staticmethod
+    def sinc(arr, positions, cutoff=1.0):
+        """
+        blackman-windowed sinc interpolation. the kernel widens as cutoff drops,
+        so cost is ~ len(positions) * 2 * sinc_taps / cutoff
+        """
+        cutoff = min(max(float(cutoff), 1e-6), 1.0)
+        half_width = int(np.ceil(Resample.sinc_taps / cutoff))
+        res = Resample.sinc_table_res
+        table = Resample._sinc_table(cutoff, half_width)
+
+        # zero-pad so every tap index is valid
+        dtype = Resample.float_dtype(arr)
+        pad_shape = (half_width + 1,) + arr.shape[1:]
+        padded = np.concatenate((np.zeros(pad_shape, dtype=dtype), arr.astype(dtype, copy=False),
+            np.zeros(pad_shape, dtype=dtype)))
+        base = np.clip(np.floor(positions), 0, arr.shape[0] - 1).astype(np.int64)
+        phase = np.clip(np.rint((positions - base) * res), 0, res).astype(np.int64)
+
+        out = np.zeros((positions.shape[0],) + arr.shape[1:], dtype=dtype)
+        weight_sum = np.zeros(positions.shape[0], dtype=dtype)
+        expand = (-1,) + (1,) * (arr.ndim - 1)
+
+        # one vectorized pass per kernel tap
+        for tap in range(-half_width + 1, half_width + 1):
+            weights = table[(tap + half_width) * res - phase].astype(dtype, copy=False)
+            out += padded[base + tap + half_width + 1] * weights.reshape(expand)
+            weight_sum += weights
+
+        # normalize so dc gain is exactly 1
+        weight_sum[weight_sum == 0] = 1
+        out /= weight_sum.reshape(expand)
+        return out
+
+    @staticmethod
+    def _sinc_table(cutoff, half_width):
+        """
+        windowed sinc kernel sampled every 1/sinc_table_res frames over
+        [-half_width, half_width]. cached by cutoff and width
+        """
+        key = (cutoff, half_width)
+        try:
+            return Resample._sinc_tables[key]
+        except KeyError:
+            pass
+        dist = np.arange(2 * half_width * Resample.sinc_table_res + 1) / \
+            Resample.sinc_table_res - half_width
+        window = 0.42 + 0.5 * np.cos(np.pi * dist / half_width) + \
+            0.08 * np.cos(2 * np.pi * dist / half_width)
+        table = cutoff * np.sinc(cutoff * dist) * window
+        if len(Resample._sinc_tables) > 32:
+            Resample._sinc_tables.clear()
+        Resample._sinc_tables[key] = table
+        return table
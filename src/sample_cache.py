@@ -0,0 +1,107 @@
+"""
+pre-rendered sample variants: a sample trimmed, pitched, gained and panned
+for one kind of hit, rendered the first time a hit asks for it and reused by
+every later hit that plays it the same way. least recently used variants are
+dropped once the cache holds more than its memory cap
+
+    variant key: (sample id, semitones, gain, trim start, trim frames)
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from src.errors import *
+from src.output_and_prompting import info_line, info_title
+from src.resampling import Resample
+from src.sample_format import SampleFormat
+
+
+class SampleCache:
+    """
+    lru cache of sample variants, as panned (frames, 2) float arrays
+        max_bytes: memory cap for all variants together
+    """
+
+    # pitch shifts are resampled once per variant, so they can afford sinc
+    resample_mode = "sinc"
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = int(max_bytes)
+        self.variants = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(rec, semitones=0, gain=1.0, start=0, frames=None):
+        # recordings without an id (such as test doubles) are told apart by identity
+        rec_id = getattr(rec, "rel_id", None)
+        return (id(rec) if rec_id is None else rec_id, float(semitones), float(gain), int(start), frames)
+
+    def get(self, rec, semitones=0, gain=1.0, start=0, frames=None):
+        """
+        rec's audio from frame start, frames long (None for the rest), shifted
+        semitones in pitch and multiplied by gain, rendering it on a miss
+        """
+        key = SampleCache.key(rec, semitones, gain, start, frames)
+        variant = self.variants.get(key)
+        if variant is not None:
+            self.hits += 1
+            self.variants.move_to_end(key)
+            return variant
+        self.misses += 1
+        variant = SampleCache.render(rec, semitones, gain, start, frames)
+        # a variant bigger than the whole cap is still returned, just not kept
+        if variant.nbytes <= self.max_bytes:
+            self.variants[key] = variant
+            self.nbytes += variant.nbytes
+            while self.nbytes > self.max_bytes:
+                _, dropped = self.variants.popitem(last=False)
+                self.nbytes -= dropped.nbytes
+                self.evictions += 1
+        return variant
+
+    @staticmethod
+    def render(rec, semitones=0, gain=1.0, start=0, frames=None):
+        """
+        one variant of rec, without the cache
+        """
+        snippet = rec.arr[start:] if frames is None else rec.arr[start : start + frames]
+        snippet = SampleFormat.to_float(snippet)
+        if semitones != 0:
+            # higher pitch plays faster, so shorter
+            snippet = Resample.stretch(snippet, 2 ** (-semitones / 12), SampleCache.resample_mode)
+        if gain != 1.0:
+            snippet = snippet * gain
+        variant = rec.get_panned_rec(snippet)
+        # variants are shared between hits, so none may be edited in place
+        variant.flags.writeable = False
+        return variant
+
+    def drop(self, rec):
+        """
+        forget every variant of rec, after it is edited
+        """
+        rec_id = SampleCache.key(rec)[0]
+        for key in [key for key in self.variants if key[0] == rec_id]:
+            self.nbytes -= self.variants.pop(key).nbytes
+
+    def clear(self):
+        self.variants.clear()
+        self.nbytes = 0
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def info(self):
+        """
+        print usage, for sizing the cache
+        """
+        info_title("Sample cache:")
+        info_line("{0} variants, {1:.1f} of {2:.1f} MB".format(len(self.variants),
+            self.nbytes / 2**20, self.max_bytes / 2**20))
+        info_line("{0} hits, {1} misses ({2:.0%} hit rate), {3} evicted".format(
+            self.hits, self.misses, self.hit_rate(), self.evictions))
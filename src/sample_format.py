@@ -0,0 +1,143 @@
+"""
+sample formats: the dtype audio arrays are held in, set per project.
+float formats hold samples in -1 to 1; int16 holds full-scale pcm, the same as
+a 16 bit wav file. audio only changes format at the edges: when read from or
+written to a file, mixed, panned, or played back
+
+formats:
+    float64: the default, and the most precise
+    float32: half the memory, and plenty of precision for audio
+    int16: a quarter of the memory. edits that need float math convert to
+        float32 and back as they run
+"""
+
+import functools
+
+import numpy as np
+
+from src.errors import *
+from src.globals import RelGlobals
+
+
+class SampleFormat:
+    """
+    staticmethod class for the project sample format
+    """
+
+    formats = ("float64", "float32", "int16")
+    default = "float64"
+
+    @staticmethod
+    def validate(fmt):
+        """
+        check fmt is one of SampleFormat.formats, raises ValueError on failure
+        """
+        if fmt is None:
+            return SampleFormat.default
+        fmt = np.dtype(fmt).name if isinstance(fmt, (type, np.dtype)) else str(fmt).lower().strip()
+        if fmt not in SampleFormat.formats:
+            raise ValueError("Unknown sample format '{0}', must be one of '{1}'".format(
+                fmt, "', '".join(SampleFormat.formats)))
+        return fmt
+
+    @staticmethod
+    def current():
+        """
+        name of the current project's format, or the default with no project open
+        """
+        project = RelGlobals.get_project_instance()
+        return getattr(project, "sample_format", None) or SampleFormat.default
+
+    @staticmethod
+    def dtype(fmt=None):
+        return np.dtype(SampleFormat.current() if fmt is None else SampleFormat.validate(fmt))
+
+    @staticmethod
+    def float_dtype(fmt=None):
+        """
+        dtype that math on fmt (default current) is done in
+        """
+        dtype = SampleFormat.dtype(fmt)
+        return dtype if dtype.kind == "f" else np.dtype(np.float32)
+
+    @staticmethod
+    def full_scale(dtype):
+        """
+        value a full-scale sample has in dtype
+        """
+        dtype = np.dtype(dtype)
+        if dtype.kind in "iu":
+            return np.iinfo(dtype).max
+        return 1.0
+
+    @staticmethod
+    def convert(arr, fmt=None):
+        """
+        arr in format fmt (default current), rescaling between float and integer
+        formats. returns arr itself when it is already in fmt
+        """
+        arr = np.asarray(arr)
+        dtype = SampleFormat.dtype(fmt)
+        if arr.dtype == dtype:
+            return arr
+        if arr.dtype.kind in "iu":
+            arr = arr.astype(SampleFormat.float_dtype(dtype)) / SampleFormat.full_scale(arr.dtype)
+        if dtype.kind in "iu":
+            return SampleFormat.cast(arr * SampleFormat.full_scale(dtype), dtype)
+        return arr.astype(dtype)
+
+    @staticmethod
+    def cast(arr, dtype):
+        """
+        change dtype without rescaling, rounding and clipping into integer range
+        """
+        dtype = np.dtype(dtype)
+        if dtype.kind in "iu":
+            info = np.iinfo(dtype)
+            return np.clip(np.rint(arr), info.min, info.max).astype(dtype)
+        return np.asarray(arr).astype(dtype, copy=False)
+
+    @staticmethod
+    def to_float(arr):
+        """
+        arr as -1 to 1 floats, for math, mixing, and playback. float arrays are returned as is
+        """
+        arr = np.asarray(arr)
+        if arr.dtype.kind == "f":
+            return arr
+        return SampleFormat.convert(arr, SampleFormat.float_dtype(arr.dtype))
+
+    @staticmethod
+    def multiply(arr, gain):
+        """
+        multiply arr by gain in place, for any format. integer samples are
+        rounded and clipped instead of wrapping around
+        """
+        if arr.dtype.kind in "iu":
+            arr[...] = SampleFormat.cast(arr * np.asarray(gain, dtype=np.float32), arr.dtype)
+        else:
+            arr *= np.asarray(gain, dtype=arr.dtype)
+        return arr
+
+    @staticmethod
+    def zeros(length, fmt=None):
+        """
+        stereo silence of length samples
+        """
+        return np.zeros((int(length), 2), dtype=SampleFormat.dtype(fmt))
+
+
+def float_process(func):
+    """
+    decorator for effects taking a rec first: runs func on rec.arr as floats,
+    and returns the result to rec.arr's original format
+    """
+    @functools.wraps(func)
+    def wrapper(rec, *args, **kwargs):
+        dtype = rec.arr.dtype
+        rec.arr = SampleFormat.to_float(rec.arr)
+        try:
+            return func(rec, *args, **kwargs)
+        finally:
+            rec.arr = SampleFormat.convert(rec.arr, dtype)
+    return wrapper
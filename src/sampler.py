@@ -2,10 +2,15 @@
 chance-based generative Sampler object
 """
 
+import numpy as np
 
 from src.data_types import *
 from src.recording_obj import Recording
-from src.integraters import mix, mix_multiple, concatenate
+from src.integraters import mix, mix_items, mix_multiple, concatenate
+from src.render import PatternNode, Mixer, play_blocks
+from src.chance import Chance
+from src.sample_cache import SampleCache
+from src.sample_format import SampleFormat
 from src.rel_objects import RelSavedObj, RelPublicObj
 from src.method_ops import public_process, is_public_process, rel_alias, is_alias
 from src.controller import Controller
@@ -230,6 +235,34 @@ class Rhythm(RelPublicObj, RelSavedObj):
                 new_beat[1] = "all"
             info_line("  Added beat - " + self.beat_repr(new_beat))
 
+    def compile(self):
+        """
+        (samples per repetition, {(snippet start, snippet frames): array of beat
+        places}) of this rhythm, each beat converted to samples once. snippet
+        frames is None where a beat plays the rest of the sample
+        """
+        cycle = ind(Units.samps(Units.beats(self.length)))
+        if cycle <= 0:
+            raise ValueError("Rhythm '{0}' has no length".format(self.name))
+        snippets = {}
+        for beat in self.beats:
+            place = ind(Units.samps(beat[0]))
+            frames = beat[1] if len(beat) > 1 else 0
+            frames = None if frames in (0, "all") else ind(Units.samps(frames))
+            start = ind(Units.samps(beat[2])) if len(beat) > 2 else 0
+            snippets.setdefault((start, frames), []).append(place)
+        return cycle, {key: np.sort(places) for key, places in snippets.items()}
+
+    @staticmethod
+    def repeat(places, cycle, length):
+        """
+        sorted sample offsets of places (within one cycle of samples), repeated
+        every cycle, that start before length samples
+        """
+        starts = np.arange(0, length, cycle, dtype=np.int64)
+        offsets = (starts[:, None] + np.asarray(places, dtype=np.int64)[None, :]).ravel()
+        return offsets[offsets < length]
+
     @public_process
     def delete_beats(self):
         raise NotImplementedError
@@ -243,8 +276,14 @@ class Rhythm(RelPublicObj, RelSavedObj):
 
 class Active(RelPublicObj, RelSavedObj):
 
+    # pitch and gain levels varied hits choose between, so that hits repeat
+    # variants the sample cache already holds
+    variant_steps = 5
+    # pitch range either way at 100% variability
+    max_semitones = 1
+
     def __init__(self, parent, path, act_rhythm, act_sample, reltype=None, 
-            name=None, rel_id=None, muted=None):
+            name=None, rel_id=None, muted=None, variability=None):
 
         super().__init__(rel_id, reltype, name, path, parent)
         print("\n* Initializing active pair")
@@ -252,7 +291,7 @@ class Active(RelPublicObj, RelSavedObj):
         self.rhythm = act_rhythm
         self.sample = act_sample
         self.muted = muted
-        self.variability = Active.Variability()
+        self.variability = Units.pcnt(0) if variability is None else variability
         if name is None:
             self.rename()
         if muted is None:
@@ -297,24 +336,47 @@ class Active(RelPublicObj, RelSavedObj):
             self.variability = inpt_validate(var, 'pcnt')
 
 
-    def generate_active(self, length):
+    def hit_variants(self, count, rng=None):
+        """
+        (semitones, gain) arrays for count hits. with variability, each hit
+        shifts up to max_semitones either way and drops in gain by up to the
+        variability, in variant_steps levels
+        """
+        amount = self.variability.to("dimensionless").magnitude
+        if amount == 0:
+            return np.zeros(count), np.ones(count)
+        if rng is None:
+            rng = Chance.rng("active pair {0}".format(self.rel_id))
+        levels = np.linspace(0, 1, self.variant_steps)
+        semitones = amount * self.max_semitones * (2 * rng.choice(levels, count) - 1)
+        gains = 1 - amount * rng.choice(levels, count)
+        return semitones, gains
+
+    def patterns(self, length, rng=None):
+        """
+        PatternNode patterns of this pair: the offsets of every beat starting
+        before length samples, one pattern per variant of the sample they play
+        """
+        cycle, snippets = self.rhythm.compile()
+        patterns = []
+        for (start, frames), places in snippets.items():
+            offsets = Rhythm.repeat(places, cycle, length)
+            semitones, gains = self.hit_variants(offsets.shape[0], rng)
+            variants, which = np.unique(np.stack((semitones, gains), axis=1), axis=0, return_inverse=True)
+            which = which.ravel()
+            for i, (semitone, gain) in enumerate(variants):
+                patterns.append((self.sample, offsets[which == i], start, frames, semitone, gain))
+        return patterns
+
+    def generate_active(self, length, cache=None):
         """
-        generate this active pair. length is samples
+        generate this active pair into one recording. length is samples
         """
-        length = length // self.rhythm.length
-        beats_to_mix = []
-        base_offset = 0
-        biggest_offset = 0
-        while biggest_offset < length:
-            for i in self.rhythm.beats:
-                offset = i[0] + base_offset
-                biggest_offset = offset if offset > biggest_offset else biggest_offset
-                if biggest_offset >= length:
-                    break
-                beats_to_mix.append([self.sample.rec, offset])
-            base_offset += self.rhythm.length
-        mixed = mix_multiple(beats_to_mix)
-        return mixed
+        node = PatternNode(self.patterns(length), cache=cache)
+        arr = node.render(0, node.length(), SampleFormat.float_dtype())
+        source_block = {"active pair": self.name}
+        return Recording(mode="create", arr=arr, source_block=source_block, 
+            rate=self.sample.rate.magnitude, parent=self.parent)
 
 
     class Variability(Controller):
@@ -381,6 +443,7 @@ class Sampler(RelPublicObj, RelSavedObj):
         self.active = [] if active is None else active
         #TODO: BPM_Controller()
         self.bpm = Units.rate(120) if bpm is None else bpm 
+        self.sample_cache = SampleCache()
 
     # Representation #
     def __repr__(self):
@@ -417,6 +480,11 @@ class Sampler(RelPublicObj, RelSavedObj):
                 pass
 
 
+    def parse_write_meta(self, attrs):
+        attrs = super().parse_write_meta(attrs)
+        del attrs["sample_cache"]
+        return attrs
+
     @public_process
     def edit_bpm(self):
         raise NotImplementedError
@@ -438,6 +506,7 @@ class Sampler(RelPublicObj, RelSavedObj):
         p("Process this sample? y/n")
         if inpt("yn"):
             process(new_samp)
+            self.sample_cache.drop(new_samp)
 
     @public_process
     def add_sample_group(self):
@@ -457,6 +526,7 @@ class Sampler(RelPublicObj, RelSavedObj):
                 .format(self.reltype, self.name), end="")
             sample = self.choose("sample")
             process(sample)
+            self.sample_cache.drop(sample)
 
     @public_process
     def list_samples(self):
@@ -564,6 +634,27 @@ class Sampler(RelPublicObj, RelSavedObj):
         act = self.choose('active')
         act.muted = False
 
+    def render_node(self, length=None):
+        """
+        PatternNode of every unmuted active pair, for the render graph. length is samples
+        """
+        if length is None:
+            p("Enter the length of sampler output to generate, in beats")
+            length = ind(inpt('beats'))
+        patterns = []
+        for a in self.active:
+            if not a.muted:
+                patterns += a.patterns(length)
+        return PatternNode(patterns, cache=self.sample_cache)
+
+    @public_process
+    def cache_info(self):
+        """
+        cat: info
+        desc: show how much of the sample cache is used, and how often hits reuse it
+        """
+        self.sample_cache.info()
+
     @public_process
     def generate(self, reps=None):
         """
@@ -572,13 +663,13 @@ class Sampler(RelPublicObj, RelSavedObj):
             active name: name of active pair to generate
             reps: number of repetitions of active rhythm to generate
         """
-        length = samps(inpt('beats'), RelGlobals.DEFAULT_SAMPLERATE)
-        recs = []
-        for a in self.active:
-            if not a.muted:
-                recs.append( a.generate_active(length) )
-        mixed = mix_multiple(recs)
-        mixed.playback()
+        node = self.render_node()
+        if node.length() == 0:
+            err_mess("No unmuted active pairs to generate!")
+            return
+        section_head("Playback of {0} '{1}'".format(self.reltype, self.name))
+        # plays as it renders
+        play_blocks(Mixer([node]).blocks(), int(node.patterns[0][0].rate.magnitude))
 
 
 
@@ -0,0 +1,197 @@
+"""
+spectral analysis: short-time fourier transforms of mono audio, and the
+features built on them. frames are strided views of the signal, transformed a
+batch at a time, so features of long audio never hold the whole spectrogram
+
+    frame i: fft_size samples from i * hop, windowed
+    features: one value per frame
+        centroid: magnitude-weighted mean frequency, in hz
+        flux: how much the spectrum grew since the frame before
+        pitch: fundamental frequency in hz, 0 where no pitch is found
+"""
+
+import numpy as np
+
+from src.data_types import PitchUnits
+from src.errors import *
+from src.sample_format import SampleFormat
+
+
+class Spectral:
+    """
+    spectra of one mono signal. every result is computed once, on first use
+        rate: samples per second, as a number
+        fft_size: samples per frame
+        hop: samples between frame starts, default fft_size / 4
+        window: one of Spectral.windows
+    """
+
+    windows = ("hann", "hamming", "blackman", "rect")
+    # frames transformed at once
+    batch_frames = 256
+    # spectra kept per recording, see Analysis.get_spectral
+    cache_size = 8
+
+    def __init__(self, signal, rate, fft_size=2048, hop=None, window="hann"):
+        if window not in self.windows:
+            raise ValueError("Unknown window '{0}', must be one of '{1}'".format(
+                window, "', '".join(self.windows)))
+        self.rate = rate
+        self.fft_size = int(fft_size)
+        self.hop = self.fft_size // 4 if hop is None else max(int(hop), 1)
+        self.window_name = window
+        self.window = Spectral.get_window(window, self.fft_size)
+
+        signal = SampleFormat.to_float(np.asarray(signal))
+        # pad the end so the last samples start a frame of their own
+        frames = 1 + -(-max(signal.shape[0] - self.fft_size, 0) // self.hop)
+        self.signal = np.zeros(self.fft_size + (frames - 1) * self.hop, dtype=signal.dtype)
+        self.signal[:signal.shape[0]] = signal
+        self.frames = frames if signal.shape[0] > 0 else 0
+        self.results = {}
+
+    @staticmethod
+    def get_window(name, size):
+        if name == "rect":
+            return np.ones(size)
+        return {"hann": np.hanning, "hamming": np.hamming, "blackman": np.blackman}[name](size)
+
+    def frame_starts(self):
+        """
+        sample index each frame starts at
+        """
+        return np.arange(self.frames) * self.hop
+
+    def freqs(self):
+        """
+        frequency of each bin, in hz
+        """
+        return np.fft.rfftfreq(self.fft_size, 1 / self.rate)
+
+    def batches(self):
+        """
+        yield (first frame, (frames, fft_size) windowed frames), batch_frames at a time
+        """
+        strided = np.lib.stride_tricks.sliding_window_view(self.signal, self.fft_size)[::self.hop]
+        for first in range(0, self.frames, self.batch_frames):
+            yield first, strided[first : first + self.batch_frames] * self.window
+
+    def stft(self):
+        """
+        (frames, bins) complex spectra
+        """
+        if "stft" not in self.results:
+            out = np.empty((self.frames, self.fft_size // 2 + 1), dtype=np.complex64)
+            for first, frames in self.batches():
+                out[first : first + frames.shape[0]] = np.fft.rfft(frames, axis=1)
+            self.results["stft"] = out
+        return self.results["stft"]
+
+    def spectrogram(self):
+        """
+        (frames, bins) magnitudes
+        """
+        if "spectrogram" not in self.results:
+            if "stft" in self.results:
+                self.results["spectrogram"] = np.abs(self.results["stft"])
+            else:
+                out = np.empty((self.frames, self.fft_size // 2 + 1), dtype=np.float32)
+                for first, frames in self.batches():
+                    out[first : first + frames.shape[0]] = np.abs(np.fft.rfft(frames, axis=1))
+                self.results["spectrogram"] = out
+        return self.results["spectrogram"]
+
+    def magnitude_batches(self):
+        """
+        yield (first frame, magnitudes) a batch at a time, from the spectrogram if
+        it has been computed
+        """
+        if "spectrogram" in self.results:
+            mags = self.results["spectrogram"]
+            for first in range(0, self.frames, self.batch_frames):
+                yield first, mags[first : first + self.batch_frames]
+        else:
+            for first, frames in self.batches():
+                yield first, np.abs(np.fft.rfft(frames, axis=1))
+
+    def compute_features(self):
+        """
+        centroid and flux, in one pass over the spectra
+        """
+        freqs = self.freqs()
+        centroid = np.zeros(self.frames)
+        flux = np.zeros(self.frames)
+        previous = None
+        for first, mags in self.magnitude_batches():
+            end = first + mags.shape[0]
+            totals = mags.sum(axis=1)
+            centroid[first:end] = (mags @ freqs) / np.where(totals > 0, totals, 1)
+            # half-wave rectified: only energy arriving counts, for onsets
+            if previous is None:
+                previous = mags[:1]
+            rises = np.diff(np.concatenate((previous, mags)), axis=0)
+            flux[first:end] = np.sqrt(np.sum(np.maximum(rises, 0) ** 2, axis=1))
+            previous = mags[-1:]
+        self.results["centroid"] = centroid
+        self.results["flux"] = flux
+
+    def centroid(self):
+        if "centroid" not in self.results:
+            self.compute_features()
+        return self.results["centroid"]
+
+    def flux(self):
+        if "flux" not in self.results:
+            self.compute_features()
+        return self.results["flux"]
+
+    def pitch(self, fmin=50, fmax=2000, threshold=0.5):
+        """
+        fundamental frequency of each frame in hz, from its autocorrelation, or 0
+        where the best lag correlates less than threshold (0 to 1)
+            fmin, fmax: range of frequencies to search, in hz
+        """
+        key = ("pitch", fmin, fmax, threshold)
+        if key in self.results:
+            return self.results[key]
+        lo = max(int(self.rate / fmax), 1)
+        hi = int(np.ceil(self.rate / fmin))
+        # past half a frame, too little of the frame overlaps itself to trust
+        if hi > self.fft_size // 2 or hi <= lo:
+            raise ValueError("Frames of {0} samples are too short to find pitches down to {1}hz".format(
+                self.fft_size, fmin))
+        # the window's own autocorrelation, which tapers every frame's
+        window_ac = np.fft.irfft(np.abs(np.fft.rfft(self.window, n=2 * self.fft_size)) ** 2)
+        taper = window_ac[lo - 1 : hi + 2] / window_ac[0]
+
+        pitches = np.zeros(self.frames)
+        for first, frames in self.batches():
+            spectra = np.fft.rfft(frames, n=2 * self.fft_size, axis=1)
+            ac = np.fft.irfft(spectra.real ** 2 + spectra.imag ** 2, axis=1)
+            energy = ac[:, 0]
+            # lags lo - 1 through hi + 1, for the local maximum checks
+            corr = ac[:, lo - 1 : hi + 2] / np.where(energy > 0, energy, 1)[:, None] / taper
+            inner = corr[:, 1:-1]
+            peaks = (inner >= corr[:, :-2]) & (inner >= corr[:, 2:])
+            best = np.max(np.where(peaks, inner, -np.inf), axis=1)
+            # the first peak near the best, so octaves below aren't chosen instead
+            near_best = peaks & (inner >= 0.9 * best[:, None])
+            lag = np.argmax(near_best, axis=1)
+            peaked = near_best.any(axis=1)
+            rows = np.arange(inner.shape[0])
+            left, center, right = corr[rows, lag], corr[rows, lag + 1], corr[rows, lag + 2]
+            # parabolic interpolation between lags
+            curve = left - 2 * center + right
+            shift = np.where(curve < 0, 0.5 * (left - right) / np.where(curve < 0, curve, -1), 0)
+            periods = lag + lo + shift
+            voiced = (best >= threshold) & peaked & (energy > 0)
+            pitches[first : first + frames.shape[0]] = np.where(voiced, self.rate / periods, 0)
+        self.results[key] = pitches
+        return pitches
+
+    def notes(self, **pitch_args):
+        """
+        (note name, cents off) of each frame's pitch, or None where there is none
+        """
+        return [PitchUnits.freq_to_note(freq) if freq > 0 else None
+            for freq in self.pitch(**pitch_args)]
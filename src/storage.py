@@ -0,0 +1,120 @@
+"""
+memory-mapped audio storage. mapped arrays are read from disk a page at a time
+as they are touched, so slicing, playback and analysis of a long file only
+read the parts they use. maps are copy-on-write: edits land in private memory
+pages, and never in the file
+
+mappable sources:
+    .npy: any (frames, 2) float array saved by numpy
+    .wav: stereo float or double data, mapped straight from the data chunk
+"""
+
+import os
+import struct
+
+import numpy as np
+import soundfile as sf
+
+from src.autosave import atomic_write
+
+
+# wav format tags, and the extensible format's subformat holding the real tag
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+WAV_SUBTYPES = {4: "FLOAT", 8: "DOUBLE"}
+
+
+def wav_data_layout(path):
+    """
+    find a wav file's sample format and data chunk. returns (dtype, channels,
+    data offset in bytes, frames), or None if the data isn't float samples
+    """
+    with open(path, "rb") as f:
+        riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                body = f.read(size)
+                tag, channels, _, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    tag = struct.unpack("<H", body[24:26])[0]
+                fmt = (tag, channels, bits)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    return None
+                tag, channels, bits = fmt
+                if tag != WAVE_FORMAT_IEEE_FLOAT or bits not in (32, 64):
+                    return None
+                dtype = np.dtype("<f4") if bits == 32 else np.dtype("<f8")
+                offset = f.tell()
+                # writers that couldn't seek back leave the size unset
+                size = min(size, os.path.getsize(path) - offset)
+                return dtype, channels, offset, size // (dtype.itemsize * channels)
+            else:
+                # chunks are padded to even sizes
+                f.seek(size + (size % 2), 1)
+
+
+def map_audio(path):
+    """
+    copy-on-write memory map of a stereo audio file, as (frames, 2). returns
+    (arr, rate), or None if the file can't be mapped and has to be read instead
+    """
+    if path.endswith(".npy"):
+        arr = np.load(path, mmap_mode="c")
+        if arr.ndim != 2 or arr.shape[1] != 2:
+            return None
+        # numpy stores no rate, so it sits next to the array
+        try:
+            with open(path + ".rate", "r") as f:
+                rate = int(f.read())
+        except FileNotFoundError:
+            return None
+        return arr, rate
+    try:
+        layout = wav_data_layout(path)
+    except (OSError, struct.error):
+        return None
+    if layout is None:
+        return None
+    dtype, channels, offset, frames = layout
+    if channels != 2 or frames == 0:
+        return None
+    arr = np.memmap(path, dtype=dtype, mode="c", offset=offset, shape=(frames, channels))
+    return arr, sf.info(path).samplerate
+
+
+def save_mappable(path, arr, rate):
+    """
+    write arr so that it can be mapped on the next load: .npy as is, wav as
+    float samples of arr's own precision. writes a new file and then renames
+    it over path, so an array still mapped from path keeps reading its old data
+    """
+    if path.endswith(".npy"):
+        def write(temp):
+            with open(temp, "wb") as f:
+                np.save(f, arr)
+        with open(path + ".rate", "w") as f:
+            f.write(str(int(rate)))
+    else:
+        subtype = WAV_SUBTYPES.get(np.dtype(arr.dtype).itemsize, "FLOAT")
+        write = lambda temp: sf.write(temp, arr, int(rate), subtype=subtype, format="WAV")
+    atomic_write(path, write)
+
+
+def is_mapped(arr):
+    """
+    whether arr still reads from a file mapping
+    """
+    while arr is not None:
+        if isinstance(arr, np.memmap):
+            return True
+        arr = getattr(arr, "base", None)
+    return False
@@ -0,0 +1,73 @@
+"""
+polyphonic synth voices: a voice is a patch of oscillators at ratios of each
+note's pitch, summed under one adsr envelope. every note of a score is
+rendered straight into one buffer, a batch of notes at a time, so a bar of
+polyphony is a handful of array operations per oscillator
+
+    note: (freq hz, start sample, gate samples[, amplitude]). a note sounds for
+        its gate and then its release
+"""
+
+import numpy as np
+
+from src.envelopes import Envelope
+from src.errors import *
+from src.oscillator import Oscillator
+
+
+class Voice:
+    """
+    a synth patch
+        partials: list of (waveform, frequency ratio, amplitude)
+        attack, decay, release: seconds
+        sustain: level held after decay, 0 to 1
+    """
+
+    def __init__(self, partials, attack=0.01, decay=0.1, sustain=0.8, release=0.1, bandlimit=True):
+        if len(partials) == 0:
+            raise ValueError("A voice needs at least one partial")
+        if not 0 <= sustain <= 1:
+            raise ValueError("Sustain must be between 0 and 1, got {0}".format(sustain))
+        self.partials = [(Oscillator.validate_waveform(waveform), float(ratio), float(amp))
+            for waveform, ratio, amp in partials]
+        self.attack = attack
+        self.decay = decay
+        self.sustain = sustain
+        self.release = release
+        self.bandlimit = bandlimit
+
+    def release_samples(self, rate):
+        return int(round(self.release * rate))
+
+    def render(self, notes, rate, length=None, amp=1, out=None, rng=None):
+        """
+        sum notes played on this voice into one mono buffer
+            notes: note rows, as above
+            length: buffer length, default the end of the last release
+            out: buffer to add into, instead of a new one
+        """
+        freqs, starts, gates, amps = Oscillator.read_notes(notes, amp)
+        release = self.release_samples(rate)
+        # each note sounds through its release
+        counts = np.where(gates > 0, gates + release, 0)
+        if out is None:
+            if length is None:
+                length = int(np.max(starts + counts, initial=0))
+            out = np.zeros(int(length))
+
+        for batch, note_firsts, offsets in Oscillator.note_batches(counts):
+            repeats = counts[batch]
+            increments = Oscillator.per_sample(freqs[batch] / rate, repeats)
+            wave = np.zeros(offsets.shape[0])
+            for waveform, ratio, partial_amp in self.partials:
+                partial_inc = increments * ratio
+                phases = Oscillator.wrap(offsets * partial_inc)
+                partial = Oscillator.shape(waveform, phases, partial_inc, self.bandlimit, rng)
+                # partials at or past nyquist would only alias
+                audible = partial_inc < 0.5
+                wave += np.where(audible, partial_amp * partial, 0)
+            gain = Envelope.adsr(offsets, Oscillator.per_sample(gates[batch], repeats), self.attack * rate,
+                self.decay * rate, self.sustain, release)
+            wave *= gain * Oscillator.per_sample(amps[batch], repeats)
+            Oscillator.add_notes(out, wave, starts[batch], note_firsts, repeats)
+        return out
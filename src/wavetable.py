@@ -0,0 +1,100 @@
+"""
+wavetables: one cycle of a waveform, summed from its harmonics, and read at
+any frequency by linear interpolation between table samples. a note's
+highest harmonic must stay below nyquist, so each waveform has a table per
+power of two harmonics, and a note reads the fullest table it can without
+aliasing. tables are built on first use and kept in a small lru cache
+
+    table: (2, table_size) array of each sample of the cycle, and the slope
+        from it to the next, so interpolation needs only one lookup of each
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from src.errors import *
+
+
+class Wavetable:
+    """
+    staticmethod class for building, caching, and reading wavetables
+    """
+
+    # numpy's sine is faster than any table read, and has no harmonics to limit
+    waveforms = ("square", "saw", "triangle")
+    table_size = 4096
+    # harmonics past a quarter of the table are too coarse to interpolate
+    max_harmonics = table_size // 4
+    # tables kept, least recently used dropped first
+    cache_size = 48
+    tables = OrderedDict()
+
+    @staticmethod
+    def get(waveform, harmonics):
+        """
+        table of waveform summed up to harmonics, from the cache
+        """
+        key = (waveform, harmonics)
+        table = Wavetable.tables.get(key)
+        if table is None:
+            table = Wavetable.build(waveform, harmonics)
+            Wavetable.tables[key] = table
+            if len(Wavetable.tables) > Wavetable.cache_size:
+                Wavetable.tables.popitem(last=False)
+        else:
+            Wavetable.tables.move_to_end(key)
+        return table
+
+    @staticmethod
+    def build(waveform, harmonics):
+        """
+        one cycle of waveform from its first harmonics sine partials, matching
+        the phase and level of Oscillator's naive waveforms
+        """
+        k = np.arange(1, min(harmonics, Wavetable.max_harmonics) + 1)
+        if waveform == "saw":
+            amps = -2 / (np.pi * k)
+        elif waveform == "square":
+            amps = np.where(k % 2 == 1, 4 / (np.pi * k), 0)
+        else:
+            amps = np.where(k % 2 == 1, 8 / (np.pi * k) ** 2 * (-1) ** ((k - 1) // 2), 0)
+        # a sine partial of amplitude b is bin -b * size / 2 * i
+        spectrum = np.zeros(Wavetable.table_size // 2 + 1, dtype=np.complex128)
+        spectrum[k] = -0.5j * Wavetable.table_size * amps
+        table = np.fft.irfft(spectrum, Wavetable.table_size)
+        return np.stack((table, np.roll(table, -1) - table))
+
+    @staticmethod
+    def octaves(increments):
+        """
+        log2 of the harmonics each sample can hold below nyquist, rounded down,
+        from its phase increment. -1 where even the fundamental is past nyquist
+        """
+        ratios = np.asarray(0.5 / increments, dtype=np.float64)
+        # the exponent bits of a float are its log2, rounded down
+        exponents = (ratios.view(np.int64) >> 52) - 1023
+        return np.clip(exponents, -1, int(np.log2(Wavetable.max_harmonics)))
+
+    @staticmethod
+    def read(waveform, phases, increments):
+        """
+        waveform at phases (0 to 1), each read from the table for its own
+        increment, or all from the table for one increment
+        """
+        if phases.shape[0] == 0:
+            return np.zeros(0)
+        octaves = Wavetable.octaves(np.asarray(increments))
+        lo, hi = int(octaves.min()), int(octaves.max())
+        # tables for every octave present, side by side, the silent one for -1
+        rows = [np.zeros((2, Wavetable.table_size)) if octave < 0 else Wavetable.get(waveform, 2 ** octave)
+            for octave in range(lo, hi + 1)]
+        values, slopes = np.concatenate(rows, axis=1)
+        position = phases * Wavetable.table_size
+        index = position.astype(np.int64)
+        frac = position - index
+        # phases a rounding error short of 0 land on 1
+        index &= Wavetable.table_size - 1
+        if hi > lo:
+            index += (octaves - lo) * Wavetable.table_size
+        return values[index] + frac * slopes[index]
@@ -0,0 +1,728 @@
+"""
+
+benchmarks for the vectorized audio engines, compared against the
+per-sample loops they replaced. run from the relativism directory:
+
+    python3 testcases/benchmarks.py [benchmark names...]
+
+"""
+
+
+import io, os, sys, tempfile, time, types
+from contextlib import redirect_stdout
+
+global relativism_dir
+relativism_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(relativism_dir)
+
+import numpy as np
+
+from src.debug import time_this
+from src.resampling import Resample
+from src.envelopes import Envelope
+
+
+RATE = 44100
+
+
+def test_audio(secs):
+    """
+    stereo noise, secs long
+    """
+    return (np.random.random((int(RATE * secs), 2)) - 0.5) * 0.5
+
+
+
+""" Legacy implementations """
+
+def legacy_stretch(arr, factor):
+    """
+    Recording.stretch before the resampling engine
+    """
+    new_rec = []
+    factor_count = 0
+    for i in arr:
+        factor_count += factor
+        for _ in range(int(factor_count)):
+            new_rec.append(i)
+        factor_count -= int(factor_count)
+    return np.asarray(new_rec)
+
+
+def legacy_sliding_stretch(arr, i_factor, f_factor):
+    """
+    Recording.sliding_stretch middle section before the resampling engine
+    """
+    middle = []
+    factor_count = 0
+    factor = i_factor
+    delta_factor = (f_factor - i_factor) / len(arr)
+    for i in arr:
+        factor_count += factor
+        for _ in range(int(factor_count)):
+            middle.append(i)
+        factor_count = factor_count - int(factor_count)
+        factor += delta_factor
+    return np.asarray(middle)
+
+
+def legacy_reverb_wet(arr, rate, size, dampening, spread):
+    """
+    Reverb1 wet output before impulse responses: every sample bounced
+    recursively through the node graph. dampening and spread as fractions
+    """
+    import math
+    from src.effects import angle_to_pan
+
+    # reflecting nodes, listener, source; as in Reverb1
+    coords = [(size, 0), (-size, 0), (0, 0), (0, size / 2)]
+    purposes = ["node", "node", "listener", "source"]
+    other_nodes = []
+    for tx, ty in coords:
+        others = []
+        for ind, (ox, oy) in enumerate(coords):
+            if (ox, oy) != (tx, ty):
+                try:
+                    angle = math.atan((oy - ty) / (ox - tx))
+                    if str(angle) == "-0.0":
+                        angle = math.pi
+                except ZeroDivisionError:
+                    angle = math.pi / 2
+                others.append([ind, angle, math.sqrt((oy - ty)**2 + (ox - tx)**2)])
+        other_nodes.append(others)
+
+    wet_out = [[0, 0] for _ in range(len(arr))]
+
+    def bounce(node, samp, in_angle, offset):
+        if purposes[node] == "source":
+            return
+        if purposes[node] == "listener":
+            pan = angle_to_pan(in_angle) * 0.5
+            while offset >= len(wet_out):
+                wet_out.append([0, 0])
+            wet_out[offset][0] += samp * (0.5 - pan)
+            wet_out[offset][1] += samp * (0.5 + pan)
+            return
+        samp *= (1 - dampening)
+        if samp < 0.005:
+            return
+        for other, angle, dist in other_nodes[node]:
+            bounce(other, samp, angle, int(offset + (dist / 343 * rate)))
+
+    for samp_ind in range(len(arr)):
+        samp = arr[samp_ind]
+        for other, angle, dist in other_nodes[3]:
+            if purposes[other] != "listener":
+                pan = angle_to_pan(angle) * spread
+                samp_val = (samp[0] * (1 - pan)) + (samp[1] * (1 + pan))
+                bounce(other, samp_val, angle, int(dist / 343 * rate) + samp_ind)
+    return np.asarray(wet_out, dtype=np.float64)
+
+
+def legacy_white_noise_injection(arr, amount):
+    import random as rd
+    for i in range(len(arr)):
+        dist = amount / 1000 * rd.random()
+        arr[i][0] += dist
+        arr[i][1] += dist
+
+
+def legacy_saw(arr, period, amount, amp=0.5):
+    delta = amp * 4 / period
+    val = 0
+    for i in range(len(arr)):
+        arr[i] = [
+            ((arr[i][0] * (1 - amount)) + (val * amount)), 
+            ((arr[i][1] * (1 - amount)) + (val * amount))
+        ]
+        val += delta
+        if abs(val) > (amp + 0.001):
+            delta *= -1
+
+
+def legacy_bit_swap(arr, amount):
+    import random as rd
+    end = len(arr) - 2
+    for _ in range(int(amount / 100 * len(arr))):
+        ind = rd.randint(0, end)
+        arr[ind], arr[ind + 1] = arr[ind + 1], arr[ind]
+
+
+def legacy_scrambler(arr, rate, amount):
+    import random as rd
+    while amount >= 1:
+        chunk = rate // rd.randint(2, 8)
+        start = rd.randint(0, len(arr) - chunk)
+        new = rd.randint(0, len(arr) - chunk)
+        chunk_arr = arr[start:start+chunk]
+        arr = np.concatenate((arr[:start], arr[start+chunk:]))
+        arr = np.concatenate((arr[:new], chunk_arr, arr[new:]))
+        amount -= 1
+    return arr
+
+
+def legacy_muffler(arr, amount):
+    for i in range(int(amount)):
+        for ind in range(1, len(arr) - 1):
+            if (ind + i) % 2 == 0:
+                arr[ind][0] = (arr[ind - 1][0] + arr[ind + 1][0]) / 2
+            else:
+                arr[ind][1] = (arr[ind - 1][1] + arr[ind + 1][1]) / 2
+
+
+def legacy_mix_multiple(arrs_offsets):
+    """
+    mix_multiple's pairwise fold, arrays only (each step also wrote a Recording)
+    """
+    mixed = arrs_offsets[0][0]
+    for arr, offset in arrs_offsets[1:]:
+        total_length = max(mixed.shape[0], offset + arr.shape[0])
+        mix_arr = np.zeros((total_length, 2))
+        mix_arr[:mixed.shape[0]] += mixed
+        mix_arr[offset : offset + arr.shape[0]] += arr
+        mixed = mix_arr
+    return mixed
+
+
+def legacy_rhythm_hits(places, rhythm_length, reps):
+    """
+    Active.hits and mix_items before compiled rhythms: unit arithmetic and a
+    conversion to samples for every hit
+    """
+    from src.data_types import Units
+    from src.integraters import mix_items
+    hits = []
+    base_offset = Units.beats("0b")
+    for _ in range(reps):
+        for place in places:
+            hits.append([None, place + base_offset])
+        base_offset = base_offset + rhythm_length
+    return mix_items(hits)
+
+
+def legacy_get_frames(array, samp_len, frame_length, frame_step, start=0):
+    """
+    Analysis.get_frames before the running-sum envelope
+    """
+    frames = []
+    for i in range(0, samp_len - frame_length, frame_step):
+        frame = array[i : i + frame_length]
+        frames.append((i + start, np.mean(np.abs(frame))))
+    return np.array(frames)
+
+
+def legacy_find_peaks(frames):
+    """
+    Analysis.find_peaks before the convex hull scan
+    """
+    slopes = []
+    frm_ind = 0
+    while frm_ind < len(frames):
+        highest_slope = 0
+        compare_ind = frm_ind + 1
+        while (compare_ind < len(frames)) and (frames[compare_ind][1] > frames[compare_ind - 1][1]):
+            new_slope = 1000 * (frames[compare_ind][1] - frames[frm_ind][1]) / (compare_ind - frm_ind)
+            highest_slope = new_slope if new_slope > highest_slope else highest_slope
+            compare_ind += 1
+        if highest_slope != 0:
+            slopes.append((frames[frm_ind][0], highest_slope))
+        frm_ind += 1
+    return np.asarray(slopes)
+
+
+def legacy_filter_peaks(peaks, frame_length):
+    """
+    Analysis.filter_peaks before sorted-order suppression
+    """
+    avg_slope = np.mean(peaks[:,1])
+    peaks = peaks[peaks[:,1] >= avg_slope]
+    sorted_peaks = peaks[peaks[:, 1].argsort()][::-1]
+    p_ind = 0
+    while p_ind < sorted_peaks.shape[0]:
+        comp_ind = p_ind + 1
+        while comp_ind < sorted_peaks.shape[0]:
+            comp_val = sorted_peaks[comp_ind][0]
+            if (comp_val - (5 * frame_length) < sorted_peaks[p_ind][0] < comp_val + (5 * frame_length)):
+                sorted_peaks = np.delete(sorted_peaks, comp_ind, 0)
+            else:
+                comp_ind += 1
+        p_ind += 1
+    return sorted_peaks
+
+
+def legacy_square(freq, dur, amp=0.05, rate=RATE):
+    """
+    Generator.SimpleWave.square before the oscillator engine
+    """
+    period = int(rate / freq)
+    period_arr = [amp] * (period // 2) + [-amp] * ((period + 1) // 2)
+    arr = period_arr * int(freq * dur + 1)
+    arr = arr[:int(rate * dur)]
+    return np.array([[i, i] for i in arr])
+
+
+def legacy_fade_in(arr, length, start=0):
+    """
+    Recording.fade_in before gain envelopes
+    """
+    for i in range(length):
+        try:
+            arr[i + start][0] *= i / length
+            arr[i + start][1] *= i / length
+        except IndexError:
+            if i + start >= 0:
+                return
+
+
+
+""" Benchmarks """
+
+def bench_stretch(secs=20):
+    arr = test_audio(secs)
+    print("\nstretch, {0} seconds of stereo audio".format(secs))
+    for factor in (0.5, 1.5, 3):
+        with time_this("legacy loop x{0}".format(factor)):
+            legacy_stretch(arr, factor)
+        for mode in Resample.modes:
+            with time_this("{0} x{1}".format(mode, factor)):
+                Resample.stretch(arr, factor, mode)
+
+
+def bench_sliding_stretch(secs=20):
+    arr = test_audio(secs)
+    print("\nsliding stretch, {0} seconds of stereo audio".format(secs))
+    for i_factor, f_factor in ((0.5, 2), (3, 0.25)):
+        with time_this("legacy loop {0}x to {1}x".format(i_factor, f_factor)):
+            legacy_sliding_stretch(arr, i_factor, f_factor)
+        for mode in Resample.modes:
+            with time_this("{0} {1}x to {2}x".format(mode, i_factor, f_factor)):
+                Resample.sliding_stretch(arr, i_factor, f_factor, mode)
+
+
+def bench_reverb(secs=2):
+    # effects needs an audio device, so only import it here
+    from src.effects import Reverb1
+    from src.data_types import Units
+    arr = test_audio(secs)
+    print("\nreverb, {0} seconds of stereo audio".format(secs))
+    with time_this("legacy recursive bounce"):
+        legacy_reverb_wet(arr, RATE, 10, 0.5, 0.5)
+    rec = types.SimpleNamespace(arr=arr, rate=Units.rate(RATE))
+    Reverb1._ir_cache.clear()
+    with time_this("impulse response and convolution"):
+        Reverb1(rec, 10, 50, 50, 80, spread=50)
+    rec.arr = test_audio(180)
+    with time_this("convolution of 3 minutes, cached response"):
+        Reverb1(rec, 10, 50, 50, 80, spread=50)
+
+
+def throughput(name, func, samples):
+    """
+    time func (hiding its own prints), and print samples processed per second
+    """
+    start = time.time()
+    with redirect_stdout(io.StringIO()):
+        func()
+    elapsed = max(time.time() - start, 1e-9)
+    print("{0}: {1:,.0f} samples/sec".format(name, samples / elapsed))
+
+
+def bench_effects(secs=60, legacy_secs=2):
+    from src.effects import Distortion, Bitcrusher, Dynamics
+    from src.data_types import Units
+    print("\neffects throughput, {0} seconds of stereo audio ({1} for legacy loops)".format(
+        secs, legacy_secs))
+    arr = test_audio(legacy_secs)
+    rec = types.SimpleNamespace(arr=test_audio(secs), rate=Units.rate(RATE))
+    n, legacy_n = rec.arr.shape[0], arr.shape[0]
+    throughput("legacy white noise injection", lambda: legacy_white_noise_injection(arr, 30), legacy_n)
+    throughput("white noise injection", lambda: Distortion.white_noise_injection(rec, 30), n)
+    throughput("legacy saw", lambda: legacy_saw(arr, RATE / 440, 0.5), legacy_n)
+    throughput("saw", lambda: Distortion.saw(rec, 440, 50), n)
+    throughput("legacy bit swap", lambda: legacy_bit_swap(arr, 40), legacy_n)
+    throughput("bit swap", lambda: Bitcrusher.bit_swap(rec, 40), n)
+    throughput("legacy muffler x5", lambda: legacy_muffler(arr, 5), legacy_n)
+    throughput("muffler x5", lambda: Dynamics.muffler(rec, 5), n)
+
+
+def bench_mix(tracks=16, secs=60):
+    from src.integraters import mix_multiple
+    from src.data_types import Units
+    print("\nmixing {0} tracks of {1} seconds, staggered".format(tracks, secs))
+    items = [[test_audio(secs), i * RATE] for i in range(tracks)]
+    with time_this("legacy pairwise fold"):
+        legacy_mix_multiple(items)
+    recs = [[types.SimpleNamespace(arr=arr, rate=Units.rate(RATE), name=str(offset), 
+        get_panned_rec=lambda sub=None, arr=arr: arr if sub is None else sub), offset] for arr, offset in items]
+    outfile = os.path.join(tempfile.mkdtemp(), "bench-mix.wav")
+    for dtype in (np.float64, np.float32):
+        with time_this("single allocation, streamed to wav, {0}".format(np.dtype(dtype).name)):
+            with redirect_stdout(io.StringIO()):
+                mix_multiple(recs, dtype=dtype, outfile=outfile)
+    os.remove(outfile)
+
+
+def bench_render(tracks=16, secs=60):
+    import tracemalloc
+    from src.render import Mixer, RecordingNode
+    print("\nrendering {0} tracks of {1} seconds, staggered, to wav".format(tracks, secs))
+    recs = [types.SimpleNamespace(arr=test_audio(secs), get_panned_rec=lambda sub: sub) 
+        for _ in range(tracks)]
+    nodes = [RecordingNode(rec, i * RATE) for i, rec in enumerate(recs)]
+    outfile = os.path.join(tempfile.mkdtemp(), "bench-render.wav")
+    tracemalloc.start()
+    with time_this("block render graph"):
+        Mixer(nodes).render_to_file(outfile, RATE)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("peak memory beyond the inputs: {0:.1f} MB (one full mix is {1:.1f} MB)".format(
+        peak / 2**20, (secs + tracks) * RATE * 16 / 2**20))
+    os.remove(outfile)
+
+
+def bench_storage(secs=600):
+    import soundfile as sf
+    from src.storage import map_audio, save_mappable
+    print("\nloading {0} seconds of stereo audio, then reading a 5 second window".format(secs))
+    path = os.path.join(tempfile.mkdtemp(), "bench-storage.wav")
+    save_mappable(path, test_audio(secs), RATE)
+    window = slice(RATE * secs // 2, RATE * (secs // 2 + 5))
+    with time_this("read whole file"):
+        sf.read(path)[0][window].sum()
+    with time_this("memory map"):
+        map_audio(path)[0][window].sum()
+    os.remove(path)
+
+
+def bench_formats(tracks=8, secs=60):
+    from src.integraters import mix_multiple
+    from src.sample_format import SampleFormat
+    from src.data_types import Units
+    print("\nsample formats: fading and mixing {0} tracks of {1} seconds".format(tracks, secs))
+    audio = [test_audio(secs) for _ in range(tracks)]
+    for fmt in SampleFormat.formats:
+        arrs = [SampleFormat.convert(arr, fmt) for arr in audio]
+        recs = [types.SimpleNamespace(arr=arr, rate=Units.rate(RATE), name=str(i), 
+            get_panned_rec=lambda sub=None, arr=arr: SampleFormat.to_float(arr if sub is None else sub)) 
+            for i, arr in enumerate(arrs)]
+        print("{0}: {1:.1f} MB of audio".format(fmt, sum(arr.nbytes for arr in arrs) / 2**20))
+        with time_this("{0} fade in".format(fmt)):
+            for arr in arrs:
+                Envelope.fade_in(arr, arr.shape[0])
+        outfile = os.path.join(tempfile.mkdtemp(), "bench-formats.wav")
+        with time_this("{0} mix to wav".format(fmt)):
+            with redirect_stdout(io.StringIO()):
+                mix_multiple(recs, dtype=SampleFormat.float_dtype(fmt), outfile=outfile)
+        os.remove(outfile)
+
+
+def bench_history(secs=600):
+    import soundfile as sf
+    from src.history import EditHistory
+    print("\nundo of a 1 second fade in {0} seconds of stereo audio".format(secs))
+    obj = types.SimpleNamespace(arr=test_audio(secs), pan_val=0)
+    path = os.path.join(tempfile.mkdtemp(), "bench-history.wav")
+    with time_this("legacy wav snapshot, then rewrite"):
+        sf.write(path, obj.arr, RATE)
+        os.rename(path, path + ".old")
+        Envelope.fade_in(obj.arr, RATE, RATE * 10)
+        sf.write(path, obj.arr, RATE)
+    history = EditHistory()
+    with time_this("region delta"):
+        history.begin(obj)
+        Envelope.fade_in(obj.arr, RATE, RATE * 10)
+        history.commit(obj, "fade_in")
+    print("delta size: {0:.2f} MB".format(history.undos[-1].nbytes() / 2**20))
+    with time_this("undo"):
+        history.undo(obj)
+    os.remove(path)
+    os.remove(path + ".old")
+
+
+def bench_autosave(secs=600, edits=5):
+    import soundfile as sf
+    from src.autosave import AudioWriter
+    print("\n{0} quick edits to {1} seconds of stereo audio, saving after each".format(edits, secs))
+    arr = test_audio(secs)
+    path = os.path.join(tempfile.mkdtemp(), "bench-autosave.wav")
+    with time_this("saving synchronously"):
+        for _ in range(edits):
+            arr *= 0.99
+            sf.write(path, arr, RATE)
+    writer = AudioWriter()
+    with time_this("background writer, time until each edit returns"):
+        for _ in range(edits):
+            arr *= 0.99
+            writer.submit(path, arr, lambda p, a: sf.write(p, a, RATE, format="WAV"))
+    with time_this("flush of the one coalesced write"):
+        writer.flush()
+    os.remove(path)
+
+
+def bench_frames(secs=240):
+    from src.analysis import Analysis
+    from src.data_types import Units
+    print("\nframing {0} seconds of audio, 1/20 sec frames every 1/100 sec".format(secs))
+    rec = types.SimpleNamespace(arr=test_audio(secs), rate=Units.rate(RATE), 
+        size_samps=lambda: Units.samps(secs * RATE))
+    anl = Analysis(rec)
+    anl.set_frame_fractions(1/20, 1/100)
+    with time_this("legacy loop"):
+        legacy_get_frames(anl.mono_arr, anl.samp_len, anl.frame_length, anl.frame_step)
+    for kind in Analysis.envelope_kinds:
+        with time_this("{0} envelope".format(kind)):
+            anl.get_frames(anl.mono_arr, kind=kind)
+
+
+def bench_peaks(secs=600, legacy_secs=60):
+    from src.analysis import Analysis
+    from src.data_types import Units
+    print("\npeak detection on {0} seconds of audio ({1} for legacy loops)".format(secs, legacy_secs))
+    # a crescendo under beats, with long rises for the old scan
+    t = np.arange(secs * RATE) / RATE
+    beats = np.exp(-((t * 2) % 1) * 8) * (0.5 + 0.5 * (t % 30) / 30)
+    arr = np.stack([beats * (np.random.random(t.shape[0]) - 0.5)] * 2, axis=1)
+    rec = types.SimpleNamespace(arr=arr, rate=Units.rate(RATE), size_samps=lambda: Units.samps(arr.shape[0]))
+    anl = Analysis(rec)
+    with redirect_stdout(io.StringIO()):
+        frames = anl.get_frames_mono()
+    legacy_frames = frames[:frames.shape[0] * legacy_secs // secs]
+    with time_this("legacy find peaks"):
+        legacy_peaks = legacy_find_peaks(legacy_frames)
+    with time_this("legacy filter peaks"):
+        legacy_filter_peaks(legacy_peaks, anl.frame_length)
+    with time_this("find peaks"):
+        peaks = anl.find_peaks(frames)
+    with time_this("filter peaks"):
+        filtered = anl.filter_peaks(peaks)
+    print("{0:,} frames, {1:,} peaks, {2:,} after filtering".format(frames.shape[0], peaks.shape[0], filtered.shape[0]))
+
+
+def bench_overview(secs=(60, 3600), width=1600):
+    from src.overview import PeakPyramid
+    for length in secs:
+        print("\nwaveform view of {0} seconds of stereo audio, {1} buckets wide".format(length, width))
+        arr = test_audio(length).astype(np.float32)
+        with time_this("build overview"):
+            pyramid = PeakPyramid.build(arr)
+        print("overview size: {0:.2f} MB".format(pyramid.nbytes() / 2**20))
+        with time_this("whole file view"):
+            PeakPyramid.plot_points(*pyramid.window(arr, 0, arr.shape[0], width))
+        with time_this("10 second view"):
+            PeakPyramid.plot_points(*pyramid.window(arr, RATE * 20, RATE * 30, width))
+
+
+def bench_plot(secs=300):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from src.data_types import Units
+    from src.output_and_prompting import rel_plot
+    print("\nplotting {0} seconds of stereo audio".format(secs))
+    arr = test_audio(secs)
+    shown = plt.show
+    plt.show = lambda: plt.gcf().canvas.draw()
+    try:
+        with time_this("rel_plot, drawn"):
+            with redirect_stdout(io.StringIO()):
+                rel_plot(arr[:, 0], Units.samps(0), Units.samps(arr.shape[0]), Units.rate(RATE), 
+                    right=arr[:, 1], fill=True)
+    finally:
+        plt.show = shown
+        plt.close("all")
+
+
+def bench_spectral(secs=600):
+    from src.spectral import Spectral
+    print("\nspectral features of {0} seconds of audio".format(secs))
+    t = np.arange(RATE * secs) / RATE
+    # a note every quarter second, rising through two octaves
+    signal = np.sin(2 * np.pi * np.cumsum(220 * 2 ** ((t * 4 % 24) // 1 / 12)) / RATE)
+    spectral = Spectral(signal, RATE)
+    with time_this("centroid and flux"):
+        spectral.centroid()
+        spectral.flux()
+    with time_this("pitch"):
+        spectral.pitch()
+    with time_this("notes"):
+        spectral.notes()
+    with time_this("cached pitch"):
+        spectral.pitch()
+
+
+def bench_eq(secs=600):
+    from src.filters import Equalizer
+    print("\n5 band eq of {0} seconds of stereo audio".format(secs))
+    arr = test_audio(secs)
+    bands = [("highpass", 30, 0, 0.7071), ("lowshelf", 120, 3, 0.7071), ("peak", 800, -4, 1.5), 
+        ("peak", 3000, 2, 2), ("highshelf", 9000, -3, 0.7071)]
+    with time_this("equalize in place"):
+        Equalizer(bands, RATE).apply(arr)
+    print("working memory per block: {0:.2f} MB".format(Equalizer.block_size * 2 * 8 * 3 / 2**20))
+
+
+def bench_oscillator(notes=20000, secs=120):
+    from src.oscillator import Oscillator
+    print("\n{0} notes of 0.01 to 0.1 seconds, over {1} seconds".format(notes, secs))
+    with time_this("legacy square, 10 seconds"):
+        legacy_square(440, 10)
+    with time_this("square, 10 seconds"):
+        Oscillator.render("square", RATE * 10, 440, RATE)
+    Oscillator.use_wavetables = False
+    with time_this("square with polyblep, 10 seconds"):
+        Oscillator.render("square", RATE * 10, 440, RATE)
+    Oscillator.use_wavetables = True
+    rng = np.random.default_rng(0)
+    score = np.stack((rng.uniform(60, 1000, notes), rng.integers(0, RATE * secs, notes), 
+        rng.integers(RATE // 100, RATE // 10, notes)), axis=1)
+    with time_this("note by note"):
+        out = np.zeros(RATE * (secs + 1))
+        for freq, start, dur in score:
+            out[int(start) : int(start + dur)] += Oscillator.render("saw", int(dur), freq, RATE)
+    with time_this("batched"):
+        Oscillator.render_notes("saw", score, RATE)
+
+
+def bench_voices(bars=16, polyphony=8):
+    from src.oscillator import Oscillator
+    from src.voices import Voice
+    voice = Voice([("saw", 1, 0.5), ("square", 0.5, 0.3), ("sine", 2, 0.2), ("triangle", 3, 0.2)], 
+        attack=0.01, decay=0.2, sustain=0.6, release=0.3)
+    # a bar of 2 seconds per chord, every voice held through it
+    rng = np.random.default_rng(0)
+    score = np.array([(rng.uniform(80, 800), bar * 2 * RATE, 2 * RATE) 
+        for bar in range(bars) for _ in range(polyphony)])
+    voice_secs = score.shape[0] * (2 + voice.release)
+    print("\n{0} bars of {1} voices, {2} oscillators each".format(bars, polyphony, len(voice.partials)))
+    with time_this("note by note"):
+        out = np.zeros(RATE * (2 * bars + 1))
+        release = voice.release_samples(RATE)
+        for freq, note_start, gate in score:
+            count = int(gate) + release
+            wave = sum(Oscillator.render(waveform, count, freq * ratio, RATE, amp=amp) 
+                for waveform, ratio, amp in voice.partials)
+            wave *= Envelope.adsr(np.arange(count), gate, voice.attack * RATE, voice.decay * RATE, 
+                voice.sustain, release)
+            out[int(note_start) : int(note_start) + count] += wave
+    start = time.perf_counter()
+    with time_this("batched"):
+        voice.render(score, RATE)
+    elapsed = time.perf_counter() - start
+    print("{0:.0f} voice seconds per second".format(voice_secs / elapsed))
+
+
+def bench_sampler(secs=240, legacy_secs=20):
+    from src.data_types import Units
+    from src.render import HitsNode, Mixer, PatternNode
+    from src.sampler import Rhythm
+    # kick on quarters, hat on sixteenths, at 120 bpm
+    beat = RATE // 2
+    kick = types.SimpleNamespace(arr=test_audio(0.5), get_panned_rec=lambda sub: sub)
+    hat = types.SimpleNamespace(arr=test_audio(0.05), get_panned_rec=lambda sub: sub)
+    kicks = Rhythm.repeat([0], beat, RATE * secs)
+    hats = Rhythm.repeat(np.arange(4) * beat // 4, beat, RATE * secs)
+    print("\n{0} hits over {1} seconds".format(kicks.shape[0] + hats.shape[0], secs))
+    legacy_hits = [[rec.arr, offset] for rec, offsets in ((kick, kicks), (hat, hats)) 
+        for offset in offsets if offset < RATE * legacy_secs]
+    rhythm = types.SimpleNamespace(name="hat", length=Units.beats("1b"), 
+        beats=[[Units.beats(place), 0, 0] for place in ("0b", "1sn", "2sn", "3sn")])
+    with time_this("legacy hit list"):
+        legacy_rhythm_hits([beat[0] for beat in rhythm.beats], rhythm.length, secs * 2)
+    with time_this("compiled rhythm"):
+        cycle, snippets = Rhythm.compile(rhythm)
+        Rhythm.repeat(snippets[(0, None)], cycle, RATE * secs)
+    with time_this("legacy pairwise fold, {0} seconds".format(legacy_secs)):
+        legacy_mix_multiple(sorted(legacy_hits, key=lambda h: h[1]))
+    with time_this("hit by hit"):
+        Mixer([HitsNode([[kick, offset] for offset in kicks] + [[hat, offset] for offset in hats])]).render()
+    with time_this("scattered patterns"):
+        Mixer([PatternNode([(kick, kicks, 0, None), (hat, hats, 0, None)])]).render()
+
+
+def bench_sample_cache(secs=240):
+    from src.data_types import Units
+    from src.render import Mixer, PatternNode
+    from src.sample_cache import SampleCache
+    from src.sampler import Active, Rhythm
+    snare = types.SimpleNamespace(arr=test_audio(0.2), rel_id=1, get_panned_rec=lambda sub: sub)
+    pair = types.SimpleNamespace(sample=snare, variability=Units.pcnt(60), variant_steps=Active.variant_steps, 
+        max_semitones=Active.max_semitones, rhythm=types.SimpleNamespace(compile=lambda: (RATE // 2, {(0, None): [0, RATE // 4]})))
+    pair.hit_variants = lambda count, rng=None: Active.hit_variants(pair, count, rng)
+    patterns = Active.patterns(pair, RATE * secs, np.random.default_rng(0))
+    hits = sum(pattern[1].shape[0] for pattern in patterns)
+    print("\n{0} varied hits over {1} seconds".format(hits, secs))
+    with time_this("variant rendered per hit"):
+        out = np.zeros((RATE * secs + snare.arr.shape[0], 2))
+        for rec, offsets, start, frames, semitones, gain in patterns:
+            for offset in offsets:
+                variant = SampleCache.render(rec, semitones, gain, start, frames)
+                out[offset : offset + variant.shape[0]] += variant
+    cache = SampleCache()
+    with time_this("cached variants"):
+        Mixer([PatternNode(patterns, cache=cache)]).render()
+    with time_this("cached variants, rendered again"):
+        Mixer([PatternNode(patterns, cache=cache)]).render()
+    cache.info()
+
+
+def bench_chance(draws=10**6, scrambles=200, secs=10):
+    import random as rd
+    from src.chance import Chance
+    from src.data_types import Units
+    from src.effects import scrambler
+    print("\n{0:,} random draws".format(draws))
+    with time_this("legacy random module, one call per draw"):
+        [rd.random() for _ in range(draws)]
+    with time_this("seeded stream, one batch"):
+        Chance.rng("bench").random(draws)
+    print("\n{0} scrambles of {1} seconds of stereo audio".format(scrambles, secs))
+    arr = test_audio(secs)
+    with time_this("legacy scrambler"):
+        legacy_scrambler(arr, RATE, scrambles)
+    rec = types.SimpleNamespace(arr=arr, rate=Units.rate(RATE))
+    with time_this("scrambler"), redirect_stdout(io.StringIO()):
+        scrambler(rec, scrambles)
+
+
+def bench_fade(secs=60):
+    arr = test_audio(secs)
+    length = arr.shape[0] // 2
+    print("\nfade-in over {0} seconds of stereo audio".format(secs / 2))
+    with time_this("legacy loop"):
+        legacy_fade_in(arr, length)
+    for kind in Envelope.kinds:
+        with time_this("{0} envelope".format(kind)):
+            Envelope.fade_in(arr, length, kind=kind)
+
+
+
+BENCHMARKS = {
+    "stretch": bench_stretch,
+    "sliding_stretch": bench_sliding_stretch,
+    "fade": bench_fade,
+    "reverb": bench_reverb,
+    "effects": bench_effects,
+    "mix": bench_mix,
+    "render": bench_render,
+    "storage": bench_storage,
+    "formats": bench_formats,
+    "history": bench_history,
+    "autosave": bench_autosave,
+    "frames": bench_frames,
+    "peaks": bench_peaks,
+    "overview": bench_overview,
+    "plot": bench_plot,
+    "spectral": bench_spectral,
+    "eq": bench_eq,
+    "oscillator": bench_oscillator,
+    "voices": bench_voices,
+    "sampler": bench_sampler,
+    "sample_cache": bench_sample_cache,
+    "chance": bench_chance,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] if len(sys.argv) > 1 else list(BENCHMARKS.keys())
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,652 @@
+"""
+
+tests for the numpy audio engines. these need no audio device or project,
+so they run anywhere numpy does:
+
+    python3 testcases/engine_testcases.py
+
+"""
+
+
+import unittest
+
+import os, sys, tempfile, time, types
+
+global relativism_dir
+relativism_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(relativism_dir)
+
+import numpy as np
+import soundfile as sf
+
+from src.analysis import Analysis
+from src.chance import Chance
+from src.autosave import AudioWriter, atomic_write
+from src.controller import ContinuousController, ContinuousMarker
+from src.convolution import Convolver
+from src.data_types import Units
+from src.envelopes import Envelope
+from src.filters import Biquad, Equalizer
+from src.history import EditHistory
+from src.oscillator import Oscillator
+from src.output_and_prompting import decimate_points, plot_channel
+from src.overview import PeakPyramid
+from src.resampling import Resample
+from src.sample_cache import SampleCache
+from src.sample_format import SampleFormat
+from src.spectral import Spectral
+from src.storage import is_mapped, map_audio, save_mappable
+from src.voices import Voice
+from src.wavetable import Wavetable
+from benchmarks import (legacy_filter_peaks, legacy_find_peaks, legacy_get_frames, 
+    legacy_stretch, legacy_sliding_stretch)
+
+
+
+class EngineTestCases(unittest.TestCase):
+
+    def test_resampling(self):
+        arr = np.random.random((2000, 2))
+
+        # nearest matches the classic frame-repeating stretch, including the
+        # rounding drift of factors that aren't exact in binary
+        for factor in (0.1, 0.3, 0.375, 0.7, 0.9, 1, 1.1, 1.7, 2.5, 3.3):
+            self.assertTrue(np.array_equal(Resample.stretch(arr, factor), legacy_stretch(arr, factor)))
+
+        for mode in Resample.modes:
+            self.assertEqual(Resample.stretch(arr, 1.5, mode).shape, (3000, 2))
+            self.assertEqual(Resample.stretch(arr[:, 0], 0.5, mode).shape, (1000,))
+
+        # interpolating modes keep float32 audio float32
+        for mode in ("linear", "sinc"):
+            self.assertEqual(Resample.stretch(arr.astype(np.float32), 1.5, mode).dtype, np.float32)
+
+        # interpolating modes preserve a slow sine
+        sine = np.sin(np.arange(2000) * 2 * np.pi / 200)
+        stretched = Resample.stretch(sine, 2, "sinc")
+        expected = np.sin(np.arange(4000) * 2 * np.pi / 400)
+        self.assertLess(np.max(np.abs(stretched[100:-100] - expected[100:-100])), 1e-3)
+
+        with self.assertRaises(ValueError):
+            Resample.stretch(arr, 2, "cubic")
+
+
+    def test_sliding_stretch(self):
+        arr = np.random.random((20000, 2))
+
+        # nearest matches stepping the factor frame by frame, for constant and
+        # non-dyadic ramps as well as ones that round cleanly
+        for i_factor, f_factor in ((0.5, 2), (0.7, 0.7), (0.3, 0.3), (0.3, 1.7), (3, 0.25), (1.1, 0.9)):
+            expected = legacy_sliding_stretch(arr, i_factor, f_factor)
+            self.assertTrue(np.array_equal(Resample.sliding_stretch(arr, i_factor, f_factor), expected))
+            linear = Resample.sliding_stretch(arr, i_factor, f_factor, "linear")
+            self.assertLessEqual(abs(linear.shape[0] - expected.shape[0]), 1)
+
+        # a constant ramp in sinc mode is a plain sinc stretch
+        sine = np.sin(np.arange(20000) * 2 * np.pi / 50)
+        sliding = Resample.sliding_stretch(sine, 1.5, 1.5, "sinc")
+        plain = Resample.stretch(sine, 1.5, "sinc")
+        self.assertLess(np.max(np.abs(sliding[100:-100] - plain[100:-100])), 1e-3)
+
+        # the expanding end of a ramp isn't low-passed at the shrinking end's cutoff
+        sine = np.sin(np.arange(20000) * 2 * np.pi / 5)
+        sliding = Resample.sliding_stretch(sine, 3, 0.25, "sinc")
+        self.assertGreater(np.max(np.abs(sliding[1000:5000])), 0.9)
+
+    def test_envelopes(self):
+        arr = np.ones((1000, 2))
+
+        # linear fades match the per-sample loops they replaced
+        Envelope.fade_in(arr, 100, start=50)
+        self.assertTrue(np.allclose(arr[50:150, 0], np.arange(100) / 100))
+        self.assertTrue(np.all(arr[150:] == 1))
+        Envelope.fade_out(arr, 200)
+        self.assertTrue(np.allclose(arr[800:, 1], (200 - np.arange(200)) / 200))
+
+        # regions hanging off either end are clipped
+        arr = np.ones((100, 2))
+        Envelope.fade_in(arr, 50, start=-25)
+        self.assertAlmostEqual(arr[0, 0], 0.5)
+        Envelope.fade_out(arr, 50, end=125)
+        self.assertAlmostEqual(arr[99, 0], 0.52)
+
+        for kind in Envelope.kinds:
+            curve = Envelope.curve(64, kind, 1, 0)
+            self.assertEqual(curve.shape, (64,))
+            self.assertTrue(np.all(np.diff(curve) <= 0))
+
+        # hard has no ramp to fade along
+        with self.assertRaises(ValueError):
+            Envelope.fade_in(arr, 50, kind="hard")
+
+        auto = Envelope.automation([(0, 0, "hard"), (10, 1, "linear"), (20, 0.5, "hard")], 30)
+        self.assertTrue(np.allclose(auto[:11], np.arange(11) / 10))
+        self.assertTrue(np.all(auto[11:20] == 1) and np.all(auto[20:] == 0.5))
+
+        gain = Envelope.lfo(100, period=50, depth=0.5, phase=[0, 0.5])
+        self.assertEqual(gain.shape, (100, 2))
+        self.assertAlmostEqual(gain[0, 0], 1)
+        self.assertAlmostEqual(gain[0, 1], 0.5)
+
+
+
+    def test_controller_envelope(self):
+        markers = {
+            0: ContinuousMarker(Units.beats("0b"), Units.new("50pcnt"), "hard"),
+            4410: ContinuousMarker(Units.beats("0.1b"), 1, "linear"),
+            8820: ContinuousMarker(Units.beats("0.2b"), Units.new("20pcnt"), "hard"),
+        }
+        cont = ContinuousController(name="volume", val_units="pcnt", time_units="beats",
+            markers=markers, path=tempfile.mkdtemp())
+        env = cont.envelope(10000)
+        # pint values come through in base units, change types shape each segment
+        self.assertAlmostEqual(env[0], 0.5)
+        self.assertAlmostEqual(env[2205], 0.75)
+        self.assertTrue(np.all(env[4410:8820] == 1))
+        self.assertTrue(np.all(env[8820:] == 0.2))
+
+        inds, vals = cont.generate()
+        self.assertEqual(inds.shape, (8821,))
+        self.assertTrue(np.array_equal(vals, env[:8821]))
+
+    def test_convolution(self):
+        arr = np.random.random((5000, 2)) - 0.5
+
+        # every impulse response shape matches direct convolution
+        ir = np.random.random(1500)
+        expected = np.stack([np.convolve(arr[:, c], ir) for c in range(2)], axis=1)
+        self.assertTrue(np.allclose(Convolver.convolve(arr, ir, block_size=256), expected))
+
+        ir = np.random.random((300, 2, 2))
+        expected = np.stack([
+            sum(np.convolve(arr[:, i], ir[:, i, o]) for i in range(2)) for o in range(2)
+        ], axis=1)
+        self.assertTrue(np.allclose(Convolver.convolve(arr, ir, block_size=128), expected))
+
+        # streaming in uneven chunks gives the same output
+        conv = Convolver(ir[:, 0, 0], block_size=64)
+        out = [conv.process(arr[i : i + 333, 0]) for i in range(0, 5000, 333)]
+        out = np.concatenate(out + [conv.flush()])
+        self.assertTrue(np.allclose(out, np.convolve(arr[:, 0], ir[:, 0, 0])))
+
+    def test_sample_format(self):
+        arr = np.random.random((1000, 2)) * 2 - 1
+
+        # formats convert at full scale, with int16 rounded and clipped
+        as_int = SampleFormat.convert(arr, "int16")
+        self.assertEqual(as_int.dtype, np.int16)
+        self.assertTrue(np.array_equal(as_int, np.rint(arr * 32767).astype(np.int16)))
+        self.assertLess(np.max(np.abs(SampleFormat.to_float(as_int) - arr)), 1 / 32767)
+        self.assertEqual(SampleFormat.to_float(as_int).dtype, np.float32)
+        self.assertTrue(SampleFormat.convert(arr, "float64") is arr)
+        self.assertTrue(np.array_equal(SampleFormat.convert(np.array([2.0, -2.0]), "int16"), [32767, -32768]))
+        with self.assertRaises(ValueError):
+            SampleFormat.validate("int8")
+
+        # envelopes apply to every format
+        for fmt in SampleFormat.formats:
+            converted = SampleFormat.convert(arr.copy(), fmt)
+            Envelope.fade_in(converted, 500, 100)
+            self.assertEqual(converted.dtype, np.dtype(fmt))
+            expected = arr.copy()
+            Envelope.fade_in(expected, 500, 100)
+            self.assertLess(np.max(np.abs(SampleFormat.to_float(converted) - expected)), 1e-4)
+
+        # gain beyond full scale clips instead of wrapping
+        loud = SampleFormat.convert(arr, "int16")
+        SampleFormat.multiply(loud, 4)
+        self.assertTrue(np.array_equal(np.sign(loud), np.sign(as_int)))
+
+    def test_history(self):
+        original = np.random.random((10000, 2))
+        obj = types.SimpleNamespace(arr=original.copy(), pan_val=0)
+        history = EditHistory()
+
+        def do_edit(name, func):
+            history.begin(obj)
+            func()
+            history.commit(obj, name)
+
+        states = [obj.arr.copy()]
+        do_edit("fade", lambda: Envelope.fade_in(obj.arr, 100, 2000))
+        # only the faded region is kept
+        self.assertEqual(history.undos[-1].old.shape, (100, 2))
+        states.append(obj.arr.copy())
+        do_edit("extend", lambda: setattr(obj, "arr", np.vstack((obj.arr, np.zeros((500, 2))))))
+        self.assertEqual(history.undos[-1].old.shape, (0, 2))
+        states.append(obj.arr.copy())
+        do_edit("stretch middle", lambda: setattr(obj, "arr", 
+            np.concatenate((obj.arr[:3000], Resample.stretch(obj.arr[3000:4000], 2), obj.arr[4000:]))))
+        states.append(obj.arr.copy())
+        do_edit("trim", lambda: setattr(obj, "arr", obj.arr[200:]))
+        states.append(obj.arr.copy())
+        do_edit("pan", lambda: setattr(obj, "pan_val", 0.5))
+        do_edit("nothing", lambda: None)
+        self.assertEqual(len(history), 5)
+
+        # undo everything, then redo it
+        self.assertEqual(history.undo(obj).name, "pan")
+        self.assertEqual(obj.pan_val, 0)
+        for state in states[::-1][1:]:
+            history.undo(obj)
+            self.assertTrue(np.array_equal(obj.arr, state))
+        self.assertIsNone(history.undo(obj))
+        for state in states[1:]:
+            history.redo(obj)
+            self.assertTrue(np.array_equal(obj.arr, state))
+        history.redo(obj)
+        self.assertEqual(obj.pan_val, 0.5)
+        self.assertIsNone(history.redo(obj))
+
+        # oldest edits go first, past the edit or byte limits
+        history = EditHistory(max_edits=3, max_bytes=20000)
+        for i in range(5):
+            do_edit(str(i), lambda: Envelope.apply(obj.arr, np.full(400, 0.5), i * 1000))
+        self.assertEqual([d.name for d in history.undos], ["2", "3", "4"])
+        do_edit("big", lambda: Envelope.apply(obj.arr, np.full(2000, 0.5)))
+        self.assertEqual([d.name for d in history.undos], ["big"])
+
+    def test_autosave(self):
+        writes = []
+        def write(path, arr):
+            writes.append((path, arr))
+        arr = np.zeros((100, 2))
+
+        # rapid edits coalesce into one write, of the last snapshot
+        writer = AudioWriter(debounce=0.2)
+        for i in range(5):
+            arr[:] = i
+            writer.submit("a.wav", arr, write)
+        arr[:] = 10
+        writer.submit("b.wav", np.ones((10, 2)), write)
+        writer.cancel("b.wav")
+        time.sleep(0.5)
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(writes[0][0], "a.wav")
+        self.assertTrue(np.all(writes[0][1] == 4))
+
+        # flush doesn't wait out the debounce
+        writer = AudioWriter(debounce=60)
+        writer.submit("c.wav", arr, write)
+        writer.flush()
+        self.assertEqual(writes[-1][0], "c.wav")
+
+        # errors come out of flush
+        def fail(path, arr):
+            raise OSError("disk full")
+        writer.submit("d.wav", arr, fail)
+        with self.assertRaises(OSError):
+            writer.flush()
+
+        # a failed write leaves the old file whole
+        path = os.path.join(tempfile.mkdtemp(), "e.wav")
+        atomic_write(path, lambda temp: open(temp, "w").write("old"))
+        with self.assertRaises(OSError):
+            atomic_write(path, lambda temp: fail(temp, arr))
+        with open(path) as f:
+            self.assertEqual(f.read(), "old")
+
+    def test_frames(self):
+        rec = types.SimpleNamespace(arr=np.random.random((20000, 2)) - 0.5, 
+            rate=Units.rate(44100), size_samps=lambda: Units.samps(20000))
+        anl = Analysis(rec, 1000, 19000)
+        anl.set_frame_lengths(441, 88)
+        frames = anl.get_frames(anl.mono_arr)
+        legacy = legacy_get_frames(anl.mono_arr, anl.samp_len, 441, 88, 1000)
+        self.assertEqual(frames.shape, legacy.shape)
+        self.assertTrue(np.allclose(frames, legacy))
+
+        # rms and peak envelopes over the same frames
+        rms = anl.get_frames(anl.arr[:, 0], kind="rms")
+        peak = anl.get_frames(anl.arr[:, 0], kind="peak")
+        self.assertTrue(np.array_equal(rms[:, 0], legacy[:, 0]))
+        for i in (0, 17, rms.shape[0] - 1):
+            frame = anl.arr[i * 88 : i * 88 + 441, 0]
+            self.assertAlmostEqual(rms[i, 1], np.sqrt(np.mean(frame ** 2)))
+            self.assertEqual(peak[i, 1], np.max(np.abs(frame)))
+
+        # exact frame counts, and too short to frame
+        anl.set_frame_lengths(18000 - 441, 441)
+        self.assertEqual(anl.get_frames(anl.mono_arr).shape, (1, 2))
+        anl.set_frame_lengths(18000)
+        self.assertEqual(anl.get_frames(anl.mono_arr, kind="peak").shape, (0,))
+
+    def test_peaks(self):
+        rec = types.SimpleNamespace(arr=np.random.random((20000, 2)) - 0.5, 
+            rate=Units.rate(44100), size_samps=lambda: Units.samps(20000))
+        anl = Analysis(rec)
+        anl.set_frame_lengths(10, 5)
+        # noise, with runs of rises and plateaus of every shape
+        amps = np.concatenate([np.random.random(300), np.cumsum(np.random.random(200)), 
+            np.sqrt(np.arange(100)), np.ones(10), np.arange(50) ** 2, np.random.random(300)])
+        frames = np.stack((np.arange(amps.shape[0]) * 5, amps), axis=1)
+
+        peaks = anl.find_peaks(frames)
+        legacy = legacy_find_peaks(frames)
+        self.assertEqual(peaks.shape, legacy.shape)
+        self.assertTrue(np.allclose(peaks, legacy))
+        filtered = anl.filter_peaks(peaks)
+        self.assertTrue(np.array_equal(filtered, legacy_filter_peaks(peaks, 10)))
+
+        self.assertEqual(anl.find_peaks(frames[:1]).shape, (0,))
+        self.assertEqual(anl.find_peaks(frames[::-1][:100]).shape, legacy_find_peaks(frames[::-1][:100]).shape)
+
+    def test_overview(self):
+        arr = np.random.random((300_000, 2)) - 0.5
+        pyramid = PeakPyramid.build(arr)
+        self.assertEqual(pyramid.levels[0].shape, (-(-300_000 // 256), 2, 2))
+        self.assertTrue(np.allclose(pyramid.levels[0][1, :, 0], arr[256:512].min(axis=0)))
+        self.assertTrue(np.allclose(pyramid.levels[-1][:, :, 1].max(axis=0), arr.max(axis=0)))
+        self.assertLessEqual(pyramid.levels[-1].shape[0], PeakPyramid.min_blocks)
+
+        # every window traces the true extremes of its frames, in about as many buckets as asked
+        for start, end, buckets in ((0, 300_000, 1000), (12_345, 250_000, 50), (1000, 9000, 800), (5, 105, 200)):
+            positions, lows, highs = pyramid.window(arr, start, end, buckets)
+            self.assertLessEqual(positions.shape[0], max(buckets, end - start))
+            self.assertTrue(np.allclose(lows.min(axis=0), arr[start:end].min(axis=0), atol=0.01))
+            self.assertTrue(np.allclose(highs.max(axis=0), arr[start:end].max(axis=0), atol=0.01))
+            self.assertTrue(np.all(np.diff(positions) > 0))
+        left, right = PeakPyramid.plot_points(positions, lows, highs)
+        self.assertEqual(left.shape, (positions.shape[0] * 2, 2))
+
+        # int16 overviews are scaled like float audio
+        quiet = SampleFormat.convert(arr * 0.5, "int16")
+        self.assertLess(np.max(PeakPyramid.build(quiet).levels[0]), 0.26)
+
+        path = os.path.join(tempfile.mkdtemp(), "overview.wav.peaks")
+        pyramid.save(path)
+        loaded = PeakPyramid.load(path)
+        self.assertTrue(loaded.matches(arr))
+        self.assertEqual(len(loaded.levels), len(pyramid.levels))
+        self.assertFalse(loaded.matches(arr[:-1]))
+        PeakPyramid.remove(path)
+        self.assertIsNone(PeakPyramid.load(path))
+
+    def test_plot_points(self):
+        values = np.random.random(100_000) - 0.5
+        secs, plotted = plot_channel(values, 44100, 44100)
+        self.assertEqual(secs[0], 1)
+        self.assertAlmostEqual(secs[-1], 1 + 99_999 / 44100)
+        points = np.stack((np.arange(100) * 10, np.arange(100)), axis=1)
+        secs, plotted = plot_channel(points, 0, 10)
+        self.assertTrue(np.array_equal(secs, np.arange(100)))
+
+        # decimation keeps the outline, and short lines as they are
+        x, y = decimate_points(np.arange(100_000), values, 1000)
+        self.assertEqual(x.shape, (1000,))
+        self.assertEqual((y.min(), y.max()), (values.min(), values.max()))
+        self.assertTrue(np.all(np.diff(x) >= 0))
+        x, y = decimate_points(np.arange(500), values[:500], 1000)
+        self.assertTrue(np.array_equal(y, values[:500]))
+
+    def test_spectral(self):
+        rate = 44100
+        t = np.arange(rate) / rate
+        spectral = Spectral(np.sin(2 * np.pi * 440 * t), rate, 2048, 512)
+        self.assertEqual(spectral.frames, 1 + -(-(rate - 2048) // 512))
+        stft = spectral.stft()
+        self.assertTrue(np.allclose(stft[3], np.fft.rfft(spectral.signal[1536:3584] * np.hanning(2048)), atol=1e-3))
+        self.assertTrue(np.allclose(spectral.spectrogram(), np.abs(stft), atol=1e-3))
+        self.assertTrue(np.allclose(spectral.centroid()[2:-2], 440, rtol=0.02))
+
+        # pitches of harmonic tones, and none in noise
+        for freq in (55, 220.5, 440, 1000):
+            for tone in (np.sin(2 * np.pi * freq * t), 2 * ((t * freq) % 1) - 1):
+                pitches = Spectral(tone, rate).pitch()
+                self.assertTrue(np.allclose(pitches[2:-2], freq, rtol=0.01))
+        self.assertEqual(Spectral(np.sin(2 * np.pi * 440 * t), rate).notes()[5][0], "a4")
+        noise = Spectral(np.random.random(rate) - 0.5, rate)
+        self.assertLess(np.mean(noise.pitch() > 0), 0.1)
+        with self.assertRaises(ValueError):
+            noise.pitch(fmin=10)
+
+        # flux jumps where a tone starts
+        onset = Spectral(np.concatenate((np.zeros(rate), np.sin(2 * np.pi * 440 * t))), rate)
+        self.assertLess(abs(onset.frame_starts()[np.argmax(onset.flux())] - rate), 2048)
+
+        # spectra are cached per recording and parameters
+        rec = types.SimpleNamespace(arr=SampleFormat.convert(np.random.random((rate, 2)) - 0.5, "int16"), 
+            rate=Units.rate(rate), size_samps=lambda: Units.samps(rate), spectra={})
+        anl = Analysis(rec)
+        self.assertIs(anl.get_spectral(), anl.get_spectral())
+        self.assertIsNot(anl.get_spectral(), anl.get_spectral(fft_size=1024))
+        self.assertLess(np.max(anl.get_spectral("left").spectrogram()), 2048)
+        for size in range(Spectral.cache_size + 2):
+            anl.get_spectral(fft_size=256 + size)
+        self.assertEqual(len(rec.spectra), Spectral.cache_size)
+
+    def test_filters(self):
+        rate = 44100
+        def response(kind, freq, gain, q, at):
+            return Equalizer([(kind, freq, gain, q)], rate).response(at)
+
+        self.assertAlmostEqual(response("peak", 1000, 6, 1, [1000])[0], 6, places=3)
+        self.assertLess(abs(response("peak", 1000, -9, 2, [50, 15000])).max(), 0.5)
+        low, high = response("lowshelf", 300, 6, 0.7071, [10, 15000])
+        self.assertAlmostEqual(low, 6, places=1)
+        self.assertAlmostEqual(high, 0, places=1)
+        low, high = response("highshelf", 3000, -6, 0.7071, [10, 20000])
+        self.assertAlmostEqual(low, 0, places=1)
+        self.assertAlmostEqual(high, -6, places=1)
+        self.assertAlmostEqual(response("lowpass", 2000, 0, 0.7071, [2000])[0], -3.01, places=1)
+        self.assertLess(response("highpass", 2000, 0, 0.7071, [100])[0], -50)
+        self.assertEqual(Biquad.validate_kind("Low-Shelf"), "lowshelf")
+        with self.assertRaises(ValueError):
+            Biquad.validate_kind("bandpass")
+        with self.assertRaises(ValueError):
+            Biquad.design("peak", 30000, rate)
+
+        # filtering in blocks carries state, matching one pass over the whole array
+        arr = np.random.random((100_000, 2)) - 0.5
+        bands = [("lowshelf", 100, 3, 0.7071), ("peak", 1000, -4, 2), ("highpass", 40, 0, 0.7071)]
+        whole = Equalizer(bands, rate).apply(arr.copy())
+        eq = Equalizer(bands, rate)
+        eq.block_size = 7000
+        self.assertTrue(np.allclose(eq.apply(arr.copy()), whole))
+        stream = Equalizer(bands, rate)
+        streamed = np.concatenate([stream.process(arr[i : i + 999]) for i in range(0, arr.shape[0], 999)])
+        self.assertTrue(np.allclose(streamed, whole))
+
+        pcm = SampleFormat.convert(arr, "int16")
+        Equalizer(bands, rate).apply(pcm)
+        self.assertEqual(pcm.dtype, np.int16)
+        self.assertLess(np.max(np.abs(SampleFormat.to_float(pcm) - whole)), 1e-3)
+
+    def test_oscillator(self):
+        rate = 44100
+        self.assertTrue(np.allclose(Oscillator.render("sine", 1000, 441, rate, amp=0.5), 
+            0.5 * np.sin(2 * np.pi * 441 * np.arange(1000) / rate)))
+        self.assertTrue(np.allclose(Oscillator.render("saw", 100, 441, rate, bandlimit=False)[:5], 
+            [-1, -0.98, -0.96, -0.94, -0.92]))
+        # a slide's phase accumulates its changing frequency
+        slide = Oscillator.phases(4, np.array([441, 882, 882, 441]), rate)
+        self.assertTrue(np.allclose(slide, [0, 0.01, 0.03, 0.05]))
+        with self.assertRaises(ValueError):
+            Oscillator.validate_waveform("pulse")
+
+        # band-limiting leaves less energy off the harmonics
+        def aliasing(wave, freq):
+            power = np.abs(np.fft.rfft(wave * np.blackman(wave.shape[0]))) ** 2
+            harmonic = np.abs((np.fft.rfftfreq(wave.shape[0], 1 / rate) + freq / 2) % freq - freq / 2) < 30
+            return power[~harmonic].sum() / power[harmonic].sum()
+        for waveform in ("saw", "square", "triangle"):
+            for freq in (440, 3000):
+                naive = aliasing(Oscillator.render(waveform, rate, freq, rate, bandlimit=False), freq)
+                for tables in (True, False):
+                    Oscillator.use_wavetables = tables
+                    try:
+                        self.assertLess(aliasing(Oscillator.render(waveform, rate, freq, rate), freq), naive)
+                    finally:
+                        Oscillator.use_wavetables = True
+
+        # notes rendered together sum like notes rendered one by one
+        notes = [(440, 100, 1000, 1), (660, 500, 1000, 0.5), (220, -50, 300, 1), (880, 1900, 500, 1), (330, 0, 0, 1)]
+        expected = np.zeros(2000)
+        for freq, start, dur, amp in notes:
+            wave = 0.3 * amp * Oscillator.render("square", dur, freq, rate)
+            lo, hi = max(start, 0), min(start + dur, 2000)
+            expected[lo:hi] += wave[lo - start : hi - start]
+        original = Oscillator.batch_samples
+        for batch in (original, 700):
+            Oscillator.batch_samples = batch
+            try:
+                rendered = Oscillator.render_notes("square", notes, rate, length=2000, amp=0.3)
+            finally:
+                Oscillator.batch_samples = original
+            self.assertTrue(np.allclose(rendered, expected))
+        self.assertEqual(Oscillator.render_notes("sine", [(440, 10, 90)], rate).shape, (100,))
+        self.assertEqual(Oscillator.render_notes("sine", [], rate).shape, (0,))
+        noise = [Oscillator.render("noise", 100, 1, rate, rng=np.random.default_rng(3)) for _ in range(2)]
+        self.assertTrue(np.array_equal(*noise))
+
+    def test_wavetable(self):
+        # fullest table without harmonics past nyquist
+        self.assertEqual(list(Wavetable.octaves(np.array([0.5 / 3, 0.5 / 4, 0.3, 0.5, 0.7, 1e-6]))), 
+            [1, 2, 0, 0, -1, 10])
+        saw = Wavetable.get("saw", 1024)
+        self.assertTrue(np.allclose(saw[0][1024:3072], np.linspace(-0.5, 0.5, 2048, endpoint=False), atol=0.01))
+        square = Wavetable.get("square", 1)
+        self.assertTrue(np.allclose(square[0], 4 / np.pi * np.sin(2 * np.pi * np.arange(4096) / 4096)))
+        # between table samples, along the slope
+        phases = np.array([0, 0.1, 0.5 + 0.25 / 4096, 0.999])
+        self.assertTrue(np.allclose(Wavetable.read("square", phases, 0.2), 4 / np.pi * np.sin(2 * np.pi * phases), atol=1e-5))
+        # each sample from its own octave's table
+        mixed = Wavetable.read("saw", np.tile(phases, 3), np.repeat([0.001, 0.2, 0.6], 4))
+        self.assertTrue(np.allclose(mixed, np.concatenate([Wavetable.read("saw", phases, inc) for inc in (0.001, 0.2, 0.6)])))
+        self.assertTrue(np.allclose(mixed[8:], 0))
+
+        size, tables = Wavetable.cache_size, Wavetable.tables.copy()
+        Wavetable.cache_size = 2
+        Wavetable.tables.clear()
+        try:
+            first = Wavetable.get("saw", 2)
+            Wavetable.get("saw", 4)
+            self.assertIs(Wavetable.get("saw", 2), first)
+            Wavetable.get("saw", 8)
+            self.assertEqual(list(Wavetable.tables), [("saw", 2), ("saw", 8)])
+        finally:
+            Wavetable.cache_size = size
+            Wavetable.tables.clear()
+            Wavetable.tables.update(tables)
+
+    def test_voices(self):
+        gain = Envelope.adsr(np.arange(12), 8, attack=2, decay=2, sustain=0.5, release=4)
+        self.assertTrue(np.allclose(gain, [0, 0.5, 1, 0.75, 0.5, 0.5, 0.5, 0.5, 0.5, 0.375, 0.25, 0.125]))
+        # released early, from partway up the attack
+        gain = Envelope.adsr(np.arange(6), 2, attack=4, decay=0, sustain=1, release=2)
+        self.assertTrue(np.allclose(gain, [0, 0.25, 0.5, 0.25, 0, 0]))
+        # one gate per offset shapes several notes at once
+        gain = Envelope.adsr([0, 1, 2, 0, 1, 2], [1, 1, 1, 3, 3, 3], attack=1, decay=0, sustain=1, release=2)
+        self.assertTrue(np.allclose(gain, [0, 1, 0.5, 0, 1, 1]))
+
+        rate = 44100
+        voice = Voice([("sine", 1, 1), ("square", 2, 0.5)], attack=0.01, decay=0.02, sustain=0.6, release=0.05)
+        release = voice.release_samples(rate)
+        notes = [(440, 0, 3000, 1), (660, 1000, 2000, 0.5), (330, 2500, 4000, 1)]
+        expected = np.zeros(2500 + 4000 + release)
+        for freq, start, gate, amp in notes:
+            count = gate + release
+            wave = Oscillator.render("sine", count, freq, rate) + Oscillator.render("square", count, 2 * freq, rate, amp=0.5)
+            wave *= 0.2 * amp * Envelope.adsr(np.arange(count), gate, 0.01 * rate, 0.02 * rate, 0.6, release)
+            expected[start : start + count] += wave
+        original = Oscillator.batch_samples
+        for batch in (original, 3000):
+            Oscillator.batch_samples = batch
+            try:
+                rendered = voice.render(notes, rate, amp=0.2)
+            finally:
+                Oscillator.batch_samples = original
+            self.assertEqual(rendered.shape, expected.shape)
+            self.assertTrue(np.allclose(rendered, expected))
+        # partials past nyquist are left out
+        high = Voice([("sine", 1, 1), ("sine", 8, 1)]).render([(4000, 0, 1000)], rate)
+        self.assertTrue(np.allclose(high, Voice([("sine", 1, 1)]).render([(4000, 0, 1000)], rate)))
+        with self.assertRaises(ValueError):
+            Voice([("sine", 1, 1)], sustain=2)
+
+    def test_chance(self):
+        # the same seed replays every stream
+        Chance.set_seed(7)
+        first = Chance.rng("a").random(100), Chance.rng("b").integers(0, 10, 100)
+        Chance.set_seed(7)
+        self.assertTrue(np.array_equal(Chance.rng("a").random(100), first[0]))
+        self.assertTrue(np.array_equal(Chance.rng("b").integers(0, 10, 100), first[1]))
+        # streams continue until reseeded, and differ by name and seed
+        self.assertFalse(np.array_equal(Chance.rng("a").random(100), first[0]))
+        self.assertFalse(np.array_equal(Chance.rng("c").random(100), first[0]))
+        Chance.set_seed(8)
+        self.assertFalse(np.array_equal(Chance.rng("a").random(100), first[0]))
+
+        # drawing more from one stream leaves another's draws alone
+        Chance.set_seed(7)
+        Chance.rng("a").random(1000)
+        self.assertTrue(np.array_equal(Chance.rng("b").integers(0, 10, 100), first[1]))
+
+    def test_sample_cache(self):
+        def make_rec(frames, rel_id):
+            rec = types.SimpleNamespace(arr=np.random.random((frames, 2)) - 0.5, rel_id=rel_id)
+            rec.get_panned_rec = lambda arr: arr * [1, 0.5]
+            return rec
+        kick, hat = make_rec(1000, 1), make_rec(100, 2)
+        # room for two whole kicks and the octave-up kick
+        cache = SampleCache(max_bytes=(2 * 1000 + 300) * 16)
+
+        variant = cache.get(kick, semitones=12, gain=0.5, start=200, frames=600)
+        expected = Resample.stretch(kick.arr[200:800], 0.5, SampleCache.resample_mode) * 0.5 * [1, 0.5]
+        self.assertTrue(np.allclose(variant, expected))
+        self.assertIs(cache.get(kick, 12, 0.5, 200, 600), variant)
+        self.assertTrue(np.allclose(cache.get(hat), hat.arr * [1, 0.5]))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        with self.assertRaises(ValueError):
+            variant[0, 0] = 1
+
+        # least recently used go first, once over the cap
+        cache.get(kick, gain=0.25)
+        cache.get(kick, 12, 0.5, 200, 600)
+        cache.get(kick, gain=0.75)
+        self.assertEqual(cache.evictions, 1)
+        self.assertNotIn(SampleCache.key(hat), cache.variants)
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+        self.assertEqual(cache.nbytes, sum(v.nbytes for v in cache.variants.values()))
+        # too big to keep, still returned
+        self.assertEqual(cache.get(make_rec(5000, 3)).shape, (5000, 2))
+        self.assertEqual(len(cache.variants), 3)
+
+        # edited samples are rendered again
+        cache.drop(kick)
+        self.assertEqual(len(cache.variants), 0)
+        self.assertEqual(cache.nbytes, 0)
+        self.assertAlmostEqual(cache.hit_rate(), 2 / 7)
+
+    def test_storage(self):
+        arr = np.random.random((5000, 2)) - 0.5
+        directory = tempfile.mkdtemp()
+
+        # float wavs and npy arrays map to exactly what was saved
+        for name, dtype in (("a.wav", np.float32), ("b.wav", np.float64), ("c.npy", np.float64)):
+            path = os.path.join(directory, name)
+            save_mappable(path, arr.astype(dtype), 44100)
+            mapped, rate = map_audio(path)
+            self.assertEqual(rate, 44100)
+            self.assertTrue(is_mapped(mapped) and is_mapped(mapped[100:200]))
+            self.assertTrue(np.array_equal(mapped, arr.astype(dtype)))
+
+            # edits are copy-on-write, leaving the file alone
+            mapped[:10] = 0
+            self.assertTrue(np.array_equal(map_audio(path)[0], arr.astype(dtype)))
+
+            # saving over the file a map is read from
+            save_mappable(path, mapped[::-1], 44100)
+            self.assertTrue(np.array_equal(map_audio(path)[0][-10:], np.zeros((10, 2))))
+
+        # integer and mono wavs can't be mapped, and are read instead
+        path = os.path.join(directory, "d.wav")
+        sf.write(path, arr, 44100, subtype="PCM_16")
+        self.assertIsNone(map_audio(path))
+        sf.write(path, arr[:, 0], 44100, subtype="FLOAT")
+        self.assertIsNone(map_audio(path))
+        self.assertFalse(is_mapped(arr))
+
+
+if __name__ == "__main__":
+    unittest.main()
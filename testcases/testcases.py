@@ -9,7 +9,7 @@ set FULLREC to true to test all Recording public processes
 import unittest
 from unittest.mock import patch
 
-import os, sys, re
+import os, sys, re, tempfile, types
 
 global relativism_dir
 relativism_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +25,14 @@ from src.relativism import *
 from src.project import *
 from src.path import *
 from src.utility import *
+from src.integraters import mix_multiple
+from src.process import process_script
+from src.render import HitsNode, Mixer, PatternNode, RecordingNode
+from src.sampler import Active, Rhythm
+from src.sample_format import SampleFormat
+from src.chance import Chance
+from src.effects import Bitcrusher, Distortion, Dynamics, Oscillator, Reverb1, scrambler
+from benchmarks import legacy_muffler, legacy_reverb_wet, legacy_saw
 
 
 
@@ -111,6 +119,219 @@ class TestCases(unittest.TestCase):
         self.assertEqual(inpt_validate("42.8", "beatsec"), Units.secs("42.8s"))
 
 
+    def test_tremolo(self):
+        # tremolo on a recording-shaped array, through the effect itself
+        rec = types.SimpleNamespace(
+            arr=np.ones((44100, 2)),
+            rate=Units.rate(44100),
+            size_samps=lambda: Units.samps(44100)
+        )
+        Oscillator.tremelo(rec, 4, 50, stereo_width=100)
+        self.assertAlmostEqual(rec.arr[0, 0], 1)
+        self.assertAlmostEqual(rec.arr[0, 1], 0.5)
+        self.assertAlmostEqual(np.min(rec.arr), 0.5)
+        self.assertAlmostEqual(rec.arr[5512, 0], 0.5)
+
+        with test_input_call(correct_input="90"):
+            rec.arr = np.ones((44100, 2))
+            Oscillator.tremelo(rec, 4, 150)
+        self.assertAlmostEqual(np.min(rec.arr), 0.1)
+
+
+    def test_effects(self):
+        def make_rec(arr):
+            return types.SimpleNamespace(arr=arr, rate=Units.rate(44100))
+        arr = np.random.random((20000, 2)) - 0.5
+
+        # muffler is exactly the alternating neighbour average
+        rec = make_rec(arr.copy())
+        expected = arr.copy()
+        legacy_muffler(expected, 3)
+        Dynamics.muffler(rec, 3)
+        self.assertTrue(np.allclose(rec.arr, expected))
+
+        # noise is one positive draw per frame, on both channels
+        rec = make_rec(arr.copy())
+        Distortion.white_noise_injection(rec, 50)
+        noise = rec.arr - arr
+        self.assertTrue(np.allclose(noise[:, 0], noise[:, 1]))
+        self.assertTrue(np.all(noise >= 0) and np.all(noise <= 0.05))
+
+        # saw is the legacy triangle, without its overshoot drifting the phase
+        rec = make_rec(arr.copy())
+        expected = arr.copy()
+        legacy_saw(expected, 44100 / 441, 0.5)
+        Distortion.saw(rec, 441, 50)
+        self.assertLess(np.max(np.abs(rec.arr[:100] - expected[:100])), 0.05)
+        self.assertAlmostEqual(np.max(rec.arr - arr * 0.5), 0.25)
+
+        # swapping only moves frames around
+        rec = make_rec(arr.copy())
+        Bitcrusher.bit_swap(rec, 40)
+        self.assertTrue(np.array_equal(np.sort(rec.arr, axis=0), np.sort(arr, axis=0)))
+        self.assertGreater(np.count_nonzero(np.any(rec.arr != arr, axis=1)), 0.4 * 20000)
+
+        # chance-based effects replay from the same seed
+        for effect, args in ((Bitcrusher.bit_swap, (40,)), (scrambler, (3,))):
+            results = []
+            for seed in (3, 3, 4):
+                Chance.set_seed(seed)
+                rec = make_rec(arr.copy())
+                effect(rec, *args)
+                results.append(rec.arr)
+            self.assertTrue(np.array_equal(results[0], results[1]))
+            self.assertFalse(np.array_equal(results[0], results[2]))
+            self.assertTrue(np.array_equal(np.sort(results[0], axis=0), np.sort(arr, axis=0)))
+
+        # effects keep each sample format, doing their math as floats
+        for fmt in SampleFormat.formats:
+            rec = make_rec(SampleFormat.convert(arr.copy(), fmt))
+            expected = arr.copy()
+            legacy_muffler(expected, 2)
+            Dynamics.muffler(rec, 2)
+            self.assertEqual(rec.arr.dtype, np.dtype(fmt))
+            self.assertLess(np.max(np.abs(SampleFormat.to_float(rec.arr) - expected)), 1e-4)
+
+
+    def test_mix(self):
+        def make_rec(arr, pan_val=0):
+            rec = types.SimpleNamespace(arr=arr, rate=Units.rate(44100), name="test", pan_val=pan_val)
+            rec.get_panned_rec = lambda arr=None: Recording.get_panned_rec(rec, arr)
+            return rec
+        a, b, c = [np.random.random((n, 2)) * 0.3 for n in (1000, 300, 2000)]
+        expected = np.zeros((2500, 2))
+        expected[:1000] += a
+        expected[700:1000] += make_rec(b, 0.5).get_panned_rec()
+        expected[500:2500] += c
+
+        # streamed in chunks that don't line up with any input
+        outfile = join_path(tempfile.mkdtemp(), "mix.wav")
+        with suppress_output():
+            mix_multiple([make_rec(a), [make_rec(b, 0.5), 700], [make_rec(c), 500]],
+                mix_level=0.5, outfile=outfile, chunk_size=333, dtype=np.float32)
+        mixed, rate = sf.read(outfile)
+        self.assertEqual(rate, 44100)
+        self.assertEqual(mixed.shape, (2500, 2))
+        self.assertLess(np.max(np.abs(mixed - expected * 0.5)), 1e-4)
+
+
+    def test_render(self):
+        def make_rec(arr, pan_val=0):
+            rec = types.SimpleNamespace(arr=arr, rate=Units.rate(44100), name="test", pan_val=pan_val)
+            rec.get_panned_rec = lambda arr=None: Recording.get_panned_rec(rec, arr)
+            return rec
+        a, b = [np.random.random((n, 2)) * 0.3 for n in (1000, 300)]
+        hits = [[make_rec(b, -0.5), offset] for offset in (900, 0, 150, 1200)]
+        expected = np.zeros((1500, 2))
+        expected[100:1100] += a * 0.5
+        for rec, offset in hits:
+            expected[offset : offset + 300] += rec.get_panned_rec()
+
+        # blocks that don't line up with any input, summed the same as mix_multiple
+        nodes = [RecordingNode(make_rec(a), 100, gain=0.5), HitsNode(hits)]
+        mixer = Mixer(nodes, block_size=128)
+        self.assertEqual(mixer.length(), 1500)
+        self.assertTrue(np.allclose(mixer.render(), expected))
+
+        # effects run per block, after gain
+        nodes[0].effects.append(lambda block: block * 2)
+        expected[100:1100] += a * 0.5
+        outfile = join_path(tempfile.mkdtemp(), "render.wav")
+        Mixer(nodes, mix_level=0.5, block_size=333).render_to_file(outfile, 44100)
+        rendered, rate = sf.read(outfile)
+        self.assertEqual(rate, 44100)
+        self.assertLess(np.max(np.abs(rendered - expected * 0.5)), 1e-4)
+
+
+    def test_sampler(self):
+        def make_rec(arr, pan_val=0):
+            rec = types.SimpleNamespace(arr=arr, rate=Units.rate(44100), name="test", pan_val=pan_val)
+            rec.get_panned_rec = lambda arr=None: Recording.get_panned_rec(rec, arr)
+            return rec
+
+        # beats compile to samples once, grouped by the snippet they play
+        rhythm = types.SimpleNamespace(name="test", length=Units.beats("2b"), beats=[
+            [Units.beats("0b"), 0, 0], [Units.beats("1qn"), "all", 0], 
+            [Units.beats("1en"), Units.beats("1en"), Units.beats("1sn")]])
+        cycle, snippets = Rhythm.compile(rhythm)
+        self.assertEqual(cycle, 44100)
+        self.assertEqual(sorted(snippets), [(0, None), (5512, 11025)])
+        self.assertEqual(list(Rhythm.repeat(snippets[(0, None)], cycle, 100000)), 
+            [0, 22050, 44100, 66150, 88200])
+
+        # short and long snippets, overlapping hits, and a repeated offset, 
+        # summed the same as one hit at a time
+        rng = np.random.default_rng(0)
+        short, long = make_rec(rng.random((40, 2)) - 0.5, 0.5), make_rec(rng.random((500, 2)) - 0.5)
+        patterns = [(short, np.arange(0, 2000, 7), 0, None), (long, [300, 100, 100, 1800], 50, 300),
+            (long, [], 0, None)]
+        expected = np.zeros((2100, 2))
+        for rec, offsets, first, frames in patterns:
+            snippet = rec.arr[first:] if frames is None else rec.arr[first : first + frames]
+            for offset in offsets:
+                expected[offset : offset + snippet.shape[0]] += rec.get_panned_rec(snippet)
+        node = PatternNode(patterns)
+        self.assertEqual(node.length(), 2100)
+        self.assertTrue(np.allclose(Mixer([node], block_size=128).render(), expected))
+        self.assertTrue(np.allclose(node.render(0, 2100, np.float64), expected))
+
+        # varied hits share a few cached variants
+        pair = types.SimpleNamespace(rhythm=types.SimpleNamespace(compile=lambda: (100, {(0, None): np.array([0, 50])})),
+            sample=short, variability=Units.pcnt(50), variant_steps=3, max_semitones=2)
+        pair.hit_variants = lambda count, rng=None: Active.hit_variants(pair, count, rng)
+        semitones, gains = pair.hit_variants(1000, np.random.default_rng(0))
+        self.assertEqual(sorted(set(semitones)), [-1, 0, 1])
+        self.assertEqual(sorted(set(gains)), [0.5, 0.75, 1])
+        patterns = Active.patterns(pair, 20000, np.random.default_rng(0))
+        self.assertLessEqual(len(patterns), 9)
+        self.assertEqual(sorted(np.concatenate([pattern[1] for pattern in patterns])), list(range(0, 20000, 50)))
+        node = PatternNode(patterns)
+        self.assertEqual((node.cache.misses, node.cache.hits), (len(patterns), 0))
+        PatternNode(patterns, cache=node.cache)
+        self.assertEqual(node.cache.hits, len(patterns))
+
+
+    def test_reverb(self):
+        # a pulse through the impulse response matches bouncing it through the nodes
+        for channel in (0, 1):
+            arr = np.zeros((10, 2))
+            arr[0, channel] = 1
+            legacy = legacy_reverb_wet(arr, 44100, 10, 0.5, 0.5)
+            rec = types.SimpleNamespace(arr=arr, rate=Units.rate(44100))
+            with suppress_output():
+                reverb = Reverb1(rec, 10, 50, wet=100, dry=0, spread=50)
+            pre_offset = reverb.delay(reverb.node_dist(reverb.listener, reverb.source))
+            legacy = legacy[pre_offset:]
+            self.assertTrue(np.allclose(rec.arr[:legacy.shape[0]], legacy))
+            self.assertTrue(np.allclose(rec.arr[legacy.shape[0]:], 0))
+
+
+    def test_script(self):
+        arr = np.random.random((2000, 2)) - 0.5
+        with suppress_output():
+            rec = Recording(mode="create", arr=arr.copy(), source_block={}, rate=Units.rate(44100),
+                name="script-test", parent=None, path=tempfile.mkdtemp())
+        saves = []
+        with patch.object(Recording, "save_audio", lambda self, wait=True: saves.append(wait)), \
+                patch.object(Recording, "save_metadata", lambda self: saves.append("meta")):
+
+            # nothing runs unless every command is valid
+            with suppress_output():
+                self.assertFalse(process_script(rec, "amplify 0.5; no_such_process 3"))
+                self.assertFalse(process_script(rec, "amplify 0.5\nreverse 2"))
+            self.assertTrue(np.array_equal(rec.arr, arr))
+            self.assertEqual(saves, [])
+
+            # a whole script is saved once, and undone as one edit
+            with suppress_output():
+                self.assertTrue(process_script(rec, "amplify 0.5; reverse # backwards\n\nrev"))
+            self.assertTrue(np.allclose(rec.arr, arr * 0.5))
+            self.assertEqual(saves, [False])
+            self.assertEqual(len(rec.history), 1)
+            with suppress_output():
+                rec.undo()
+            self.assertTrue(np.array_equal(rec.arr, arr))
+
     def test_recording(self):
 
         if FULLREC: